@@ -1,4 +1,13 @@
-from bot import start
+import sys
 
 if __name__ == "__main__":
-    start.main()
+    profile_startup = "--profile-startup" in sys.argv
+
+    if profile_startup:
+        from bot.startup import profile
+
+        profile.enable_import_timing()
+
+    from bot import start
+
+    start.main(profile_startup=profile_startup)
@@ -0,0 +1,68 @@
+import hashlib
+from array import array
+
+
+class CountMinSketch:
+    """
+    Вероятностный счетчик частот с фиксированным объемом памяти.
+    Оценка никогда не меньше реального значения и завышается не более
+    чем на ~2/width от общего числа событий
+    """
+
+    def __init__(self, width: int = 2048, depth: int = 4):
+        self.width = width
+        self.depth = depth
+        self.tables = [array("I", bytes(4 * width)) for _ in range(depth)]
+
+    def _indexes(self, key: str):
+        digest = hashlib.blake2b(key.encode(), digest_size=4 * self.depth).digest()
+        for row in range(self.depth):
+            yield int.from_bytes(digest[4 * row : 4 * row + 4], "little") % self.width
+
+    def add(self, key: str, count: int = 1) -> int:
+        """
+        Увеличивает счетчик и возвращает новую оценку частоты ключа
+        """
+        estimate = None
+        for table, index in zip(self.tables, self._indexes(key)):
+            table[index] += count
+            if estimate is None or table[index] < estimate:
+                estimate = table[index]
+        return estimate
+
+    def estimate(self, key: str) -> int:
+        return min(
+            table[index] for table, index in zip(self.tables, self._indexes(key))
+        )
+
+
+class HeavyHitters:
+    """
+    Count-Min Sketch и k ключей с наибольшей оценкой частоты.
+    Память не зависит от числа различных ключей
+    """
+
+    def __init__(self, k: int = 50, width: int = 2048, depth: int = 4):
+        self.k = k
+        self.sketch = CountMinSketch(width, depth)
+        self.top: dict[str, int] = {}
+        self.total = 0
+
+    def add(self, key: str, count: int = 1):
+        self.total += count
+        estimate = self.sketch.add(key, count)
+
+        if key in self.top or len(self.top) < self.k:
+            self.top[key] = estimate
+            return
+
+        min_key = min(self.top, key=self.top.get)
+        if estimate > self.top[min_key]:
+            del self.top[min_key]
+            self.top[key] = estimate
+
+    def estimate(self, key: str) -> int:
+        return self.sketch.estimate(key)
+
+    def most_common(self, n: int = 10) -> list[tuple[str, int]]:
+        return sorted(self.top.items(), key=lambda pair: pair[1], reverse=True)[:n]
@@ -0,0 +1,146 @@
+import asyncio
+import datetime
+from collections import deque
+from dataclasses import dataclass, field
+
+from bot.analytics.sketch import HeavyHitters
+from bot.db.sqlite import QueryStats, db, tables_ready
+from bot.fetch.cache import TTLCache
+from bot.fetch.models import SearchItem
+
+TOP_K = 50
+
+
+@dataclass
+class Window:
+    hour: datetime.datetime
+    items: HeavyHitters = field(default_factory=lambda: HeavyHitters(TOP_K))
+    queries: HeavyHitters = field(default_factory=lambda: HeavyHitters(TOP_K))
+    dirty: bool = True
+
+
+class QueryAnalytics:
+    """
+    Статистика запросов за последние hours часов в почасовых окнах.
+    Каждое окно хранит count-min sketch и топ-k ключей, поэтому объем памяти
+    ограничен независимо от числа различных запросов
+    """
+
+    def __init__(self, hours: int = 24):
+        self.windows: deque[Window] = deque(maxlen=hours)
+        self.names = TTLCache(maxsize=4096, ttl=hours * 3600)
+
+    def _window(self) -> Window:
+        hour = datetime.datetime.now().replace(minute=0, second=0, microsecond=0)
+
+        if not self.windows or self.windows[-1].hour != hour:
+            self.windows.append(Window(hour))
+
+        window = self.windows[-1]
+        window.dirty = True
+        return window
+
+    def _recent(self, hours: int) -> list[Window]:
+        since = datetime.datetime.now() - datetime.timedelta(hours=hours)
+        return [window for window in self.windows if window.hour > since]
+
+    def record_query(self, query: str):
+        self._window().queries.add(query.strip().lower())
+
+    def record_item(self, item: SearchItem):
+        key = f"{item.type}:{item.uid}"
+        if item.name:
+            self.names.set(key, item.name)
+        self._window().items.add(key)
+
+    def item_popularity(self, item: SearchItem, hours: int = 24) -> int:
+        key = f"{item.type}:{item.uid}"
+        return sum(window.items.estimate(key) for window in self._recent(hours))
+
+    def top_items(self, n: int = 10, hours: int = 24) -> list[tuple[str, int]]:
+        top = self._most_common("items", n, hours)
+        return [(self.names.get(key, key), count) for key, count in top]
+
+    def top_queries(self, n: int = 10, hours: int = 24) -> list[tuple[str, int]]:
+        return self._most_common("queries", n, hours)
+
+    def hourly_requests(self, hours: int = 24) -> list[tuple[datetime.datetime, int]]:
+        return [(window.hour, window.queries.total) for window in self._recent(hours)]
+
+    def _most_common(self, kind: str, n: int, hours: int) -> list[tuple[str, int]]:
+        windows = self._recent(hours)
+        candidates = {key for window in windows for key in getattr(window, kind).top}
+        counts = {
+            key: sum(getattr(window, kind).estimate(key) for window in windows)
+            for key in candidates
+        }
+        return sorted(counts.items(), key=lambda pair: pair[1], reverse=True)[:n]
+
+    async def persist(self):
+        """
+        Сохраняет в SQLite агрегаты окон, изменившихся с прошлого сохранения.
+        Запись выполняется в отдельном потоке
+        """
+        if not tables_ready.is_set():
+            return
+
+        rows = []
+        saved = []
+        for window in self.windows:
+            if not window.dirty:
+                continue
+
+            # Отметка снимается до записи: запросы, пришедшие во время записи,
+            # снова отметят окно
+            window.dirty = False
+            saved.append(window)
+            rows.append(
+                {
+                    "hour": window.hour,
+                    "kind": "requests",
+                    "key": "",
+                    "name": None,
+                    "count": window.queries.total,
+                }
+            )
+            for key, count in window.items.most_common(TOP_K):
+                rows.append(
+                    {
+                        "hour": window.hour,
+                        "kind": "item",
+                        "key": key,
+                        "name": self.names.get(key),
+                        "count": count,
+                    }
+                )
+            for key, count in window.queries.most_common(TOP_K):
+                rows.append(
+                    {
+                        "hour": window.hour,
+                        "kind": "query",
+                        "key": key,
+                        "name": None,
+                        "count": count,
+                    }
+                )
+
+        if rows:
+            try:
+                await asyncio.to_thread(_save_rows, rows)
+            except BaseException:
+                # Окна не сохранены, их нужно записать при следующем сохранении
+                for window in saved:
+                    window.dirty = True
+                raise
+
+
+def _save_rows(rows: list[dict]):
+    with db.connection_context():
+        with db.atomic():
+            for batch in range(0, len(rows), 100):
+                QueryStats.insert_many(
+                    rows[batch : batch + 100]
+                ).on_conflict_replace().execute()
+
+
+analytics = QueryAnalytics()
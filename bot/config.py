@@ -3,18 +3,81 @@ from dataclasses import dataclass, field
 
 from dotenv import load_dotenv
 
-load_dotenv()
-
 
 def parse_admins(admins_string):
-    return [int(admin) for admin in admins_string.split(",")]
+    return [int(admin) for admin in admins_string.split(",") if admin]
+
+
+def parse_list(value: str) -> list[str]:
+    return [item.strip() for item in value.split(",") if item.strip()]
+
+
+def parse_bool(value: str) -> bool:
+    return value.strip().lower() in ("1", "true", "yes", "on")
+
+
+def from_env(name: str, default: str = None, cast=None):
+    """
+    Поле настроек, которое читается из окружения при создании Config,
+    а не при объявлении класса
+    """
+
+    def factory():
+        value = os.getenv(name, default)
+        return cast(value) if cast and value is not None else value
+
+    return field(default_factory=factory)
 
 
 @dataclass
 class Config:
-    token: str = os.getenv("TOKEN")
-    api_url: str = os.getenv("API_URL")
-    admins: list = field(default_factory=lambda: parse_admins(os.getenv("ADMINS")))
+    token: str = from_env("TOKEN")
+    tokens: list = from_env("TOKENS", "", parse_list)
+    api_url: str = from_env("API_URL")
+    admins: list = from_env("ADMINS", "", parse_admins)
+    log_file: str = from_env("LOG_FILE")
+    log_sample_rate: float = from_env("LOG_SAMPLE_RATE", "1", float)
+    record_file: str = from_env("RECORD_FILE")
+    analytics_persist_interval: int = from_env("ANALYTICS_PERSIST_INTERVAL", "600", int)
+    fetch_concurrency: int = from_env("FETCH_CONCURRENCY", "8", int)
+    fetch_timeout: float = from_env("FETCH_TIMEOUT", "5", float)
+    fetch_retries: int = from_env("FETCH_RETRIES", "2", int)
+    fetch_hedge: bool = from_env("FETCH_HEDGE", "1", parse_bool)
+    update_deadline: float = from_env("UPDATE_DEADLINE", "10", float)
+    progressive_search: bool = from_env("PROGRESSIVE_SEARCH", "1", parse_bool)
+    prefetch_items: int = from_env("PREFETCH_ITEMS", "2", int)
+    prefetch_budget: int = from_env("PREFETCH_BUDGET", "20", int)
+    digest_time: str = from_env("DIGEST_TIME", "07:30")
+    delivery_rate: float = from_env("DELIVERY_RATE", "25", float)
+    reminder_minutes: int = from_env("REMINDER_MINUTES", "15", int)
+    free_rooms_refresh_interval: int = from_env(
+        "FREE_ROOMS_REFRESH_INTERVAL", "43200", int
+    )
+    lesson_index_refresh_interval: int = from_env(
+        "LESSON_INDEX_REFRESH_INTERVAL", "43200", int
+    )
+    max_concurrent_updates: int = from_env("MAX_CONCURRENT_UPDATES", "32", int)
+    max_pending_updates: int = from_env("MAX_PENDING_UPDATES", "1024", int)
+    session_ttl: int = from_env("SESSION_TTL", "3600", int)
+    timetable_images: bool = from_env("TIMETABLE_IMAGES", "1", parse_bool)
+    timetable_image_font: str = from_env("TIMETABLE_IMAGE_FONT", "DejaVuSans.ttf")
+    http_api_host: str = from_env("HTTP_API_HOST", "127.0.0.1")
+    http_api_port: int = from_env("HTTP_API_PORT", "0", int)
+
+    @property
+    def bot_tokens(self) -> list[str]:
+        """
+        Токены всех ботов процесса, первый - главный бот
+        """
+        return self.tokens or [self.token]
+
 
+def __getattr__(name):
+    # .env читается при первом обращении к settings, а не при импорте модуля
+    if name == "settings":
+        global settings
+        load_dotenv()
+        settings = Config()
+        return settings
 
-settings = Config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
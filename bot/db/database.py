@@ -1,7 +1,15 @@
 from telegram import Update
 from telegram.ext import ContextTypes
 
-from bot.db.sqlite import ScheduleBot, db
+from bot.db.sqlite import (
+    DigestSubscription,
+    FavoriteSchedule,
+    ReminderSubscription,
+    ScheduleBot,
+    db,
+    tables_ready,
+)
+from bot.fetch.models import SearchItem
 
 
 def insert_new_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -11,6 +19,9 @@ def insert_new_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
     @param context: Контекст
     @return: None
     """
+    if not tables_ready.is_set():
+        return
+
     user = update.effective_user
     db.connect()
 
@@ -30,3 +41,230 @@ def insert_new_user(update: Update, context: ContextTypes.DEFAULT_TYPE):
         usr.save()
 
     db.close()
+
+
+def get_favorites(user_id: int) -> list[SearchItem]:
+    """
+    Закрепленные расписания пользователя в порядке добавления
+    @param user_id: Id пользователя
+    @return: Список расписаний
+    """
+    if not tables_ready.is_set():
+        return []
+
+    with db.connection_context():
+        favorites = (
+            FavoriteSchedule.select()
+            .where(FavoriteSchedule.user_id == user_id)
+            .order_by(FavoriteSchedule.created_at)
+        )
+        return [
+            SearchItem(type=favorite.type, uid=favorite.uid, name=favorite.name)
+            for favorite in favorites
+        ]
+
+
+def is_favorite(user_id: int, item: SearchItem) -> bool:
+    if not tables_ready.is_set():
+        return False
+
+    with db.connection_context():
+        return (
+            FavoriteSchedule.select()
+            .where(
+                (FavoriteSchedule.user_id == user_id)
+                & (FavoriteSchedule.type == item.type)
+                & (FavoriteSchedule.uid == item.uid)
+            )
+            .exists()
+        )
+
+
+def toggle_favorite(user_id: int, item: SearchItem) -> bool:
+    """
+    Закрепляет расписание или открепляет, если оно уже закреплено
+    @param user_id: Id пользователя
+    @param item: Расписание
+    @return: True, если расписание закреплено
+    """
+    if not tables_ready.is_set():
+        return False
+
+    with db.connection_context():
+        deleted = (
+            FavoriteSchedule.delete()
+            .where(
+                (FavoriteSchedule.user_id == user_id)
+                & (FavoriteSchedule.type == item.type)
+                & (FavoriteSchedule.uid == item.uid)
+            )
+            .execute()
+        )
+
+        if deleted:
+            return False
+
+        FavoriteSchedule.create(
+            user_id=user_id, type=item.type, uid=item.uid, name=item.name
+        )
+        return True
+
+
+def get_digest_subscriptions(chat_id: int) -> list[tuple[SearchItem, str]]:
+    """
+    Ежедневные рассылки чата: расписание и время отправки
+    """
+    if not tables_ready.is_set():
+        return []
+
+    with db.connection_context():
+        subscriptions = (
+            DigestSubscription.select()
+            .where(DigestSubscription.chat_id == chat_id)
+            .order_by(DigestSubscription.send_at)
+        )
+        return [
+            (
+                SearchItem(type=sub.type, uid=sub.uid, name=sub.name),
+                sub.send_at,
+            )
+            for sub in subscriptions
+        ]
+
+
+def subscribe_digest(chat_id: int, item: SearchItem, send_at: str):
+    """
+    Подписывает чат на рассылку расписания или меняет время существующей подписки
+    """
+    if not tables_ready.is_set():
+        return
+
+    with db.connection_context():
+        DigestSubscription.insert(
+            chat_id=chat_id,
+            type=item.type,
+            uid=item.uid,
+            name=item.name,
+            send_at=send_at,
+        ).on_conflict(
+            conflict_target=[
+                DigestSubscription.chat_id,
+                DigestSubscription.type,
+                DigestSubscription.uid,
+            ],
+            update={DigestSubscription.send_at: send_at},
+        ).execute()
+
+
+def unsubscribe_digests(chat_id: int) -> int:
+    """
+    Отключает все рассылки чата
+    @return: Число отключенных рассылок
+    """
+    if not tables_ready.is_set():
+        return 0
+
+    with db.connection_context():
+        return (
+            DigestSubscription.delete()
+            .where(DigestSubscription.chat_id == chat_id)
+            .execute()
+        )
+
+
+def get_digests_at(send_at: str) -> list[tuple[SearchItem, list[int]]]:
+    """
+    Рассылки на время send_at, сгруппированные по расписанию:
+    каждое расписание с id всех подписанных на него чатов
+    """
+    if not tables_ready.is_set():
+        return []
+
+    groups = {}
+    with db.connection_context():
+        for sub in DigestSubscription.select().where(
+            DigestSubscription.send_at == send_at
+        ):
+            key = (sub.type, sub.uid)
+            if key not in groups:
+                groups[key] = (
+                    SearchItem(type=sub.type, uid=sub.uid, name=sub.name),
+                    [],
+                )
+            groups[key][1].append(sub.chat_id)
+
+    return list(groups.values())
+
+
+def migrate_digest_chat(old_chat_id: int, new_chat_id: int):
+    """
+    Переносит рассылки группы, ставшей супергруппой, на ее новый id
+    """
+    if not tables_ready.is_set():
+        return
+
+    with db.connection_context():
+        DigestSubscription.update(chat_id=new_chat_id).where(
+            DigestSubscription.chat_id == old_chat_id
+        ).execute()
+
+
+def get_reminder(user_id: int) -> int | None:
+    """
+    За сколько минут до пары пользователь получает напоминания, None если выключены
+    """
+    if not tables_ready.is_set():
+        return None
+
+    with db.connection_context():
+        subscription = ReminderSubscription.get_or_none(
+            ReminderSubscription.user_id == user_id
+        )
+        return subscription.minutes if subscription else None
+
+
+def set_reminder(user_id: int, minutes: int | None):
+    """
+    Включает напоминания за minutes минут до пары или выключает их (minutes=None)
+    """
+    if not tables_ready.is_set():
+        return
+
+    with db.connection_context():
+        if minutes is None:
+            ReminderSubscription.delete().where(
+                ReminderSubscription.user_id == user_id
+            ).execute()
+            return
+
+        ReminderSubscription.insert(user_id=user_id, minutes=minutes).on_conflict(
+            conflict_target=[ReminderSubscription.user_id],
+            update={ReminderSubscription.minutes: minutes},
+        ).execute()
+
+
+def get_reminder_subscriptions() -> list[tuple[int, int, list[SearchItem]]]:
+    """
+    Все пользователи с напоминаниями: id, минуты до пары и закрепленные расписания
+    """
+    if not tables_ready.is_set():
+        return []
+
+    users = {}
+    with db.connection_context():
+        rows = (
+            FavoriteSchedule.select(FavoriteSchedule, ReminderSubscription.minutes)
+            .join(
+                ReminderSubscription,
+                on=(FavoriteSchedule.user_id == ReminderSubscription.user_id),
+            )
+            .objects()
+        )
+        for row in rows:
+            if row.user_id not in users:
+                users[row.user_id] = (row.user_id, row.minutes, [])
+            users[row.user_id][2].append(
+                SearchItem(type=row.type, uid=row.uid, name=row.name)
+            )
+
+    return list(users.values())
@@ -1,9 +1,21 @@
+import datetime
 import os
+import threading
 
-from peewee import Model, PrimaryKeyField, SqliteDatabase, TextField
+from peewee import (
+    DateTimeField,
+    IntegerField,
+    Model,
+    PrimaryKeyField,
+    SqliteDatabase,
+    TextField,
+)
 
 db = SqliteDatabase(os.path.join(os.path.dirname(__file__), "data/bot.db"))
 
+# Таблицы создаются в фоне после запуска бота, до этого запись в базу пропускается
+tables_ready = threading.Event()
+
 
 class ScheduleBot(Model):
     id = PrimaryKeyField(unique=True)
@@ -13,3 +25,79 @@ class ScheduleBot(Model):
 
     class Meta:
         database = db
+
+
+class QueryStats(Model):
+    """
+    Почасовые агрегаты аналитики: общее число запросов (kind="requests"),
+    популярные расписания (kind="item") и поисковые запросы (kind="query")
+    """
+
+    hour = DateTimeField()
+    kind = TextField()
+    key = TextField()
+    name = TextField(null=True)
+    count = IntegerField(default=0)
+
+    class Meta:
+        database = db
+        indexes = ((("hour", "kind", "key"), True),)
+
+
+class FavoriteSchedule(Model):
+    """
+    Закрепленные пользователем расписания для /today, /tomorrow и /week
+    """
+
+    user_id = IntegerField(index=True)
+    type = TextField()
+    uid = IntegerField()
+    name = TextField(null=True)
+    created_at = DateTimeField(default=datetime.datetime.now)
+
+    class Meta:
+        database = db
+        indexes = ((("user_id", "type", "uid"), True),)
+
+
+class DigestSubscription(Model):
+    """
+    Ежедневная рассылка расписания в чат в указанное время (ЧЧ:ММ)
+    """
+
+    chat_id = IntegerField(index=True)
+    type = TextField()
+    uid = IntegerField()
+    name = TextField(null=True)
+    send_at = TextField(index=True)
+
+    class Meta:
+        database = db
+        indexes = ((("chat_id", "type", "uid"), True),)
+
+
+class ReminderSubscription(Model):
+    """
+    Напоминания о парах закрепленных расписаний за minutes минут до начала
+    """
+
+    user_id = IntegerField(unique=True)
+    minutes = IntegerField()
+
+    class Meta:
+        database = db
+
+
+def create_tables():
+    with db.connection_context():
+        db.create_tables(
+            [
+                ScheduleBot,
+                QueryStats,
+                FavoriteSchedule,
+                DigestSubscription,
+                ReminderSubscription,
+            ]
+        )
+
+    tables_ready.set()
@@ -0,0 +1,135 @@
+import asyncio
+import logging
+import time
+from typing import Callable
+
+from telegram import Bot
+from telegram.error import (
+    BadRequest,
+    ChatMigrated,
+    Forbidden,
+    RetryAfter,
+    TelegramError,
+)
+
+from bot import tasks
+
+logger = logging.getLogger(__name__)
+
+# Сколько чатов обслуживается одновременно. Темп задает rate,
+# параллельность нужна, чтобы задержка ответа Telegram не снижала темп
+DELIVERY_WORKERS = 8
+# Сколько раз повторять отправку после RetryAfter или переезда чата
+DELIVERY_ATTEMPTS = 3
+
+
+class RateLimitedSender:
+    """
+    Очередь исходящих сообщений рассылок: не больше rate сообщений в секунду
+    на все чаты, чтобы тысячи чатов с рассылкой на одно время не упирались
+    в ограничения Telegram. При RetryAfter вся очередь ждет указанное время
+    """
+
+    def __init__(self):
+        self.queue: asyncio.Queue | None = None
+        self.bot: Bot | None = None
+        self.interval = 0.0
+        self._next_slot = 0.0
+        self.sent = 0
+        self.failed = 0
+        # Вызываются с id чата, в который бот больше не может писать,
+        # и с (старый id, новый id) для групп, ставших супергруппами
+        self.gone_listeners: list[Callable[[int], None]] = []
+        self.migrate_listeners: list[Callable[[int, int], None]] = []
+
+    @property
+    def started(self) -> bool:
+        return self.queue is not None
+
+    def start(self, bot: Bot, rate: float):
+        if self.started:
+            return
+
+        self.bot = bot
+        self.interval = 1 / rate
+        self.queue = asyncio.Queue()
+        for number in range(DELIVERY_WORKERS):
+            tasks.start_background(self._work(), f"delivery worker {number}")
+
+    def send(self, chat_id: int, *texts: str, **kwargs):
+        """
+        Ставит в очередь сообщения одному чату. Все они уходят одним заданием
+        одного обработчика и приходят в том порядке, в котором переданы
+        """
+        self.queue.put_nowait((chat_id, texts, kwargs))
+
+    def __len__(self):
+        return self.queue.qsize() if self.queue else 0
+
+    async def _wait_slot(self):
+        now = time.monotonic()
+        slot = max(now, self._next_slot)
+        self._next_slot = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    async def _work(self):
+        while True:
+            chat_id, texts, kwargs = await self.queue.get()
+            try:
+                for text in texts:
+                    chat_id = await self._deliver(chat_id, text, kwargs)
+                    if chat_id is None:
+                        break
+            except Exception:
+                logger.exception("Delivery to %s failed", chat_id)
+            finally:
+                self.queue.task_done()
+
+    async def _deliver(self, chat_id: int, text: str, kwargs: dict) -> int | None:
+        """
+        Отправляет одно сообщение. Возвращает id чата для следующих сообщений
+        (он меняется, если группа стала супергруппой) или None, если писать
+        в чат больше нельзя
+        """
+        for _ in range(DELIVERY_ATTEMPTS):
+            await self._wait_slot()
+            try:
+                await self.bot.send_message(chat_id=chat_id, text=text, **kwargs)
+                self.sent += 1
+                return chat_id
+
+            except RetryAfter as error:
+                # Притормаживаем всю очередь, а не только этот чат
+                self._next_slot = max(
+                    self._next_slot, time.monotonic() + error.retry_after
+                )
+
+            except ChatMigrated as error:
+                for listener in self.migrate_listeners:
+                    listener(chat_id, error.new_chat_id)
+                chat_id = error.new_chat_id
+
+            except (Forbidden, BadRequest) as error:
+                self.failed += 1
+                if isinstance(error, BadRequest) and (
+                    "chat not found" not in error.message.lower()
+                ):
+                    logger.warning("Failed to deliver to %s: %s", chat_id, error)
+                    return chat_id
+
+                logger.info("Chat %s is unavailable: %s", chat_id, error)
+                for listener in self.gone_listeners:
+                    listener(chat_id)
+                return None
+
+            except TelegramError as error:
+                logger.warning("Failed to deliver to %s: %s", chat_id, error)
+                self.failed += 1
+                return chat_id
+
+        self.failed += 1
+        return chat_id
+
+
+delivery = RateLimitedSender()
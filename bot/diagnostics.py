@@ -0,0 +1,204 @@
+import asyncio
+import collections
+import gc
+import os
+import signal
+import sys
+import time
+import tracemalloc
+import types
+
+from telegram import Bot
+from telegram.ext import Application
+
+# Объекты этих типов не относятся к данным бота и при подсчете размера пропускаются
+SKIP_TYPES = (
+    type,
+    types.ModuleType,
+    types.FunctionType,
+    types.BuiltinFunctionType,
+    types.MethodType,
+    types.CodeType,
+    types.FrameType,
+    Bot,
+    Application,
+)
+
+# Сколько секунд подряд обход для отчета о памяти может занимать цикл событий
+SIZEOF_SLICE = 0.01
+
+# Интервал процессорного времени между снимками стека при профилировании
+SAMPLE_INTERVAL = 0.005
+
+
+def _walk_sizes(obj, seen: set[int]):
+    """
+    Размеры объекта и всего, на что он ссылается, по одному объекту
+    """
+    stack = [obj]
+
+    while stack:
+        current = stack.pop()
+        if id(current) in seen or isinstance(current, SKIP_TYPES):
+            continue
+
+        seen.add(id(current))
+        yield sys.getsizeof(current, 0)
+        stack.extend(gc.get_referents(current))
+
+
+def deep_sizeof(obj, seen: set[int] = None) -> int:
+    """
+    Размер объекта вместе со всем, на что он ссылается. Объекты из seen
+    не учитываются повторно, поэтому общие данные считаются один раз
+    """
+    return sum(_walk_sizes(obj, set() if seen is None else seen))
+
+
+async def deep_sizeof_async(obj, seen: set[int] = None) -> int:
+    """
+    deep_sizeof для больших структур: обход идет в цикле событий и отдает ему
+    управление каждые SIZEOF_SLICE секунд
+    """
+    size = 0
+    started = time.monotonic()
+    walk = _walk_sizes(obj, set() if seen is None else seen)
+    for count, object_size in enumerate(walk, 1):
+        size += object_size
+        if count % 1000 == 0 and time.monotonic() - started > SIZEOF_SLICE:
+            await asyncio.sleep(0)
+            started = time.monotonic()
+    return size
+
+
+async def sizes_by_key(mappings) -> dict[str, tuple[int, int]]:
+    """
+    Суммарный размер значений по ключам для одного или нескольких словарей:
+    ключ -> (число значений, байты). Общие объекты внутри ключа считаются один раз.
+    Словари обходятся в цикле событий с паузами каждые SIZEOF_SLICE секунд
+    """
+    seen: dict[str, set[int]] = collections.defaultdict(set)
+    sizes: dict[str, list[int]] = collections.defaultdict(lambda: [0, 0])
+
+    started = time.monotonic()
+    for mapping in mappings:
+        for key, value in list(mapping.items()):
+            sizes[str(key)][0] += 1
+            sizes[str(key)][1] += await deep_sizeof_async(value, seen[str(key)])
+
+        if time.monotonic() - started > SIZEOF_SLICE:
+            await asyncio.sleep(0)
+            started = time.monotonic()
+
+    return {
+        key: tuple(size)
+        for key, size in sorted(sizes.items(), key=lambda entry: -entry[1][1])
+    }
+
+
+def current_rss() -> int | None:
+    """
+    Resident set size процесса в байтах, None если недоступен
+    """
+    try:
+        with open("/proc/self/statm") as statm:
+            return int(statm.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return None
+
+
+def tracemalloc_top(limit: int = 15) -> list[str]:
+    snapshot = tracemalloc.take_snapshot().filter_traces(
+        (
+            tracemalloc.Filter(False, tracemalloc.__file__),
+            tracemalloc.Filter(False, "<frozen importlib._bootstrap>"),
+        )
+    )
+    return [str(statistic) for statistic in snapshot.statistics("lineno")[:limit]]
+
+
+class SamplingProfiler:
+    """
+    Статистический профилировщик, который не требует перезапуска: каждые interval
+    секунд процессорного времени SIGPROF прерывает главный поток (в нем работает
+    цикл событий) и обработчик запоминает его стек. Ожидание в select не тратит
+    процессор и почти не попадает в замеры. Доступен только на Unix
+    """
+
+    def __init__(self, interval: float = SAMPLE_INTERVAL):
+        self.interval = interval
+        self.samples = 0
+        self.idle = 0
+        self.elapsed = 0.0
+        self.own: collections.Counter = collections.Counter()
+        self.total: collections.Counter = collections.Counter()
+        self._started = 0.0
+        self._previous_handler = None
+        self._names: dict = {}
+
+    def start(self):
+        if not hasattr(signal, "setitimer"):
+            raise RuntimeError("SIGPROF is not available on this platform")
+
+        self._started = time.monotonic()
+        self._previous_handler = signal.signal(signal.SIGPROF, self._handle)
+        signal.setitimer(signal.ITIMER_PROF, self.interval, self.interval)
+
+    def stop(self):
+        signal.setitimer(signal.ITIMER_PROF, 0)
+        signal.signal(signal.SIGPROF, self._previous_handler or signal.SIG_DFL)
+        self.elapsed = time.monotonic() - self._started
+
+    def _handle(self, signum, frame):
+        if frame is not None:
+            self._sample(frame)
+
+    def _sample(self, frame):
+        self.samples += 1
+
+        code = frame.f_code
+        if code.co_name == "select" and code.co_filename.endswith("selectors.py"):
+            self.idle += 1
+            return
+
+        self.own[self._name(code)] += 1
+
+        seen = set()
+        while frame is not None:
+            key = self._name(frame.f_code)
+            if key not in seen:
+                seen.add(key)
+                self.total[key] += 1
+            frame = frame.f_back
+
+    def _name(self, code) -> str:
+        name = self._names.get(code)
+        if name is None:
+            filename = code.co_filename
+            for path in sys.path:
+                if path and filename.startswith(path):
+                    filename = os.path.relpath(filename, path)
+                    break
+            name = f"{filename}:{code.co_firstlineno}({code.co_name})"
+            self._names[code] = name
+        return name
+
+    def report(self, top: int = 15) -> str:
+        if not self.samples:
+            return "Нет замеров: процессор не был загружен"
+
+        busy = self.samples - self.idle
+        load = 100 * self.samples * self.interval / self.elapsed if self.elapsed else 0
+        text = f"Замеров: {self.samples}, загрузка процессора ≈ {load:.0f}%\n"
+        if not busy:
+            return text
+
+        text += "\nСобственное время:\n"
+        for key, count in self.own.most_common(top):
+            text += f"{100 * count / busy:5.1f}% {key}\n"
+
+        text += "\nВместе с вызванными функциями:\n"
+        for key, count in self.total.most_common(top):
+            text += f"{100 * count / busy:5.1f}% {key}\n"
+
+        return text
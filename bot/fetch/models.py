@@ -2,7 +2,7 @@ import enum
 from datetime import date, datetime
 from typing import Annotated
 
-from pydantic import BaseModel, BeforeValidator, validator
+from pydantic import BaseModel, BeforeValidator, PrivateAttr, validator
 
 
 class SearchItem(BaseModel):
@@ -79,3 +79,25 @@ class Lesson(LessonSchedule):
 
 class ScheduleData(BaseModel):
     data: list[LessonSchedule | Holiday]
+
+    # Производные от расписания данные (индексы, клавиатуры), которые считаются
+    # один раз и живут ровно столько же, сколько сам объект расписания
+    _memo: dict = PrivateAttr(default_factory=dict)
+    # Хэш ответа API, по которому кэшируются экспортированные файлы
+    _version: str = PrivateAttr(default="")
+
+    @property
+    def version(self) -> str:
+        return self._version
+
+    @property
+    def lesson_dates(self) -> frozenset[date]:
+        """Даты, в которые есть хотя бы одна пара"""
+        if "lesson_dates" not in self._memo:
+            self._memo["lesson_dates"] = frozenset(
+                lesson_date
+                for item in self.data
+                if isinstance(item, LessonSchedule) and item.dates
+                for lesson_date in item.dates
+            )
+        return self._memo["lesson_dates"]
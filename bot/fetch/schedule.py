@@ -1,24 +1,116 @@
+import asyncio
+import hashlib
+import logging
 from datetime import date
+from typing import Callable
 
 import httpx
 
 from bot.config import settings
+from bot.fetch import upstream
+from bot.fetch.cache import TTLCache
 from bot.fetch.models import Lesson, LessonSchedule, ScheduleData, SearchItem
 
+logger = logging.getLogger(__name__)
 
-async def get_schedule(target: SearchItem) -> ScheduleData | None:
+SCHEDULE_CACHE_TTL = 30 * 60
+
+# Расписания по (тип, uid). Один объект расписания разделяют все пользователи,
+# поэтому производные данные в ScheduleData._memo считаются один раз на всех
+schedule_cache = TTLCache(maxsize=1024, ttl=SCHEDULE_CACHE_TTL)
+
+# Вызываются с каждым загруженным из API расписанием, через них индексы
+# (например, занятость аудиторий) обновляются без отдельных запросов
+schedule_listeners: list[Callable[[SearchItem, ScheduleData], None]] = []
+
+
+def is_schedule_cached(target: SearchItem) -> bool:
+    return (target.type, target.uid) in schedule_cache
+
+
+# Загрузки, которые идут прямо сейчас: (тип, uid) -> задача. Повторный запрос
+# того же расписания (например, нажатие во время упреждающей загрузки)
+# дожидается уже отправленного запроса к API
+_inflight: dict[tuple[str, int], asyncio.Task] = {}
+
+
+async def get_schedule(target: SearchItem, cache: bool = True) -> ScheduleData | None:
+    """
+    Расписание из кэша или из API. cache=False используется массовыми загрузками,
+    чтобы не вытеснять из кэша расписания, которые смотрят пользователи
+    """
+    key = (target.type, target.uid)
+    schedule = schedule_cache.get(key) if cache else None
+
+    if schedule is not None:
+        return schedule
+
+    task = _inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(
+            _fetch_schedule(target), context=upstream.without_deadline()
+        )
+        _inflight[key] = task
+        task.add_done_callback(lambda done: _forget_inflight(key, done))
+
+    # Отмена одного из ожидающих не отменяет загрузку для остальных, и каждый
+    # ждет ее не дольше своего дедлайна
+    try:
+        async with asyncio.timeout(upstream.remaining()):
+            schedule = await asyncio.shield(task)
+    except TimeoutError:
+        return None
+    if schedule is not None and cache:
+        schedule_cache.set(key, schedule)
+    return schedule
+
+
+def _forget_inflight(key: tuple[str, int], task: asyncio.Task):
+    _inflight.pop(key, None)
+    # Ошибку могли не забрать, если все ожидавшие загрузку отменены
+    if not task.cancelled():
+        task.exception()
+
+
+async def _fetch_schedule(target: SearchItem) -> ScheduleData | None:
     base_url = f"{settings.api_url}/api/v1/schedule/{target.type}/{target.uid}"
 
-    async with httpx.AsyncClient() as client:
+    try:
+        response = await upstream.get("schedule", base_url)
+        json_response = response.json()
+
+    except httpx.RequestError:
+        return None
+
+    schedule = ScheduleData(**json_response)
+    schedule._version = hashlib.blake2b(response.content, digest_size=8).hexdigest()
+
+    for listener in schedule_listeners:
         try:
-            response = await client.get(base_url)
-            response.raise_for_status()
-            json_response = response.json()
+            listener(target, schedule)
+        except Exception:
+            logger.exception("Schedule listener %s failed", listener)
+
+    return schedule
+
+
+async def get_schedules(
+    targets: list[SearchItem], cache: bool = True, concurrency: int = None
+) -> list[ScheduleData | None]:
+    """
+    Загружает несколько расписаний одновременно, но не больше concurrency
+    запросов к API сразу. Вместо расписаний, которые не удалось получить, None
+    """
+    semaphore = asyncio.Semaphore(concurrency or settings.fetch_concurrency)
 
-        except httpx.RequestError:
-            return None
+    async def fetch(target: SearchItem) -> ScheduleData | None:
+        async with semaphore:
+            try:
+                return await get_schedule(target, cache=cache)
+            except httpx.HTTPError:
+                return None
 
-        return ScheduleData(**json_response)
+    return await asyncio.gather(*(fetch(target) for target in targets))
 
 
 def get_lessons(user_data: ScheduleData, dates: list[date] = None) -> list[Lesson]:
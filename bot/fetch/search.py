@@ -1,53 +1,130 @@
 import asyncio
+from typing import AsyncIterator
 
 import httpx
 
 from bot.config import settings
+from bot.fetch import upstream
 from bot.fetch.models import ScheduleEndpoints, SearchItem, SearchResults
 
 
+def parse_search_results(search_type: str, json_response: dict) -> list[SearchItem]:
+    items = []
+
+    if "results" in json_response and len(json_response["results"]) > 0:
+        for item in json_response.get("results", []):
+            item["type"] = search_type
+            if search_type == "classrooms":
+                campus_short_name = item.get("campus", {}).get("short_name", "")
+                if campus_short_name:
+                    item["name"] = f"{item['name']} ({campus_short_name})"
+                else:
+                    item["name"] = item["name"]
+
+            items.append(SearchItem(**item))
+
+    return items
+
+
 async def search_schedule(query) -> list[SearchItem] | None:
     base_url = f"{settings.api_url}/api/v1/schedule/search/"
 
     results = {}
-    async with httpx.AsyncClient() as client:
-        tasks = []
+    tasks = []
 
-        for search_type in ScheduleEndpoints:
-            url = base_url + search_type.value
-            params = {"query": query}
+    for search_type in ScheduleEndpoints:
+        url = base_url + search_type.value
+        params = {"query": query}
 
-            task = client.get(url, params=params)
-            tasks.append(task)
+        task = upstream.get(f"search/{search_type.value}", url, params=params)
+        tasks.append(task)
 
-        try:
-            responses = await asyncio.gather(*tasks)
-
-            for search_type, response in zip(
-                ScheduleEndpoints,
-                responses,
-            ):
-                search_type = search_type.value
-                response.raise_for_status()
-                json_response = response.json()
-
-                results[search_type] = []
-
-                if "results" in json_response and len(json_response["results"]) > 0:
-                    for item in json_response.get("results", []):
-                        item["type"] = search_type
-                        if search_type == "classrooms":
-                            campus_short_name = item.get("campus", {}).get(
-                                "short_name", ""
-                            )
-                            if campus_short_name:
-                                item["name"] = f"{item['name']} ({campus_short_name})"
-                            else:
-                                item["name"] = item["name"]
-
-                        results[search_type].append(SearchItem(**item))
-
-            search_results = SearchResults(**results)
-        except httpx.RequestError:
-            return None
+    try:
+        responses = await asyncio.gather(*tasks)
+
+        for search_type, response in zip(
+            ScheduleEndpoints,
+            responses,
+        ):
+            search_type = search_type.value
+            json_response = response.json()
+
+            results[search_type] = parse_search_results(search_type, json_response)
+
+        search_results = SearchResults(**results)
+    except httpx.RequestError:
+        return None
     return [item for _, items in search_results for item in items]
+
+
+async def iter_search_schedule(
+    query,
+) -> AsyncIterator[tuple[ScheduleEndpoints, list[SearchItem] | None]]:
+    """
+    Ищет по всем эндпоинтам одновременно и отдает результаты каждого по мере
+    готовности. Вместо результатов эндпоинта, запрос к которому не удался, None
+    """
+    base_url = f"{settings.api_url}/api/v1/schedule/search/"
+
+    async def search(search_type: ScheduleEndpoints):
+        try:
+            response = await upstream.get(
+                f"search/{search_type.value}",
+                base_url + search_type.value,
+                params={"query": query},
+            )
+        except httpx.HTTPError:
+            return search_type, None
+
+        return search_type, parse_search_results(search_type.value, response.json())
+
+    tasks = [
+        asyncio.create_task(search(search_type)) for search_type in ScheduleEndpoints
+    ]
+    try:
+        for result in asyncio.as_completed(tasks):
+            yield await result
+    finally:
+        for task in tasks:
+            task.cancel()
+
+
+def collect_search_results(
+    results: dict[ScheduleEndpoints, list[SearchItem] | None],
+) -> list[SearchItem] | None:
+    """
+    Объединяет результаты эндпоинтов в порядке search_schedule.
+    None, если ни один эндпоинт не ответил
+    """
+    if all(items is None for items in results.values()):
+        return None
+
+    return [
+        item
+        for search_type in ScheduleEndpoints
+        for item in results.get(search_type) or []
+    ]
+
+
+async def fetch_catalog(
+    search_type: ScheduleEndpoints, queries: list[str]
+) -> list[SearchItem]:
+    """
+    Собирает все расписания одного типа как объединение результатов поиска
+    по нескольким запросам. Запросы, завершившиеся ошибкой, пропускаются
+    """
+    url = f"{settings.api_url}/api/v1/schedule/search/{search_type.value}"
+
+    items = {}
+    for query in queries:
+        try:
+            response = await upstream.get(
+                f"search/{search_type.value}", url, params={"query": query}
+            )
+        except (httpx.RequestError, httpx.HTTPStatusError):
+            continue
+
+        for item in parse_search_results(search_type.value, response.json()):
+            items[item.uid] = item
+
+    return list(items.values())
@@ -0,0 +1,232 @@
+import asyncio
+import collections
+import contextlib
+import contextvars
+import logging
+import random
+import time
+from typing import Callable
+
+import httpx
+
+from bot import config
+
+logger = logging.getLogger(__name__)
+
+# Сколько последних задержек хранится по каждому эндпоинту
+LATENCY_SAMPLES = 512
+# До этого числа замеров p95 ненадежен и запросы не дублируются
+HEDGE_MIN_SAMPLES = 50
+# Дублирующий запрос не отправляется раньше, чем через это время
+HEDGE_MIN_DELAY = 0.05
+# Пауза перед повтором: случайная в [0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2^n)]
+RETRY_BASE_DELAY = 0.2
+RETRY_MAX_DELAY = 2.0
+RETRY_STATUSES = {429, 500, 502, 503, 504}
+
+# Момент (time.monotonic), к которому должен завершиться текущий запрос пользователя
+_deadline: contextvars.ContextVar[float | None] = contextvars.ContextVar(
+    "deadline", default=None
+)
+
+
+class DeadlineExceeded(httpx.TimeoutException):
+    """
+    Бюджет времени на запрос пользователя исчерпан
+    """
+
+
+@contextlib.contextmanager
+def deadline(seconds: float):
+    """
+    Ограничивает суммарное время всех запросов к API внутри блока.
+    Вложенный бюджет не может быть больше внешнего
+    """
+    current = _deadline.get()
+    expires_at = time.monotonic() + seconds
+    token = _deadline.set(expires_at if current is None else min(current, expires_at))
+    try:
+        yield
+    finally:
+        _deadline.reset(token)
+
+
+def without_deadline() -> contextvars.Context:
+    """
+    Копия текущего контекста без дедлайна. В нем запускаются общие и фоновые
+    загрузки: они не должны обрываться по бюджету пользователя, который их начал
+    """
+    context = contextvars.copy_context()
+    context.run(_deadline.set, None)
+    return context
+
+
+def remaining() -> float | None:
+    """
+    Сколько секунд осталось до дедлайна, None если дедлайна нет
+    """
+    expires_at = _deadline.get()
+    return None if expires_at is None else expires_at - time.monotonic()
+
+
+class LatencyStats:
+    """
+    Задержки последних успешных запросов к одному эндпоинту
+    """
+
+    def __init__(self):
+        self.samples = collections.deque(maxlen=LATENCY_SAMPLES)
+        self.requests = 0
+        self.retries = 0
+        self.hedged = 0
+        self.hedge_wins = 0
+        self.failures = 0
+
+    def add(self, latency: float):
+        self.samples.append(latency)
+
+    def quantile(self, fraction: float) -> float:
+        if not self.samples:
+            return 0.0
+        ordered = sorted(self.samples)
+        return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+    def hedge_delay(self) -> float | None:
+        """
+        Через сколько секунд отправлять дублирующий запрос, None если не нужно
+        """
+        if not config.settings.fetch_hedge or len(self.samples) < HEDGE_MIN_SAMPLES:
+            return None
+        return max(HEDGE_MIN_DELAY, self.quantile(0.95))
+
+
+# Эндпоинт ("schedule", "search/teachers", ...) -> статистика
+latency_stats: dict[str, LatencyStats] = collections.defaultdict(LatencyStats)
+
+# Вызываются с (эндпоинт, ответ, задержка) после каждого успешного запроса
+response_listeners: list[Callable[[str, httpx.Response, float], None]] = []
+
+_client: httpx.AsyncClient | None = None
+_transport: httpx.AsyncBaseTransport | None = None
+
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Общий клиент: соединения с API переиспользуются между запросами
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        _client = httpx.AsyncClient(
+            timeout=config.settings.fetch_timeout, transport=_transport
+        )
+    return _client
+
+
+async def use_transport(transport: httpx.AsyncBaseTransport | None):
+    """
+    Направляет запросы к API через transport, например в локальную подмену API
+    при воспроизведении записанного трафика. None возвращает обычную сеть
+    """
+    global _transport
+    await close_client()
+    _transport = transport
+
+
+async def close_client():
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+
+
+async def _timed_get(stats: LatencyStats, url: str, params: dict | None):
+    started = time.monotonic()
+    response = await get_client().get(url, params=params)
+    if response.status_code not in RETRY_STATUSES:
+        stats.add(time.monotonic() - started)
+    return response
+
+
+async def _hedged_get(stats: LatencyStats, url: str, params: dict | None):
+    """
+    Отправляет запрос и, если он не завершился за p95 задержки эндпоинта,
+    дублирует его. Возвращается первый успешный ответ, второй запрос отменяется
+    """
+    primary = asyncio.create_task(_timed_get(stats, url, params))
+    delay = stats.hedge_delay()
+    pending = {primary}
+    done = set()
+
+    try:
+        if delay is not None:
+            done, pending = await asyncio.wait(pending, timeout=delay)
+            if not done:
+                stats.hedged += 1
+                pending.add(asyncio.create_task(_timed_get(stats, url, params)))
+
+        while True:
+            if not done:
+                done, pending = await asyncio.wait(
+                    pending, return_when=asyncio.FIRST_COMPLETED
+                )
+
+            succeeded = [task for task in done if task.exception() is None]
+            if succeeded:
+                if primary not in succeeded:
+                    stats.hedge_wins += 1
+                return succeeded[0].result()
+            if not pending:
+                # Все отправленные запросы завершились ошибкой
+                return done.pop().result()
+            done = set()
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+async def get(endpoint: str, url: str, params: dict = None) -> httpx.Response:
+    """
+    GET к API с повторами и дублированием медленных запросов в пределах
+    дедлайна текущего запроса пользователя. Ответы 4xx не повторяются,
+    ошибка последней попытки пробрасывается как есть
+    """
+    stats = latency_stats[endpoint]
+    stats.requests += 1
+
+    for attempt in range(config.settings.fetch_retries + 1):
+        budget = remaining()
+        if budget is not None and budget <= 0:
+            stats.failures += 1
+            raise DeadlineExceeded(f"Deadline exceeded for {endpoint}")
+
+        try:
+            started = time.monotonic()
+            async with asyncio.timeout(budget):
+                response = await _hedged_get(stats, url, params)
+            if response.status_code not in RETRY_STATUSES:
+                response.raise_for_status()
+                for listener in response_listeners:
+                    listener(endpoint, response, time.monotonic() - started)
+                return response
+            error = httpx.HTTPStatusError(
+                f"Retryable status {response.status_code} for {endpoint}",
+                request=response.request,
+                response=response,
+            )
+
+        except TimeoutError:
+            error = DeadlineExceeded(f"Deadline exceeded for {endpoint}")
+        except httpx.TransportError as transport_error:
+            error = transport_error
+
+        budget = remaining()
+        pause = random.uniform(0, min(RETRY_MAX_DELAY, RETRY_BASE_DELAY * 2**attempt))
+        if attempt == config.settings.fetch_retries or (
+            budget is not None and budget <= pause
+        ):
+            stats.failures += 1
+            raise error
+
+        stats.retries += 1
+        logger.debug("Retrying %s after %s: %s", endpoint, pause, error)
+        await asyncio.sleep(pause)
@@ -0,0 +1,189 @@
+import asyncio
+import datetime
+import re
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, ContextTypes
+
+from bot.db.database import get_favorites
+from bot.fetch.cache import TTLCache
+from bot.fetch.models import ScheduleData, SearchItem
+from bot.fetch.schedule import SCHEDULE_CACHE_TTL, get_schedules
+from bot.fetch.search import search_schedule
+from bot.index.intervals import LessonIntervals, free_windows
+from bot.index.occupancy import occupancy_index
+from bot.parse.formating import format_common_windows
+from bot.parse.semester import (
+    get_current_week_number,
+    get_dates_for_week,
+    parse_bell_time,
+)
+
+# Сколько расписаний можно сравнить за один запрос
+COMMON_MAX_ITEMS = 5
+# Окна ищутся между началом первой и концом последней пары по звонкам.
+# Эти границы используются, только пока не загружено ни одного расписания
+COMMON_DAY_START = datetime.time(9, 0)
+COMMON_DAY_END = datetime.time(21, 10)
+# Окна короче получаса для встречи бесполезны
+COMMON_MIN_WINDOW = datetime.timedelta(minutes=30)
+
+USAGE = (
+    "ℹ️ Общие свободные окна: /common [неделя] запрос1; запрос2; ...\n"
+    "Например: `/common Иванов; ИКБО-01-22; ИКБО-02-22` или "
+    "`/common 5 Иванов; ИКБО-01-22`\n"
+    "Без запросов используются закрепленные расписания"
+)
+
+QUERY_SEPARATOR = re.compile(r"[;\n]")
+
+# (набор версий расписаний, неделя, границы дня) -> окна по дням
+common_windows_cache = TTLCache(maxsize=512, ttl=SCHEDULE_CACHE_TTL)
+
+
+def parse_common_args(text: str) -> tuple[int | None, list[str]]:
+    """
+    Разбирает аргументы /common: необязательный номер недели и запросы через ";"
+    """
+    text = text.strip()
+    week = None
+
+    first, _, rest = text.partition(" ")
+    if first.isdigit() and len(first) <= 2:
+        week = int(first)
+        text = rest
+
+    queries = [query.strip() for query in QUERY_SEPARATOR.split(text)]
+    return week, [query for query in queries if query]
+
+
+async def resolve_item(query: str) -> SearchItem | list[SearchItem] | None:
+    """
+    Находит расписание по запросу. Если совпадений несколько и ни одно не совпадает
+    с запросом точно, возвращает список вариантов для уточнения
+    """
+    if len(query) < 3:
+        return None
+
+    items = await search_schedule(query)
+    if not items:
+        return None
+
+    if len(items) == 1:
+        return items[0]
+
+    for item in items:
+        if (item.name or "").lower() == query.lower():
+            return item
+
+    return items
+
+
+def get_day_bounds(intervals: list[LessonIntervals]):
+    """
+    Начало первой и конец последней пары учебного дня по звонкам загруженных
+    расписаний (индекс свободных аудиторий собирает их со всех расписаний)
+    и сравниваемых расписаний
+    """
+    starts = [item.day_start for item in intervals if item.day_start]
+    ends = [item.day_end for item in intervals if item.day_end]
+    for start, end in occupancy_index.bells.values():
+        if start and end:
+            starts.append(parse_bell_time(start))
+            ends.append(parse_bell_time(end))
+
+    return min(starts, default=COMMON_DAY_START), max(ends, default=COMMON_DAY_END)
+
+
+def get_common_windows(schedules: list[ScheduleData], week: int):
+    """
+    Для каждого дня недели объединяет занятые интервалы всех расписаний
+    и возвращает промежутки, свободные у всех
+    """
+    intervals = [LessonIntervals.for_schedule(schedule) for schedule in schedules]
+    bounds = get_day_bounds(intervals)
+
+    key = (frozenset(schedule.version for schedule in schedules), week, bounds)
+    windows = common_windows_cache.get(key)
+    if windows is not None:
+        return windows
+
+    windows = {}
+    for day in get_dates_for_week(week):
+        day_start = datetime.datetime.combine(day, bounds[0])
+        day_end = datetime.datetime.combine(day, bounds[1])
+        busy = [
+            (start, end)
+            for schedule_intervals in intervals
+            for start, end, _ in schedule_intervals.between(
+                day_start - schedule_intervals.max_duration, day_end
+            )
+        ]
+        windows[day] = free_windows(busy, day_start, day_end, COMMON_MIN_WINDOW)
+
+    common_windows_cache.set(key, windows)
+    return windows
+
+
+async def common_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Реакция бота на команду /common: время, когда все указанные преподаватели,
+    группы и аудитории свободны
+    """
+    if context.bot_data["maintenance_mode"]:
+        return
+
+    text = update.message.text.partition(" ")[2] if update.message else ""
+    week, queries = parse_common_args(text)
+
+    if queries:
+        resolved = await asyncio.gather(*(resolve_item(query) for query in queries))
+    else:
+        resolved = get_favorites(update.effective_user.id)
+
+    if len(resolved) < 2 or len(resolved) > COMMON_MAX_ITEMS:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=f"{USAGE}\n\nНужно от 2 до {COMMON_MAX_ITEMS} расписаний",
+            parse_mode="Markdown",
+        )
+        return
+
+    problems = []
+    for query, result in zip(queries, resolved):
+        if result is None:
+            problems.append(f"❌ «{query}»: ничего не найдено")
+        elif isinstance(result, list):
+            options = ", ".join(item.name for item in result[:5])
+            problems.append(f"❓ «{query}»: уточните запрос ({options})")
+
+    if problems:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="\n".join(problems)[:4096],
+        )
+        return
+
+    items = list({(item.type, item.uid): item for item in resolved}.values())
+    schedules = await get_schedules(items)
+
+    if any(schedule is None for schedule in schedules):
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="❌ Не удалось получить расписание, попробуйте позже",
+        )
+        return
+
+    week = week or get_current_week_number()
+    windows = get_common_windows(schedules, week)
+
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=format_common_windows(
+            [item.name or str(item.uid) for item in items], week, windows
+        )[:4096],
+    )
+
+
+def init_handlers(application: Application):
+    application.add_handler(CommandHandler("common", common_handler))
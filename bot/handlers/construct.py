@@ -1,11 +1,11 @@
 import datetime
+import functools
 
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 
-from bot.fetch.models import Lesson, ScheduleData, SearchItem
-from bot.fetch.schedule import get_lessons
+from bot.fetch.models import ScheduleData, SearchItem
 from bot.handlers import ImportantDays as ImportantDays
-from bot.parse.semester import get_current_week_number, get_dates_for_week
+from bot.parse.semester import get_dates_for_week, get_week_by_date
 
 
 def construct_item_markup(schedule_items: list[SearchItem]) -> InlineKeyboardMarkup:
@@ -22,12 +22,17 @@ def construct_item_markup(schedule_items: list[SearchItem]) -> InlineKeyboardMar
 def construct_weeks_markup():
     """
     Создает KeyboardMarkup со списком недель, а также подставляет эмодзи
-    если текущий день соответствует некоторой памятной дате+-интервал
+    если текущий день соответствует некоторой памятной дате+-интервал.
+    Клавиатура зависит только от текущего дня, поэтому строится раз в сутки
     """
-    current_week = get_current_week_number()
+    return _construct_weeks_markup(datetime.date.today())
+
+
+@functools.lru_cache(maxsize=2)
+def _construct_weeks_markup(today: datetime.date) -> InlineKeyboardMarkup:
+    current_week = get_week_by_date(today)
     week_indicator = "◖"
     week_indicator1 = "◗"
-    today = datetime.date.today()
 
     for day in ImportantDays.important_days:
         if abs((day[ImportantDays.DATE] - today).days) <= day[ImportantDays.INTERVAL]:
@@ -60,7 +65,44 @@ def construct_weeks_markup():
     return reply_mark
 
 
+def construct_week_selector_markup(is_favorite: bool) -> InlineKeyboardMarkup:
+    """
+    Клавиатура выбора недели с кнопками закрепления и экспорта расписания
+    """
+    weeks = construct_weeks_markup().inline_keyboard
+    pin = InlineKeyboardButton(
+        "✖ Убрать из избранного" if is_favorite else "⭐ В избранное",
+        callback_data="pin",
+    )
+    ics = InlineKeyboardButton("📅 В календарь", callback_data="ics")
+
+    return InlineKeyboardMarkup(weeks[:-1] + ((pin, ics),) + weeks[-1:])
+
+
 def construct_workdays(week: int, schedule: ScheduleData, selected_date=None):
+    """
+    Создает клавиатуру выбора дня недели. Готовая клавиатура запоминается
+    в расписании для пары (неделя, выбранный день)
+    """
+    if isinstance(selected_date, str):
+        selected_date = datetime.date.fromisoformat(selected_date)
+
+    dates = tuple(get_dates_for_week(week))
+    key = ("workdays", dates, selected_date)
+
+    markup = schedule._memo.get(key)
+    if markup is None:
+        markup = _construct_workdays(dates, schedule.lesson_dates, selected_date)
+        schedule._memo[key] = markup
+
+    return markup
+
+
+def _construct_workdays(
+    dates: tuple[datetime.date],
+    lesson_dates: frozenset[datetime.date],
+    selected_date: datetime.date = None,
+) -> InlineKeyboardMarkup:
     weekdays = {
         1: "ПН",
         2: "ВТ",
@@ -70,30 +112,24 @@ def construct_workdays(week: int, schedule: ScheduleData, selected_date=None):
         6: "СБ",
     }
 
-    dates = get_dates_for_week(week)
-    lessons: list[Lesson] = get_lessons(schedule, dates)
-
-    lesson_dates = [lesson.dates for lesson in lessons]
-
     button_rows = []
     row = []
+    has_lessons = False
 
     for i, date in enumerate(dates, start=1):
         sign = ""
         sign1 = ""
         callback = str(date)
 
-        if (
-            selected_date
-            and date
-            == datetime.datetime.strptime(str(selected_date), "%Y-%m-%d").date()
-        ):
+        if date == selected_date:
             sign = "◖"
             sign1 = "◗"
 
         if date not in lesson_dates:
             sign = "⛔"
             callback = "chill"
+        else:
+            has_lessons = True
 
         row.append(
             InlineKeyboardButton(
@@ -106,7 +142,7 @@ def construct_workdays(week: int, schedule: ScheduleData, selected_date=None):
             button_rows.append(tuple(row))
             row = []
 
-    if lesson_dates:
+    if has_lessons:
         button_rows.append(
             (InlineKeyboardButton(text="На неделю", callback_data="week"),)
         )
@@ -115,3 +151,32 @@ def construct_workdays(week: int, schedule: ScheduleData, selected_date=None):
     ready_markup = InlineKeyboardMarkup(button_rows)
 
     return ready_markup
+
+
+def construct_pages_markup(
+    page: int, pages_count: int, workdays: InlineKeyboardMarkup, image: bool = False
+) -> InlineKeyboardMarkup:
+    """
+    Добавляет к клавиатуре выбора дня строку навигации по страницам расписания
+    и, если image, кнопку отправки недели картинкой
+    """
+    rows = workdays.inline_keyboard
+    if image:
+        image_button = InlineKeyboardButton("🖼 Неделя картинкой", callback_data="image")
+        rows = rows[:-1] + ((image_button,),) + rows[-1:]
+
+    if pages_count < 2:
+        return InlineKeyboardMarkup(rows) if image else workdays
+
+    navigation = []
+    if page > 0:
+        navigation.append(InlineKeyboardButton("◀", callback_data=f"page:{page - 1}"))
+
+    navigation.append(
+        InlineKeyboardButton(f"{page + 1}/{pages_count}", callback_data=f"page:{page}")
+    )
+
+    if page < pages_count - 1:
+        navigation.append(InlineKeyboardButton("▶", callback_data=f"page:{page + 1}"))
+
+    return InlineKeyboardMarkup((tuple(navigation),) + rows)
@@ -0,0 +1,180 @@
+import asyncio
+import tracemalloc
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, ContextTypes
+
+from bot.analytics.tracker import analytics
+from bot.config import settings
+from bot.delivery import delivery
+from bot.diagnostics import (
+    SamplingProfiler,
+    current_rss,
+    deep_sizeof_async,
+    sizes_by_key,
+    tracemalloc_top,
+)
+from bot.fetch.schedule import schedule_cache
+from bot.handlers.common import common_windows_cache
+from bot.handlers.inline import inline_cursors, inline_items
+from bot.handlers.send import ics_file_ids, week_image_file_ids
+from bot.handlers.sessions import last_sweep
+from bot.http_api import schedule_server
+from bot.index.lessons import lesson_index
+from bot.index.occupancy import occupancy_index
+from bot.logs.lazy_logger import lazy_logger
+from bot.reminders import reminder_scheduler
+
+CPU_PROFILE_DEFAULT_SECONDS = 10
+CPU_PROFILE_MAX_SECONDS = 120
+# Сколько кадров стека хранит tracemalloc: больше кадров - точнее и дороже
+TRACEMALLOC_FRAMES = 1
+
+_cpu_profile_lock = asyncio.Lock()
+
+
+def megabytes(size: int) -> str:
+    return f"{size / 1024 / 1024:.2f} МБ"
+
+
+def get_caches() -> dict[str, object]:
+    return {
+        "schedule_cache": schedule_cache,
+        "inline_cursors": inline_cursors,
+        "inline_items": inline_items,
+        "ics_file_ids": ics_file_ids,
+        "week_image_file_ids": week_image_file_ids,
+        "common_windows_cache": common_windows_cache,
+        "http_api_schedules": schedule_server.schedules,
+        "occupancy_index": occupancy_index,
+        "lesson_index": lesson_index,
+        "analytics": analytics,
+        "reminder_scheduler": reminder_scheduler,
+    }
+
+
+async def build_memory_report(user_data: list[dict], bot_data: dict) -> str:
+    """
+    Размеры user_data и bot_data по ключам и размеры кэшей.
+    Одно расписание может быть и в кэше, и в user_data, тогда оно учтено в обоих.
+    Обход идет в цикле событий частями, как очистка сессий
+    """
+    rss = current_rss()
+    text = f"🧠 Память процесса: {megabytes(rss) if rss else 'неизвестно'}\n"
+
+    text += f"\n👥 user_data ({len(user_data)} пользователей):\n"
+    for key, (count, size) in (await sizes_by_key(user_data)).items():
+        text += f"{key}: {count} шт., {megabytes(size)}\n"
+    if last_sweep:
+        text += (
+            f"🧹 Последняя очистка сессий: удалено {last_sweep['evicted']} "
+            f"из {last_sweep['checked']}, освобождено "
+            f"{megabytes(last_sweep['reclaimed'])}\n"
+        )
+
+    text += "\n🤖 bot_data:\n"
+    for key, (_, size) in (await sizes_by_key([bot_data])).items():
+        text += f"{key}: {megabytes(size)}\n"
+
+    text += "\n🗄 Кэши и индексы:\n"
+    for name, cache in get_caches().items():
+        count = f"{len(cache)} шт., " if hasattr(cache, "__len__") else ""
+        size = await deep_sizeof_async(cache)
+        text += f"{name}: {count}{megabytes(size)}\n"
+
+    log_queue = lazy_logger.listener.queue.qsize() if lazy_logger.listener else 0
+    text += f"\n📤 Очередь рассылок: {len(delivery)}, очередь логов: {log_queue}\n"
+
+    if tracemalloc.is_tracing():
+        current, peak = tracemalloc.get_traced_memory()
+        text += f"🔍 tracemalloc: {megabytes(current)}, пик {megabytes(peak)}\n"
+
+    return text
+
+
+async def memory_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /mem - размеры данных, /mem top [N] - крупнейшие места выделения памяти
+    по tracemalloc, /mem stop - выключить tracemalloc
+    """
+    if update.message.from_user.id not in settings.admins:
+        return
+
+    action = context.args[0].lower() if context.args else ""
+
+    if action == "top":
+        if not tracemalloc.is_tracing():
+            tracemalloc.start(TRACEMALLOC_FRAMES)
+            text = "🔍 tracemalloc включен, повторите /mem top через несколько минут"
+        else:
+            limit = (
+                int(context.args[1])
+                if len(context.args) > 1 and context.args[1].isdigit()
+                else 15
+            )
+            top = await asyncio.to_thread(tracemalloc_top, limit)
+            text = "🔍 Крупнейшие места выделения памяти:\n\n" + "\n".join(top)
+
+    elif action == "stop":
+        tracemalloc.stop()
+        text = "🔍 tracemalloc выключен"
+
+    else:
+        text = await build_memory_report(
+            list(context.application.user_data.values()),
+            context.application.bot_data,
+        )
+
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=text[:4096],
+    )
+
+
+async def cpu_profile_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /cpu [секунды] - профиль процессора за указанное время
+    """
+    if update.message.from_user.id not in settings.admins:
+        return
+
+    seconds = CPU_PROFILE_DEFAULT_SECONDS
+    if context.args and context.args[0].isdigit():
+        seconds = min(max(int(context.args[0]), 1), CPU_PROFILE_MAX_SECONDS)
+
+    if _cpu_profile_lock.locked():
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="⏳ Профилирование уже идет",
+        )
+        return
+
+    async with _cpu_profile_lock:
+        profiler = SamplingProfiler()
+        try:
+            profiler.start()
+        except RuntimeError as error:
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text=f"❌ Профилирование недоступно: {error}",
+            )
+            return
+
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=f"⏱ Профилирование {seconds} с...",
+        )
+        try:
+            await asyncio.sleep(seconds)
+        finally:
+            profiler.stop()
+
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=f"⏱ Профиль за {seconds} с\n\n{profiler.report()}"[:4096],
+    )
+
+
+def init_handlers(application: Application):
+    application.add_handler(CommandHandler("mem", memory_handler))
+    application.add_handler(CommandHandler("cpu", cpu_profile_handler))
@@ -0,0 +1,227 @@
+import asyncio
+import datetime
+import logging
+import re
+
+from telegram import Update
+from telegram.constants import ChatMemberStatus, ChatType
+from telegram.ext import Application, CommandHandler, ContextTypes
+
+from bot import tasks
+from bot.config import settings
+from bot.db.database import (
+    get_digest_subscriptions,
+    get_digests_at,
+    migrate_digest_chat,
+    subscribe_digest,
+    unsubscribe_digests,
+)
+from bot.db.sqlite import tables_ready
+from bot.delivery import delivery
+from bot.fetch.models import ScheduleData, SearchItem
+from bot.fetch.schedule import get_lessons, get_schedules
+from bot.handlers.common import resolve_item
+from bot.handlers.send import get_type_text
+from bot.parse.formating import format_outputs, paginate
+
+logger = logging.getLogger(__name__)
+
+SEND_AT = re.compile(r"^(?P<hour>[01]?\d|2[0-3])[:.](?P<minute>[0-5]\d)$")
+STOP_WORDS = ("stop", "стоп")
+# На сколько секунд рассылка может опоздать: после долгой остановки цикла
+# (например, сна машины) старые рассылки уже не отправляются
+DIGEST_MAX_DELAY = 15 * 60
+
+USAGE = (
+    "ℹ️ Ежедневная рассылка расписания в этот чат:\n"
+    "`/digest <запрос> [ЧЧ:ММ]` — подписаться, например `/digest ИКБО-01-22 07:30`\n"
+    "`/digest` — список рассылок, `/digest стоп` — отключить все"
+)
+
+
+def parse_digest_args(args: list[str]) -> tuple[str, str | None]:
+    """
+    Разбирает аргументы /digest: запрос и необязательное время ЧЧ:ММ в конце
+    """
+    send_at = None
+    if args:
+        match = SEND_AT.match(args[-1])
+        if match:
+            send_at = f"{int(match['hour']):02d}:{match['minute']}"
+            args = args[:-1]
+
+    return " ".join(args).strip(), send_at
+
+
+def get_digest_pages(
+    item: SearchItem, schedule: ScheduleData, day: datetime.date
+) -> list[str]:
+    """
+    Страницы рассылки на день. Рендер выполняется один раз на расписание и день,
+    сколько бы чатов на него ни было подписано
+    """
+    key = ("digest", day)
+    pages = schedule._memo.get(key)
+
+    if pages is None:
+        lessons = get_lessons(schedule, [day])
+        pages = []
+        if lessons:
+            header = f"☀️ {get_type_text(item)}\n🗓️ Пары на {day:%d.%m.%Y}\n\n"
+            pages = paginate([header] + format_outputs(lessons, None))
+        schedule._memo[key] = pages
+
+    return pages
+
+
+async def send_digests(send_at: str, day: datetime.date):
+    """
+    Ставит в очередь отправки рассылки, назначенные на send_at. Каждое расписание
+    загружается и форматируется один раз для всех подписанных на него чатов
+    """
+    groups = await asyncio.to_thread(get_digests_at, send_at)
+    if not groups:
+        return
+
+    schedules = await get_schedules([item for item, _ in groups])
+
+    queued = 0
+    for (item, chat_ids), schedule in zip(groups, schedules):
+        if schedule is None:
+            logger.warning("Digest schedule %s:%s is unavailable", item.type, item.uid)
+            continue
+
+        pages = get_digest_pages(item, schedule, day)
+        if not pages:
+            continue
+
+        # Страницы одного чата уходят одним заданием, чтобы не перемешались
+        for chat_id in chat_ids:
+            delivery.send(chat_id, *pages)
+        queued += len(chat_ids)
+
+    logger.info(
+        "Digests at %s: %d schedules, %d chats queued", send_at, len(groups), queued
+    )
+
+
+async def run_digests():
+    """
+    В начале каждой минуты запускает отправку рассылок, назначенных на эту
+    минуту. Отправка идет в отдельной задаче, поэтому медленная минута
+    не задерживает следующие. Минуты, пропущенные из-за задержек цикла,
+    отправляются с опозданием, если опоздание не больше DIGEST_MAX_DELAY
+    """
+    moment = datetime.datetime.now().replace(second=0, microsecond=0)
+    while True:
+        moment += datetime.timedelta(minutes=1)
+        now = datetime.datetime.now()
+        delay = (moment - now).total_seconds()
+        if delay > 0:
+            await asyncio.sleep(delay)
+        elif -delay > DIGEST_MAX_DELAY:
+            skipped_to = now - datetime.timedelta(seconds=DIGEST_MAX_DELAY)
+            skipped_to = skipped_to.replace(second=0, microsecond=0)
+            logger.warning(
+                "Daily digests from %s to %s skipped",
+                f"{moment:%H:%M}",
+                f"{skipped_to:%H:%M}",
+            )
+            moment = skipped_to
+            continue
+
+        tasks.start_background(
+            send_digests(f"{moment:%H:%M}", moment.date()),
+            f"daily digests at {moment:%H:%M}",
+        )
+
+
+async def start_digests(application: Application):
+    delivery.start(application.bot, settings.delivery_rate)
+    tasks.start_background(run_digests(), "daily digests")
+
+
+async def is_chat_admin(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    if update.effective_chat.type == ChatType.PRIVATE:
+        return True
+
+    member = await context.bot.get_chat_member(
+        update.effective_chat.id, update.effective_user.id
+    )
+    return member.status in (ChatMemberStatus.ADMINISTRATOR, ChatMemberStatus.OWNER)
+
+
+async def digest_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Реакция бота на команду /digest: подписка чата на ежедневную рассылку
+    расписания, список рассылок и их отключение
+    """
+    if context.bot_data["maintenance_mode"]:
+        return
+
+    chat_id = update.effective_chat.id
+    query, send_at = parse_digest_args(context.args or [])
+
+    if not query:
+        subscriptions = get_digest_subscriptions(chat_id)
+        text = USAGE
+        if subscriptions:
+            text += "\n\n📬 Рассылки этого чата:\n" + "".join(
+                f"{subscription_time} — {item.name}\n"
+                for item, subscription_time in subscriptions
+            )
+        await context.bot.send_message(
+            chat_id=chat_id, text=text, parse_mode="Markdown"
+        )
+        return
+
+    if not await is_chat_admin(update, context):
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text="❌ Настраивать рассылку могут только администраторы чата",
+        )
+        return
+
+    if not tables_ready.is_set():
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text="⏳ База данных ещё готовится, попробуйте через минуту",
+        )
+        return
+
+    if query.lower() in STOP_WORDS:
+        removed = unsubscribe_digests(chat_id)
+        await context.bot.send_message(
+            chat_id=chat_id,
+            text=(
+                f"✅ Рассылки отключены: {removed}"
+                if removed
+                else "ℹ️ В этом чате нет рассылок"
+            ),
+        )
+        return
+
+    result = await resolve_item(query)
+
+    if result is None:
+        text = "❌ Не нашлось результатов по вашему запросу\nПопробуйте еще раз"
+    elif isinstance(result, list):
+        options = ", ".join(item.name for item in result[:5])
+        text = f"❓ Уточните запрос: {options}"
+    else:
+        send_at = send_at or settings.digest_time
+        subscribe_digest(chat_id, result, send_at)
+        text = (
+            f"✅ Каждый день в {send_at} сюда будет приходить расписание: "
+            f"{result.name}\nОтключить: /digest стоп"
+        )
+
+    await context.bot.send_message(chat_id=chat_id, text=text)
+
+
+def init_handlers(application: Application):
+    application.add_handler(CommandHandler("digest", digest_handler))
+
+
+delivery.gone_listeners.append(unsubscribe_digests)
+delivery.migrate_listeners.append(migrate_digest_chat)
@@ -4,8 +4,12 @@ from telegram import Update
 from telegram.ext import Application, CommandHandler, ContextTypes
 
 import bot.logs.lazy_logger as logger
+from bot.analytics.tracker import analytics
 from bot.config import settings
 from bot.db.sqlite import ScheduleBot, db
+from bot.fetch import upstream
+from bot.prefetch import schedule_prefetcher
+from bot.updates import ChatOrderedUpdateProcessor
 
 
 async def toggle_maintenance_mode(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -67,10 +71,72 @@ async def send_message_to_all_users(update: Update, context: ContextTypes.DEFAUL
             db.close()
 
 
-def init_handlers(application: Application):
-    application.add_handler(
-        CommandHandler("work", toggle_maintenance_mode, block=False)
+async def show_stats(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Show popular schedules, queries and hourly requests"""
+
+    if update.message.from_user.id not in settings.admins:
+        return
+
+    hours = int(context.args[0]) if context.args and context.args[0].isdigit() else 24
+
+    text = f"📊 Статистика за {hours} ч.\n\n👥 Популярные расписания:\n"
+    for name, count in analytics.top_items(hours=hours):
+        text += f"{count} — {name}\n"
+
+    text += "\n🔎 Популярные запросы:\n"
+    for query, count in analytics.top_queries(hours=hours):
+        text += f"{count} — {query}\n"
+
+    hourly = analytics.hourly_requests(hours=hours)
+    peak = max((count for _, count in hourly), default=0)
+
+    text += "\n🕐 Запросы по часам:\n"
+    for hour, count in hourly:
+        bar = "▇" * round(10 * count / peak) if peak else ""
+        text += f"{hour:%d.%m %H:00} {bar} {count}\n"
+
+    processor = context.application.update_processor
+    if isinstance(processor, ChatOrderedUpdateProcessor):
+        updates = processor.stats()
+        text += (
+            f"\n⚙️ Обновления: {updates['active']}/{updates['limit']} в работе, "
+            f"{updates['waiting']} в очереди (макс. {updates['max_waiting']}), "
+            f"обработано {updates['processed']}\n"
+            f"⏱ Ожидание: p50 {updates['wait_p50'] * 1000:.0f} мс, "
+            f"p95 {updates['wait_p95'] * 1000:.0f} мс, "
+            f"макс. {updates['wait_max'] * 1000:.0f} мс\n"
+        )
+
+    prefetch = schedule_prefetcher.stats()
+    if prefetch["started"]:
+        text += (
+            f"\n🔮 Упреждающие загрузки: {prefetch['started']}, "
+            f"выбрано загруженных заранее {prefetch['hits']} "
+            f"({prefetch['hit_rate']:.0%})\n"
+        )
+
+    if upstream.latency_stats:
+        text += "\n🌐 Запросы к API (p50 / p95 / p99, мс):\n"
+    for endpoint, stats in sorted(upstream.latency_stats.items()):
+        text += (
+            f"{endpoint}: {stats.quantile(0.5) * 1000:.0f} / "
+            f"{stats.quantile(0.95) * 1000:.0f} / {stats.quantile(0.99) * 1000:.0f}, "
+            f"запросов {stats.requests}, повторов {stats.retries}, "
+            f"дублей {stats.hedged} (успешных {stats.hedge_wins}), "
+            f"ошибок {stats.failures}\n"
+        )
+
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=text[:4096],
     )
+
+
+def init_handlers(application: Application):
+    application.add_handler(CommandHandler("work", toggle_maintenance_mode))
+    # Рассылка идет долго, поэтому выполняется вне очереди обновлений
+    # и не занимает слот обработки
     application.add_handler(
         CommandHandler("send", send_message_to_all_users, block=False)
     )
+    application.add_handler(CommandHandler("stats", show_stats))
@@ -1,24 +1,41 @@
+import asyncio
 import datetime
-import json
+import logging
 
 from telegram import Update
-from telegram.error import BadRequest
+from telegram.error import BadRequest, Forbidden
 from telegram.ext import (
     Application,
     CallbackQueryHandler,
     ContextTypes,
+    CommandHandler,
     ConversationHandler,
     MessageHandler,
     filters,
 )
 
-from bot.db.database import insert_new_user
-from bot.fetch.models import SearchItem
-from bot.fetch.schedule import get_schedule
-from bot.fetch.search import search_schedule
+from bot import tasks
+from bot.analytics.tracker import analytics
+from bot.config import settings
+from bot.db.database import get_favorites, insert_new_user, toggle_favorite
+from bot.db.sqlite import tables_ready
+from bot.fetch.models import ScheduleEndpoints, SearchItem
+from bot.fetch.schedule import get_schedule, is_schedule_cached
+from bot.fetch.search import (
+    collect_search_results,
+    iter_search_schedule,
+    search_schedule,
+)
 from bot.handlers import send as send
 from bot.handlers import states as st
+from bot.handlers.remind import sync_user_reminders
 from bot.logs.lazy_logger import lazy_logger
+from bot.prefetch import schedule_prefetcher
+
+# Сколько раз можно отредактировать клавиатуру уточнения, пока догружаются
+# результаты остальных эндпоинтов поиска
+SEARCH_MAX_EDITS = 2
+LOADING_TEXT = "⏳ Загружаю расписание..."
 
 
 async def get_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -36,21 +53,24 @@ async def get_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     insert_new_user(update, context)
 
     user_query = update.message.text
-    lazy_logger.logger.info(
-        json.dumps(
-            {
-                "type": "request",
-                "query": user_query.lower(),
-                **update.message.from_user.to_dict(),
-            },
-            ensure_ascii=False,
-        )
+    from_user = update.message.from_user
+    lazy_logger.log_json(
+        logging.INFO,
+        lambda: {
+            "type": "request",
+            "query": user_query.lower(),
+            **from_user.to_dict(),
+        },
+        sampled=True,
     )
 
     if context.bot_data["maintenance_mode"]:
         await maintenance_message(update, context)
         return
 
+    analytics.record_query(user_query)
+    context.user_data.pop("favorite_view", None)
+
     if len(user_query) < 3:
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
@@ -66,8 +86,20 @@ async def get_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
 
+    if settings.progressive_search:
+        return await progressive_search(update, context, user_query)
+
     schedule_items = await search_schedule(user_query)
 
+    return await reply_search_results(update, context, schedule_items, user_query)
+
+
+async def reply_search_results(
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    schedule_items: list[SearchItem] | None,
+    user_query: str = None,
+):
     if schedule_items is None:
         await context.bot.send_message(
             chat_id=update.effective_chat.id,
@@ -77,6 +109,9 @@ async def get_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     if len(schedule_items) > 1:
         context.user_data["available_items"] = schedule_items
+        schedule_prefetcher.prefetch(
+            update.effective_user.id, user_query, schedule_items
+        )
         return await send.send_item_clarity(update, context, True)
 
     elif len(schedule_items) == 0:
@@ -89,11 +124,137 @@ async def get_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     else:
         context.user_data["available_items"] = None
         context.user_data["item"] = schedule_items[0]
+        analytics.record_item(schedule_items[0])
         context.user_data["schedule"] = await get_schedule(schedule_items[0])
 
         return await send.send_week_selector(update, context, True)
 
 
+async def progressive_search(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, user_query: str
+):
+    """
+    Отвечает, как только первый из эндпоинтов поиска вернул результаты.
+    Точное совпадение сразу открывает расписание, иначе отправляется клавиатура
+    уточнения, которая дополняется по мере ответа остальных эндпоинтов
+    """
+    searches = iter_search_schedule(user_query)
+    results = {}
+
+    async for search_type, items in searches:
+        results[search_type] = items
+        if items and len(results) < len(ScheduleEndpoints):
+            break
+    else:
+        return await reply_search_results(
+            update, context, collect_search_results(results), user_query
+        )
+
+    schedule_items = collect_search_results(results)
+    # Единственный результат сразу открывает расписание, как и без
+    # постепенного поиска; результаты остальных разделов станут доступны по «Назад»
+    exact_match = len(schedule_items) == 1
+
+    token = object()
+    context.user_data["progressive_search"] = token
+
+    try:
+        if exact_match:
+            state = await reply_search_results(update, context, schedule_items)
+        else:
+            context.user_data["available_items"] = schedule_items
+            schedule_prefetcher.prefetch(
+                update.effective_user.id, user_query, schedule_items
+            )
+            state = await send.send_item_clarity(update, context, True, searching=True)
+    except BaseException:
+        await searches.aclose()
+        raise
+
+    tasks.start_background(
+        finish_progressive_search(
+            context,
+            update.effective_chat.id,
+            searches,
+            results,
+            token,
+            clarifying=not exact_match,
+            user_id=update.effective_user.id,
+            user_query=user_query,
+        ),
+        "progressive search",
+    )
+    return state
+
+
+async def finish_progressive_search(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    searches,
+    results: dict,
+    token: object,
+    clarifying: bool,
+    user_id: int = None,
+    user_query: str = None,
+):
+    """
+    Дожидается остальных эндпоинтов и добавляет их результаты в available_items.
+    Клавиатура редактируется не больше SEARCH_MAX_EDITS раз и только пока
+    пользователь ничего не выбрал
+    """
+    edits = 0
+
+    try:
+        async for search_type, items in searches:
+            results[search_type] = items
+            if context.user_data.get("progressive_search") is not token:
+                return
+            if not items:
+                continue
+
+            context.user_data["available_items"] = collect_search_results(results)
+            if clarifying and user_id is not None:
+                schedule_prefetcher.prefetch(
+                    user_id, user_query, context.user_data["available_items"]
+                )
+            # Последняя правка приберегается, чтобы убрать пометку о поиске
+            if (
+                clarifying
+                and edits < SEARCH_MAX_EDITS - 1
+                and len(results) < len(ScheduleEndpoints)
+            ):
+                if await edit_item_clarity(context, user_id, chat_id, token, True):
+                    edits += 1
+
+        if clarifying:
+            await edit_item_clarity(context, user_id, chat_id, token, False)
+
+    finally:
+        await searches.aclose()
+
+
+async def edit_item_clarity(
+    context: ContextTypes.DEFAULT_TYPE,
+    user_id: int,
+    chat_id: int,
+    token: object,
+    searching: bool,
+) -> bool:
+    """
+    Правка клавиатуры уточнения из фоновой задачи. Идет в очереди обновлений
+    пользователя, чтобы не вклиниться в обработку его нажатия, и только если
+    он еще ничего не выбрал. Возвращает False, если правка не нужна
+    """
+    async with context.application.update_processor.lane(user_id):
+        if context.user_data.get("progressive_search") is not token:
+            return False
+
+        await send.update_item_clarity(
+            context, chat_id, context.user_data["message_id"], searching=searching
+        )
+        return True
+
+
 async def got_item_clarification_handler(
     update: Update, context: ContextTypes.DEFAULT_TYPE
 ):
@@ -102,6 +263,9 @@ async def got_item_clarification_handler(
     if await deny_old_message(update, context, query=query):
         return
 
+    # Пользователь сделал выбор, догружаемые результаты поиска больше не нужны
+    context.user_data.pop("progressive_search", None)
+
     if query.data == "back":
         return await send.resend_name_input(update, context)
 
@@ -119,14 +283,21 @@ async def got_item_clarification_handler(
         await update.callback_query.answer(
             text="Ошибка, сделайте новый запрос", show_alert=True
         )
+        return
 
     context.user_data["item"] = selected_item
-    clarified_schedule = await get_schedule(selected_item)
-    context.user_data["schedule"] = clarified_schedule
+    analytics.record_item(selected_item)
+    schedule_prefetcher.record_choice(update.effective_user.id, selected_item)
 
-    await query.answer()
+    if context.user_data.get("favorite_view"):
+        await load_schedule(context, query.answer(), loading=query)
+        return await send.send_favorite_view(update, context)
 
-    return await send.send_week_selector(update, context)
+    # Выбор недели не зависит от расписания и показывается, пока оно загружается
+    _, state = await load_schedule(
+        context, query.answer(), send.send_week_selector(update, context)
+    )
+    return state
 
 
 async def got_week_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -163,6 +334,41 @@ async def got_week_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
         return await send.send_result(update, context)
 
+    elif selected_button == "pin":
+        if not tables_ready.is_set():
+            await update.callback_query.answer(
+                text="⏳ База данных ещё готовится, попробуйте через минуту",
+                show_alert=True,
+            )
+
+            return st.GETWEEK
+
+        pinned = toggle_favorite(update.effective_user.id, context.user_data["item"])
+        sync_user_reminders(update.effective_user.id)
+        await update.callback_query.answer(
+            text=(
+                "⭐ Расписание закреплено, используйте /today, /tomorrow и /week"
+                if pinned
+                else "Расписание откреплено"
+            ),
+            show_alert=pinned,
+        )
+
+        return await send.send_week_selector(update, context)
+
+    elif selected_button == "ics":
+        try:
+            await send.send_ics(update, context)
+        except Forbidden:
+            await update.callback_query.answer(
+                text="Напишите боту в личные сообщения, чтобы получить файл",
+                show_alert=True,
+            )
+        else:
+            await update.callback_query.answer()
+
+        return st.GETWEEK
+
     elif selected_button.isdigit():
         selected_week = int(selected_button)
         context.user_data["week"] = selected_week
@@ -186,6 +392,7 @@ async def got_day_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
     query = update.callback_query
     show_week = False
+    page = 0
     if await deny_old_message(update, context, query=query):
         return
 
@@ -199,7 +406,27 @@ async def got_day_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if selected_button == "back":
         return await send.send_week_selector(update, context)
 
-    if selected_button == "week":
+    if selected_button == "image":
+        try:
+            sent = await send.send_week_image(update, context)
+        except Forbidden:
+            await query.answer(
+                text="Напишите боту в личные сообщения, чтобы получить картинку",
+                show_alert=True,
+            )
+        else:
+            if sent:
+                await query.answer()
+            else:
+                await query.answer(text="На этой неделе пар нет.", show_alert=True)
+
+        return st.GETDAY
+
+    if selected_button.startswith("page:"):
+        show_week = context.user_data.get("show_week", False)
+        page = int(selected_button.split(":")[1])
+
+    elif selected_button == "week":
         selected_day = None
         show_week = True
 
@@ -208,16 +435,102 @@ async def got_day_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
         context.user_data["date"] = selected_day
 
     try:
-        await send.send_result(update, context, show_week=show_week)
+        state = await send.send_result(
+            update, context, show_week=show_week, page=page
+        )
 
     except BadRequest:
         await update.callback_query.answer(
-            text="Вы уже выбрали этот день", show_alert=False
+            text=(
+                "Вы уже на этой странице"
+                if selected_button.startswith("page:")
+                else "Вы уже выбрали этот день"
+            ),
+            show_alert=False,
         )
-    else:
-        await query.answer()
+        return st.GETDAY
+
+    # None - пар нет, на нажатие уже ответили предупреждением
+    if state is None:
+        return st.GETDAY
 
-    return st.GETDAY
+    await query.answer()
+    # GETWEEK, если вместо пустого дня показан выбор недели
+    return state
+
+
+async def favorite_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Реакция бота на команды /today, /tomorrow и /week: расписание по закрепленным
+    расписаниям пользователя без поиска
+    :param update - Update класс API
+    :param context - CallbackContext класс API
+    :return: int сигнатура следующего состояния
+    """
+    if context.bot_data["maintenance_mode"]:
+        await maintenance_message(update, context)
+        return
+
+    favorites = get_favorites(update.effective_user.id)
+
+    if not favorites:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="⭐ У вас нет закрепленных расписаний\n"
+            "Найдите расписание и нажмите «⭐ В избранное» под списком недель",
+        )
+        return
+
+    command = update.message.text.split()[0].lstrip("/").split("@")[0].lower()
+    context.user_data["favorite_view"] = command
+
+    if len(favorites) > 1:
+        context.user_data["available_items"] = favorites
+        schedule_prefetcher.prefetch(update.effective_user.id, None, favorites)
+        return await send.send_item_clarity(update, context, True)
+
+    context.user_data["available_items"] = None
+    context.user_data["item"] = favorites[0]
+    analytics.record_item(favorites[0])
+    context.user_data["schedule"] = await get_schedule(favorites[0])
+
+    return await send.send_favorite_view(update, context)
+
+
+async def ics_command_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Реакция бота на команду /ics: экспорт открытого расписания в календарь
+    """
+    if context.user_data.get("item") is None or not context.user_data.get("schedule"):
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="ℹ️ Сначала найдите расписание, затем отправьте /ics "
+            "или нажмите «📅 В календарь» под списком недель",
+        )
+        return
+
+    await send.send_ics(update, context)
+
+
+async def load_schedule(context: ContextTypes.DEFAULT_TYPE, *calls, loading=None):
+    """
+    Загружает расписание context.user_data["item"] одновременно с запросами
+    к Telegram из calls, которые от него не зависят. Если расписания нет в кэше
+    и передан loading (CallbackQuery), на время загрузки его сообщение
+    заменяется на LOADING_TEXT. Возвращает результаты calls
+    """
+    item = context.user_data["item"]
+    # По этой отметке send_result перерисовывает сообщение и тогда, когда пар нет
+    loading_shown = loading is not None and not is_schedule_cached(item)
+    context.user_data["loading_shown"] = loading_shown
+    if loading_shown:
+        calls += (loading.edit_message_text(LOADING_TEXT),)
+
+    fetch = asyncio.create_task(get_schedule(item))
+    try:
+        return await asyncio.gather(*calls)
+    finally:
+        context.user_data["schedule"] = await fetch
 
 
 async def deny_old_message(
@@ -258,23 +571,23 @@ async def maintenance_message(update: Update, context: ContextTypes.DEFAULT_TYPE
 
 
 def init_handlers(application: Application):
+    favorite_commands = CommandHandler(
+        ["today", "tomorrow", "week"], favorite_command_handler
+    )
     conv_handler = ConversationHandler(
         entry_points=[
-            MessageHandler(
-                filters.TEXT & ~filters.COMMAND, get_query_handler, block=False
-            ),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, get_query_handler),
+            favorite_commands,
         ],
         states={
-            st.ITEM_CLARIFY: [
-                CallbackQueryHandler(got_item_clarification_handler, block=False)
-            ],
-            st.GETDAY: [CallbackQueryHandler(got_day_handler, block=False)],
-            st.GETWEEK: [CallbackQueryHandler(got_week_handler, block=False)],
+            st.ITEM_CLARIFY: [CallbackQueryHandler(got_item_clarification_handler)],
+            st.GETDAY: [CallbackQueryHandler(got_day_handler)],
+            st.GETWEEK: [CallbackQueryHandler(got_week_handler)],
         },
         fallbacks=[
-            MessageHandler(
-                filters.TEXT & ~filters.COMMAND, get_query_handler, block=False
-            ),
+            MessageHandler(filters.TEXT & ~filters.COMMAND, get_query_handler),
+            favorite_commands,
         ],
     )
     application.add_handler(conv_handler)
+    application.add_handler(CommandHandler("ics", ics_command_handler))
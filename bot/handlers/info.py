@@ -15,6 +15,8 @@ async def start(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "Теперь доступен поиск по аудиториям и группам!\n"
         "Примеры:\n\n`И-202`\n`В-108`\n`И202а`\n\n"
         "Для поиска по группам напишите название группы, примеры:\n\n`ИВБО20`\n`КТСО-01-23`\n`ИКБО`\n\n"
+        "Нажмите «⭐ В избранное», чтобы закрепить расписание, и получайте его "
+        "командами /today, /tomorrow и /week без поиска.\n\n"
         "Также вы можете использовать inline-режим, "
         "для этого в любом чате наберите *@mirea_teachers_bot* + *фамилию* и нажмите на кнопку с фамилией "
         "преподавателя.\n\n",
@@ -1,6 +1,11 @@
-import json
+import logging
 
-from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram import (
+    ChosenInlineResult,
+    InlineQueryResultArticle,
+    InputTextMessageContent,
+    Update,
+)
 from telegram.ext import (
     Application,
     CallbackContext,
@@ -12,13 +17,26 @@ from telegram.ext import (
 
 import bot.handlers.construct as construct
 import bot.handlers.handler as handler
+import bot.handlers.now as now
 import bot.logs.lazy_logger as logger
+from bot.analytics.tracker import analytics
+from bot.fetch.cache import TTLCache
 from bot.fetch.models import SearchItem
-from bot.fetch.schedule import get_schedule
 from bot.fetch.search import search_schedule
 from bot.handlers import states as st
 from bot.handlers.states import EInlineStep
 
+# Telegram отдает не больше 50 результатов за раз, остальные запрашиваются через offset
+INLINE_PAGE_SIZE = 20
+# Результаты не зависят от пользователя, поэтому Telegram может кэшировать их для всех
+INLINE_CACHE_TIME = 300
+
+# Курсоры постраничной выдачи: запрос -> найденные расписания
+inline_cursors = TTLCache(maxsize=1024, ttl=INLINE_CACHE_TIME * 2)
+# Расписания по id результата, чтобы определить выбор без user_data,
+# так как закэшированную Telegram выдачу мог получить другой пользователь
+inline_items = TTLCache(maxsize=16384, ttl=INLINE_CACHE_TIME * 12)
+
 
 async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -32,20 +50,25 @@ async def handle_inline_query(update: Update, context: ContextTypes.DEFAULT_TYPE
     if len(update.inline_query.query) < 2:
         return
 
-    logger.lazy_logger.logger.info(
-        json.dumps(
-            {
-                "type": "query",
-                "queryId": update.inline_query.id,
-                "query": update.inline_query.query.lower(),
-                **update.inline_query.from_user.to_dict(),
-            },
-            ensure_ascii=False,
-        )
+    inline_query = update.inline_query
+    logger.lazy_logger.log_json(
+        logging.INFO,
+        lambda: {
+            "type": "query",
+            "queryId": inline_query.id,
+            "query": inline_query.query.lower(),
+            **inline_query.from_user.to_dict(),
+        },
+        sampled=True,
     )
 
-    inline_query = update.inline_query
     query = inline_query.query.lower()
+    analytics.record_query(query)
+
+    now_query = now.get_now_inline_query(query)
+    if now_query is not None:
+        await now.handle_now_inline_query(update, context, now_query)
+        return
 
     await handle_query(update, context, query)
 
@@ -59,15 +82,28 @@ async def handle_query(update: Update, context: CallbackContext, query: str):
     if len(query) < 3:
         return
 
-    schedule_items: list[SearchItem] = await search_schedule(query)
+    offset = update.inline_query.offset
+    offset = int(offset) if offset.isdigit() else 0
+
+    schedule_items: list[SearchItem] = inline_cursors.get(query)
 
     if schedule_items is None:
-        return
+        schedule_items = await search_schedule(query)
+
+        if schedule_items is None:
+            return
+
+        inline_cursors.set(query, schedule_items)
+        for item in schedule_items:
+            inline_items.set(f"{item.type}:{item.uid}", item)
+
+    page = schedule_items[offset : offset + INLINE_PAGE_SIZE]
+    next_offset = offset + INLINE_PAGE_SIZE
+    next_offset = str(next_offset) if next_offset < len(schedule_items) else ""
 
     inline_results = []
 
-    context.user_data["available_items"] = schedule_items
-    for item in schedule_items:
+    for item in page:
         inline_results.append(
             InlineQueryResultArticle(
                 id=f"{item.type}:{item.uid}",
@@ -81,7 +117,12 @@ async def handle_query(update: Update, context: CallbackContext, query: str):
             )
         )
 
-    await update.inline_query.answer(inline_results, cache_time=10, is_personal=True)
+    await update.inline_query.answer(
+        inline_results,
+        cache_time=INLINE_CACHE_TIME,
+        is_personal=False,
+        next_offset=next_offset,
+    )
 
 
 async def answer_inline_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -90,18 +131,23 @@ async def answer_inline_handler(update: Update, context: ContextTypes.DEFAULT_TY
     и выставляет текущий шаг Inline запроса на ask_day
     """
     if update.chosen_inline_result is not None:
-        print(update.chosen_inline_result.result_id)
-        type, uid = update.chosen_inline_result.result_id.split(":")
-        schedule_items: list[SearchItem] = context.user_data["available_items"]
+        result_id = update.chosen_inline_result.result_id
 
-        selected_item = None
-        for item in schedule_items:
-            if item.type == type and item.uid == int(uid):
-                selected_item: SearchItem = item
-                break
+        # Ответы "где сейчас" не открывают меню выбора недели
+        if result_id.startswith("now:"):
+            return
+
+        selected_item = await resolve_chosen_item(update.chosen_inline_result)
+
+        if selected_item is None:
+            await context.bot.edit_message_text(
+                "❌ Не удалось открыть расписание, повторите запрос",
+                inline_message_id=update.chosen_inline_result.inline_message_id,
+            )
+            return
 
         context.user_data["item"] = selected_item
-        print(selected_item)
+        analytics.record_item(selected_item)
 
         context.user_data["inline_step"] = EInlineStep.ask_week
         context.user_data[
@@ -112,6 +158,21 @@ async def answer_inline_handler(update: Update, context: ContextTypes.DEFAULT_TY
     return
 
 
+async def resolve_chosen_item(result: ChosenInlineResult) -> SearchItem | None:
+    """
+    Расписание выбранного результата. Если оно уже вытеснено из inline_items,
+    поиск повторяется по запросу результата: без названия расписания меню
+    показать нельзя
+    """
+    selected_item = inline_items.get(result.result_id)
+    if selected_item is not None:
+        return selected_item
+
+    for item in await search_schedule(result.query.lower().title()) or ():
+        inline_items.set(f"{item.type}:{item.uid}", item)
+    return inline_items.get(result.result_id)
+
+
 async def inline_dispatcher(update: Update, context: CallbackContext):
     """
     Обработка вызовов в чатах на основании Callback вызова
@@ -136,7 +197,25 @@ async def inline_dispatcher(update: Update, context: CallbackContext):
         await deny_inline_usage(update)
         return
 
-    context.user_data["schedule"] = await get_schedule(context.user_data["item"])
+    # Кнопки, после которых сообщение перерисовывается по расписанию:
+    # пока оно загружается, в сообщении показывается индикатор загрузки
+    data = update.callback_query.data
+    redraws = data not in ("back", "chill", "pin", "ics", "image")
+    await handler.load_schedule(
+        context, loading=update.callback_query if redraws else None
+    )
+
+    if context.user_data["schedule"] is None:
+        # Индикатор загрузки заменяется выбором недели, чтобы можно было повторить
+        if context.user_data.pop("loading_shown", False):
+            await update.callback_query.edit_message_text(
+                "❌ Не удалось получить расписание, попробуйте позже\n"
+                "🗓️ Выберите неделю:",
+                reply_markup=construct.construct_weeks_markup(),
+            )
+            context.user_data["inline_step"] = EInlineStep.ask_week
+        await update.callback_query.answer()
+        return
 
     if status == EInlineStep.ask_week:  # Изначально мы находимся на этапе выбора недели
         context.user_data["available_items"] = None
@@ -171,8 +250,6 @@ async def deny_inline_usage(update: Update):
 
 
 def init_handlers(application: Application):
-    application.add_handler(InlineQueryHandler(handle_inline_query, block=False))
-    application.add_handler(
-        ChosenInlineResultHandler(answer_inline_handler, block=False)
-    )
-    application.add_handler(CallbackQueryHandler(inline_dispatcher, block=False))
+    application.add_handler(InlineQueryHandler(handle_inline_query))
+    application.add_handler(ChosenInlineResultHandler(answer_inline_handler))
+    application.add_handler(CallbackQueryHandler(inline_dispatcher))
@@ -0,0 +1,174 @@
+import datetime
+import itertools
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, ContextTypes
+
+from bot import tasks
+from bot.config import settings
+from bot.index.lessons import lesson_index, tokenize
+from bot.parse.formating import get_lesson_type_name
+
+# Сколько пар выводится в ответе на один запрос
+LESSONS_MAX_RESULTS = 30
+
+USAGE = (
+    "ℹ️ Поиск пар по всем группам: /lessons [предмет] [тип] [дата]\n"
+    "Например: `/lessons матанализ лекция` — лекции на этой неделе, "
+    "`/lessons физика лаб 20.01` — лабораторные 20 января, "
+    "`/lessons экзамен 20.01` — все экзамены 20 января\n"
+    "Дата: ДД.ММ[.ГГГГ], `сегодня` или `завтра`"
+)
+
+# Слово запроса -> тип пары в API
+LESSON_TYPES = {
+    "лекция": "lecture",
+    "лекции": "lecture",
+    "лек": "lecture",
+    "практика": "practice",
+    "практики": "practice",
+    "пр": "practice",
+    "лаб": "laboratorywork",
+    "лабы": "laboratorywork",
+    "лабораторная": "laboratorywork",
+    "лабораторные": "laboratorywork",
+    "экзамен": "exam",
+    "экзамены": "exam",
+    "зачет": "credit",
+    "зачеты": "credit",
+    "консультация": "consultation",
+    "консультации": "consultation",
+}
+
+
+def parse_lessons_args(
+    args: list[str],
+) -> tuple[str, str | None, list[datetime.date]]:
+    """
+    Разбирает аргументы /lessons: слова предмета, тип пары и день.
+    Без дня ищутся пары текущей недели с понедельника по воскресенье
+    """
+    today = datetime.date.today()
+    words = []
+    lesson_type = None
+    day = None
+
+    for arg in args:
+        word = arg.lower().replace("ё", "е")
+        if word in LESSON_TYPES:
+            lesson_type = LESSON_TYPES[word]
+            continue
+
+        if word == "сегодня":
+            day = today
+            continue
+
+        if word == "завтра":
+            day = today + datetime.timedelta(days=1)
+            continue
+
+        if "." in word:
+            parts = word.split(".")
+            try:
+                year = int(parts[2]) if len(parts) > 2 else today.year
+                day = datetime.date(year, int(parts[1]), int(parts[0]))
+                continue
+            except (ValueError, IndexError):
+                pass
+
+        words.append(arg)
+
+    if day:
+        days = [day]
+    else:
+        monday = today - datetime.timedelta(days=today.weekday())
+        days = [monday + datetime.timedelta(days=i) for i in range(7)]
+
+    return " ".join(words), lesson_type, days
+
+
+def format_found_lessons(results: list, limit: int) -> str:
+    text = ""
+    by_day = itertools.groupby(results[:limit], key=lambda result: result[0])
+    for day, lessons in by_day:
+        text += f"\n📅 {day:%d.%m.%Y}\n"
+        for _, entry, groups in lessons:
+            text += (
+                f"{entry.number} пара ({entry.start_time}) — {entry.subject}, "
+                f"{get_lesson_type_name(entry.lesson_type)}\n"
+            )
+            details = [entry.classroom, entry.teachers, ", ".join(groups)]
+            text += "   " + " · ".join(detail for detail in details if detail) + "\n"
+
+    if len(results) > limit:
+        text += f"\n…и еще {len(results) - limit}, уточните запрос или дату"
+    return text
+
+
+async def lessons_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Реакция бота на команду /lessons: пары по предмету во всех группах
+    """
+    if context.bot_data["maintenance_mode"]:
+        return
+
+    subject, lesson_type, days = parse_lessons_args(context.args or [])
+
+    words = tokenize(subject)
+    if words:
+        valid = any(len(word) >= 3 for word in words)
+    else:
+        # Без предмета ищутся все пары, но только с типом или конкретным днем
+        valid = lesson_type is not None or len(days) == 1
+
+    if not valid:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=USAGE,
+            parse_mode="Markdown",
+        )
+        return
+
+    if not len(lesson_index):
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="⏳ Индекс пар ещё строится, попробуйте через пару минут",
+        )
+        return
+
+    results = lesson_index.search(subject, lesson_type, days)
+    period = (
+        f"{days[0]:%d.%m.%Y}"
+        if len(days) == 1
+        else f"{days[0]:%d.%m} – {days[-1]:%d.%m.%Y}"
+    )
+
+    query = [subject] if subject else []
+    if lesson_type:
+        query.append(get_lesson_type_name(lesson_type).lower())
+    text = f"🔎 {', '.join(query) or 'все пары'}\n🗓 {period}\n"
+    text += (
+        format_found_lessons(results, LESSONS_MAX_RESULTS)
+        if results
+        else "\nПар не найдено"
+    )
+
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=text[:4096],
+    )
+
+
+async def build_lesson_index(application):
+    tasks.start_background(
+        lesson_index.refresh(settings.fetch_concurrency), "lesson index"
+    )
+    tasks.start_periodic(
+        lambda: lesson_index.refresh(settings.fetch_concurrency),
+        settings.lesson_index_refresh_interval,
+        "lesson index refresh",
+    )
+
+
+def init_handlers(application: Application):
+    application.add_handler(CommandHandler("lessons", lessons_handler))
@@ -0,0 +1,117 @@
+import asyncio
+import datetime
+
+from telegram import InlineQueryResultArticle, InputTextMessageContent, Update
+from telegram.ext import Application, CallbackContext, CommandHandler, ContextTypes
+
+from bot.db.database import get_favorites
+from bot.fetch.models import SearchItem
+from bot.fetch.schedule import get_schedule
+from bot.fetch.search import search_schedule
+from bot.handlers.send import get_type_text
+from bot.index.intervals import LessonIntervals
+from bot.parse.formating import format_now_next
+
+# Сколько совпадений показывать в ответе на /now и в inline-режиме
+NOW_MAX_ITEMS = 3
+NOW_MAX_INLINE_ITEMS = 5
+# Inline-запросы вида "@bot сейчас Иванов"
+NOW_INLINE_PREFIXES = ("сейчас ", "now ")
+# Ответ зависит от текущего времени, поэтому Telegram кэширует его недолго
+NOW_INLINE_CACHE_TIME = 60
+
+
+async def get_now_text(item: SearchItem) -> str | None:
+    schedule = await get_schedule(item)
+    if schedule is None:
+        return None
+
+    moment = datetime.datetime.now()
+    current, upcoming = LessonIntervals.for_schedule(schedule).now_and_next(moment)
+
+    return format_now_next(get_type_text(item), current, upcoming, moment)
+
+
+async def now_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Реакция бота на команду /now: где сейчас преподаватель, группа или аудитория
+    и какая пара следующая. Без аргументов используются закрепленные расписания
+    """
+    if context.bot_data["maintenance_mode"]:
+        return
+
+    query = " ".join(context.args or [])
+
+    if query:
+        items = await search_schedule(query) if len(query) >= 3 else []
+    else:
+        items = get_favorites(update.effective_user.id)
+
+    if not items:
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="ℹ️ Напишите /now и фамилию преподавателя, группу или аудиторию, "
+            "например: `/now Иванов`\nБез запроса используются закрепленные расписания",
+            parse_mode="Markdown",
+        )
+        return
+
+    texts = await asyncio.gather(
+        *(get_now_text(item) for item in items[:NOW_MAX_ITEMS])
+    )
+    text = "\n\n".join(text for text in texts if text)
+
+    if not text:
+        text = "❌ Не удалось получить расписание, попробуйте позже"
+
+    if len(items) > NOW_MAX_ITEMS:
+        text += f"\n\nℹ️ Найдено ещё {len(items) - NOW_MAX_ITEMS}, уточните запрос"
+
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=text[:4096],
+    )
+
+
+def get_now_inline_query(query: str) -> str | None:
+    """
+    Возвращает запрос без префикса, если inline-запрос обращается к /now
+    """
+    for prefix in NOW_INLINE_PREFIXES:
+        if query.startswith(prefix):
+            return query[len(prefix) :].strip()
+    return None
+
+
+async def handle_now_inline_query(update: Update, context: CallbackContext, query):
+    if len(query) < 3:
+        return
+
+    items = await search_schedule(query.title())
+    if not items:
+        return
+
+    items = items[:NOW_MAX_INLINE_ITEMS]
+    texts = await asyncio.gather(*(get_now_text(item) for item in items))
+
+    inline_results = []
+    for item, text in zip(items, texts):
+        if not text:
+            continue
+
+        inline_results.append(
+            InlineQueryResultArticle(
+                id=f"now:{item.type}:{item.uid}",
+                title=f"📍 {item.name}",
+                description="Где сейчас и какая пара следующая",
+                input_message_content=InputTextMessageContent(message_text=text),
+            )
+        )
+
+    await update.inline_query.answer(
+        inline_results, cache_time=NOW_INLINE_CACHE_TIME, is_personal=False
+    )
+
+
+def init_handlers(application: Application):
+    application.add_handler(CommandHandler("now", now_handler))
@@ -0,0 +1,104 @@
+import asyncio
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, ContextTypes
+
+from bot import tasks
+from bot.config import settings
+from bot.db.database import (
+    get_favorites,
+    get_reminder,
+    get_reminder_subscriptions,
+    set_reminder,
+)
+from bot.db.sqlite import tables_ready
+from bot.delivery import delivery
+from bot.fetch.schedule import get_schedules
+from bot.reminders import reminder_scheduler
+
+STOP_WORDS = ("stop", "стоп")
+REMINDER_MIN_MINUTES = 1
+REMINDER_MAX_MINUTES = 180
+
+
+def sync_user_reminders(user_id: int):
+    """
+    Переносит в планировщик текущие напоминания и закрепленные расписания
+    пользователя. Вызывается после любого их изменения
+    """
+    reminder_scheduler.set_user(user_id, get_reminder(user_id), get_favorites(user_id))
+
+    missing = reminder_scheduler.missing_items()
+    if missing:
+        tasks.start_background(get_schedules(missing), "reminder schedules")
+
+
+async def remind_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Реакция бота на команду /remind: напоминания о парах закрепленных расписаний
+    """
+    if context.bot_data["maintenance_mode"]:
+        return
+
+    if not tables_ready.is_set():
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="⏳ База данных ещё готовится, попробуйте через минуту",
+        )
+        return
+
+    user_id = update.effective_user.id
+    arg = context.args[0].lower() if context.args else ""
+
+    if arg in STOP_WORDS:
+        set_reminder(user_id, None)
+        sync_user_reminders(user_id)
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="🔕 Напоминания о парах отключены",
+        )
+        return
+
+    if arg and not (
+        arg.isdigit() and REMINDER_MIN_MINUTES <= int(arg) <= REMINDER_MAX_MINUTES
+    ):
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="ℹ️ Напоминания о парах закрепленных расписаний: /remind [минуты]\n"
+            f"Например: `/remind 15`, от {REMINDER_MIN_MINUTES} "
+            f"до {REMINDER_MAX_MINUTES} минут. Отключить: `/remind стоп`",
+            parse_mode="Markdown",
+        )
+        return
+
+    minutes = int(arg) if arg else settings.reminder_minutes
+    set_reminder(user_id, minutes)
+    sync_user_reminders(user_id)
+
+    text = f"🔔 Буду напоминать о парах за {minutes} мин."
+    if not get_favorites(user_id):
+        text += (
+            "\n⭐ Закрепите расписание кнопкой «⭐ В избранное» под списком недель, "
+            "чтобы получать напоминания"
+        )
+
+    await context.bot.send_message(chat_id=update.effective_chat.id, text=text)
+
+
+def forget_user(chat_id: int):
+    if chat_id in reminder_scheduler.users:
+        set_reminder(chat_id, None)
+        reminder_scheduler.set_user(chat_id, None, [])
+
+
+async def start_reminders(application: Application):
+    delivery.start(application.bot, settings.delivery_rate)
+    subscriptions = await asyncio.to_thread(get_reminder_subscriptions)
+    await reminder_scheduler.start(subscriptions)
+
+
+def init_handlers(application: Application):
+    application.add_handler(CommandHandler("remind", remind_handler))
+
+
+delivery.gone_listeners.append(forget_user)
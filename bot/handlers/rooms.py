@@ -0,0 +1,113 @@
+import datetime
+
+from telegram import Update
+from telegram.ext import Application, CommandHandler, ContextTypes
+
+from bot import tasks
+from bot.config import settings
+from bot.index.occupancy import occupancy_index
+
+USAGE = (
+    "ℹ️ Поиск свободных аудиторий: /free <кампус> [номер пары] [дата]\n"
+    "Например: `/free В-78` — свободные сейчас, `/free В-78 3 20.01` — на 3 паре 20 января"
+)
+
+
+def parse_free_rooms_args(args: list[str]):
+    """
+    Разбирает аргументы /free: кампус, номер пары и дату в формате ДД.ММ[.ГГГГ]
+    """
+    campus = None
+    number = None
+    day = None
+
+    for arg in args:
+        if arg.isdigit() and len(arg) <= 2:
+            number = int(arg)
+            continue
+
+        if "." in arg:
+            parts = arg.split(".")
+            try:
+                year = int(parts[2]) if len(parts) > 2 else datetime.date.today().year
+                day = datetime.date(year, int(parts[1]), int(parts[0]))
+                continue
+            except (ValueError, IndexError):
+                pass
+
+        for known_campus in occupancy_index.campuses:
+            if known_campus.lower() == arg.lower():
+                campus = known_campus
+
+    return campus, number, day
+
+
+async def free_rooms_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Реакция бота на команду /free: свободные аудитории кампуса на паре
+    """
+    if context.bot_data["maintenance_mode"]:
+        return
+
+    if not len(occupancy_index):
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text="⏳ Список аудиторий ещё загружается, попробуйте через пару минут",
+        )
+        return
+
+    campus, number, day = parse_free_rooms_args(context.args or [])
+
+    if campus is None:
+        campuses = ", ".join(f"`{campus}`" for campus in occupancy_index.campuses)
+        await context.bot.send_message(
+            chat_id=update.effective_chat.id,
+            text=f"{USAGE}\n\nКампусы: {campuses}",
+            parse_mode="Markdown",
+        )
+        return
+
+    now = datetime.datetime.now()
+    today = now.date()
+    day = day or today
+
+    if number is None:
+        if day == today:
+            number = occupancy_index.lesson_number_at(now.time())
+
+        if number is None:
+            # Пары на сегодня закончились или выбран другой день: первая пара
+            number = min(occupancy_index.bells, default=1)
+            if day == today:
+                day += datetime.timedelta(days=1)
+
+    rooms = occupancy_index.free_rooms(campus, day, number)
+    start_time, end_time = occupancy_index.bells.get(number, ("", ""))
+
+    text = (
+        f"🏫 Свободные аудитории {campus}\n"
+        f"📅 {day:%d.%m.%Y}, пара № {number}"
+        + (f" ({start_time} – {end_time})" if start_time else "")
+        + "\n\n"
+    )
+    text += ", ".join(rooms) if rooms else "Свободных аудиторий нет"
+
+    await context.bot.send_message(
+        chat_id=update.effective_chat.id,
+        text=text[:4096],
+    )
+
+
+async def build_occupancy_index(application):
+    tasks.start_background(
+        occupancy_index.refresh(settings.fetch_concurrency), "free rooms index"
+    )
+    tasks.start_periodic(
+        lambda: occupancy_index.refresh(settings.fetch_concurrency),
+        settings.free_rooms_refresh_interval,
+        "free rooms index refresh",
+    )
+
+
+def init_handlers(application: Application):
+    application.add_handler(CommandHandler("free", free_rooms_handler))
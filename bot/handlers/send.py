@@ -1,45 +1,87 @@
-from datetime import datetime
+import asyncio
+import re
+from datetime import date as dt_date
+from datetime import datetime, timedelta
 
-from telegram import Update
+from telegram import InputFile, Update
+from telegram.error import BadRequest
 from telegram.ext import ContextTypes
 
-from bot.fetch.models import SearchItem
-from bot.fetch.schedule import get_lessons
+from bot.db.database import is_favorite
+from bot.fetch.cache import TTLCache
+from bot.fetch.models import ScheduleData, SearchItem
+from bot.fetch.schedule import SCHEDULE_CACHE_TTL, get_lessons
 from bot.handlers import construct as construct
 from bot.handlers import states as st
-from bot.parse.formating import format_outputs
+from bot.parse.formating import format_outputs, paginate
+from bot.parse.ics import build_ics
+from bot.parse.timetable_image import images_supported, render_week_image
 from bot.parse.semester import (
     get_dates_for_week,
     get_week_and_weekday,
 )
 
+# file_id действителен только у бота, который загрузил файл, поэтому в ключах
+# есть id бота. file_id уже загруженных календарей по
+# (бот, тип, uid, версия расписания)
+ics_file_ids = TTLCache(maxsize=4096, ttl=SCHEDULE_CACHE_TTL * 48)
+# file_id картинок недели по (бот, тип, uid, неделя, версия расписания)
+week_image_file_ids = TTLCache(maxsize=4096, ttl=SCHEDULE_CACHE_TTL * 48)
+
+
+def get_item_clarity_text(searching: bool = False) -> str:
+    text = "ℹ️ Выберите расписание:"
+    if searching:
+        text += "\n⏳ Поиск по остальным разделам продолжается..."
+    return text
+
 
 async def send_item_clarity(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, firsttime=False
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    firsttime=False,
+    searching=False,
 ):
     schedule_items = context.user_data["available_items"]
     few_teachers_markup = construct.construct_item_markup(schedule_items)
+    text = get_item_clarity_text(searching)
     if firsttime:
         message = await context.bot.send_message(
             chat_id=update.effective_chat.id,
-            text="ℹ️ Выберите расписание:",
+            text=text,
             reply_markup=few_teachers_markup,
         )
         context.user_data["message_id"] = message.message_id
 
     else:
         await update.callback_query.edit_message_text(
-            text="ℹ️ Выберите расписание:", reply_markup=few_teachers_markup
+            text=text, reply_markup=few_teachers_markup
         )
 
     return st.ITEM_CLARIFY
 
 
-async def send_week_selector(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, firsttime=False
+async def update_item_clarity(
+    context: ContextTypes.DEFAULT_TYPE, chat_id: int, message_id: int, searching=False
 ):
-    selected_item: SearchItem = context.user_data["item"]
+    """
+    Обновляет уже отправленную клавиатуру уточнения по context.user_data
+    """
+    try:
+        await context.bot.edit_message_text(
+            chat_id=chat_id,
+            message_id=message_id,
+            text=get_item_clarity_text(searching),
+            reply_markup=construct.construct_item_markup(
+                context.user_data["available_items"]
+            ),
+        )
+    except BadRequest:
+        # Сообщение удалено или не изменилось
+        pass
 
+
+def get_type_text(selected_item: SearchItem) -> str:
     type_text = ""
     match selected_item.type:
         case "teacher":
@@ -49,20 +91,34 @@ async def send_week_selector(
         case "group":
             type_text = f"Расписание группы: {selected_item.name}"
 
-    text = f"ℹ️ {type_text}\n🗓️ Выберите неделю:"
+    return type_text
+
+
+async def send_week_selector(
+    update: Update, context: ContextTypes.DEFAULT_TYPE, firsttime=False, notice=None
+):
+    selected_item: SearchItem = context.user_data["item"]
+
+    type_text = get_type_text(selected_item)
+
+    text = f"ℹ️ {type_text}\n"
+    if notice:
+        text += f"{notice}\n"
+    text += "🗓️ Выберите неделю:"
+    markup = construct.construct_week_selector_markup(
+        is_favorite(update.effective_user.id, selected_item)
+    )
 
     if firsttime:
         message = await context.bot.send_message(
             chat_id=update.effective_chat.id,
             text=text,
-            reply_markup=construct.construct_weeks_markup(),
+            reply_markup=markup,
         )
         context.user_data["message_id"] = message.message_id
 
     else:
-        await update.callback_query.edit_message_text(
-            text=text, reply_markup=construct.construct_weeks_markup()
-        )
+        await update.callback_query.edit_message_text(text=text, reply_markup=markup)
 
     return st.GETWEEK
 
@@ -74,14 +130,7 @@ async def send_day_selector(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     workdays = construct.construct_workdays(week, schedule)
 
-    type_text = ""
-    match selected_item.type:
-        case "teacher":
-            type_text = f"Расписание преподавателя: {selected_item.name}"
-        case "classroom":
-            type_text = f"Расписание аудитории: {selected_item.name}"
-        case "group":
-            type_text = f"Расписание группы: {selected_item.name}"
+    type_text = get_type_text(selected_item)
 
     text = f"ℹ️ {type_text}\n🗓️ Выбрана неделя: {week}\n📅 Выберите день:"
 
@@ -94,9 +143,20 @@ async def send_day_selector(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
 
 async def send_result(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, show_week=False
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    show_week=False,
+    page=0,
+    redraw=False,
 ):
+    """
+    Показывает расписание на день или неделю. Если пар нет, нажатие получает
+    предупреждение, а состояние и сообщение не меняются (возвращается None).
+    Если сообщение нужно перерисовать (redraw или оно заменено индикатором
+    загрузки), вместо предупреждения показывается выбор недели
+    """
     schedule_data = context.user_data["schedule"]
+    redraw = context.user_data.pop("loading_shown", False) or redraw
 
     date = context.user_data.get("date", None)
     week = context.user_data.get("week", None)
@@ -113,22 +173,58 @@ async def send_result(
     else:
         dates_list = [datetime.strptime(str(date), "%Y-%m-%d").date()]
 
-    lessons = get_lessons(schedule_data, dates_list)
+    pages = get_pages(schedule_data, dates_list, context)
 
-    if len(lessons) == 0:
-        await update.callback_query.answer(text="В этот день пар нет.", show_alert=True)
+    if len(pages) == 0:
+        no_lessons = "На этой неделе пар нет." if show_week else "В этот день пар нет."
+        if update.callback_query and redraw:
+            return await send_week_selector(update, context, notice=no_lessons)
+        if update.callback_query:
+            await update.callback_query.answer(text=no_lessons, show_alert=True)
+            return None
+        else:
+            await context.bot.send_message(
+                chat_id=update.effective_chat.id,
+                text=f"ℹ️ {get_type_text(context.user_data['item'])}\n{no_lessons}",
+            )
         return st.GETWEEK
 
-    blocks_of_text = format_outputs(lessons, context)
+    context.user_data["show_week"] = show_week
 
     return await telegram_delivery_optimisation(
-        update, context, blocks_of_text, show_week=show_week
+        update, context, pages, show_week=show_week, page=page
     )
 
 
+def get_pages(
+    schedule_data: ScheduleData, dates: list, context: ContextTypes.DEFAULT_TYPE
+) -> list[str]:
+    """
+    Страницы расписания на выбранные даты. Рендер и разбивка на страницы
+    выполняются один раз, затем страницы берутся из кэша расписания
+    """
+    key = ("pages", tuple(dates))
+    pages = schedule_data._memo.get(key)
+
+    if pages is None:
+        lessons = get_lessons(schedule_data, dates)
+        pages = paginate(format_outputs(lessons, context))
+        schedule_data._memo[key] = pages
+
+    return pages
+
+
 async def telegram_delivery_optimisation(
-    update: Update, context: ContextTypes.DEFAULT_TYPE, blocks: list, show_week=False
+    update: Update,
+    context: ContextTypes.DEFAULT_TYPE,
+    pages: list[str],
+    show_week=False,
+    page=0,
 ):
+    """
+    Показывает одну страницу расписания в текущем сообщении, остальные страницы
+    доступны кнопками навигации, поэтому каждое нажатие стоит одного запроса к Telegram
+    """
     week = context.user_data.get("week", None)
     date = context.user_data.get("date", None)
 
@@ -142,45 +238,130 @@ async def telegram_delivery_optimisation(
     else:
         workdays = construct.construct_workdays(week, schedule, selected_date=date)
 
-    chunk = ""
-    first = True
-    for block in blocks:
-        if len(chunk) + len(block) <= 4096:
-            chunk += block
+    page = min(max(page, 0), len(pages) - 1)
+    context.user_data["page"] = page
 
+    markup = construct.construct_pages_markup(
+        page, len(pages), workdays, image=show_week and images_supported()
+    )
+
+    if update.callback_query:
+        await update.callback_query.edit_message_text(pages[page], reply_markup=markup)
+    else:
+        message = await context.bot.send_message(
+            chat_id=update.effective_chat.id, text=pages[page], reply_markup=markup
+        )
+        context.user_data["message_id"] = message.message_id
+
+    return st.GETDAY
+
+
+async def send_favorite_view(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Отправляет закрепленное расписание на сегодня, завтра или текущую неделю
+    в зависимости от команды, сохраненной в favorite_view
+    """
+    view = context.user_data.pop("favorite_view", None)
+    today = dt_date.today()
+    # Из клавиатуры уточнения: на экране нет расписания, которое можно оставить
+    redraw = update.callback_query is not None
+
+    if context.user_data["schedule"] is None:
+        text = "❌ Не удалось получить расписание, попробуйте позже"
+        if update.callback_query:
+            await update.callback_query.edit_message_text(text)
         else:
-            if first:
-                if update.callback_query.inline_message_id:
-                    await update.callback_query.answer(
-                        text="Слишком длинное расписание, пожалуйста, воспользуйтесь личными сообщениями бота или "
-                        "выберите конкретный день недели",
-                        show_alert=True,
-                    )
-                    break
+            await context.bot.send_message(chat_id=update.effective_chat.id, text=text)
+        return
 
-                await update.callback_query.edit_message_text(chunk)
-                first = False
+    if view == "week":
+        context.user_data["date"] = today
+        context.user_data["week"], _ = get_week_and_weekday(today)
+        return await send_result(update, context, show_week=True, redraw=redraw)
 
-            else:
-                await context.bot.send_message(
-                    chat_id=update.effective_chat.id, text=chunk
-                )
+    context.user_data["date"] = (
+        today + timedelta(days=1) if view == "tomorrow" else today
+    )
+    context.user_data["week"] = None
 
-            chunk = block
+    return await send_result(update, context, redraw=redraw)
 
-    if chunk:
-        if first:
-            await update.callback_query.edit_message_text(chunk, reply_markup=workdays)
 
-        else:
-            message = await context.bot.send_message(
-                chat_id=update.effective_chat.id,
-                text=chunk,
-                reply_markup=workdays,
-            )
-            context.user_data["message_id"] = message.message_id
+async def send_ics(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Отправляет расписание на весь семестр файлом .ics. Файл собирается один раз
+    на версию расписания, повторно отправляется по file_id без загрузки
+    """
+    selected_item: SearchItem = context.user_data["item"]
+    schedule: ScheduleData = context.user_data["schedule"]
+    # В inline-режиме сообщение может быть в чужом чате, файл уходит в личные сообщения
+    chat_id = (
+        update.effective_chat.id if update.effective_chat else update.effective_user.id
+    )
 
-    return st.GETDAY
+    key = (context.bot.id, selected_item.type, selected_item.uid, schedule.version)
+    document = ics_file_ids.get(key)
+
+    if document is None:
+        filename = re.sub(
+            r"[^\w\-]+", "_", selected_item.name or str(selected_item.uid)
+        )
+        document = InputFile(
+            build_ics(selected_item, schedule), filename=f"{filename}.ics"
+        )
+
+    message = await context.bot.send_document(
+        chat_id=chat_id,
+        document=document,
+        caption=f"📅 {get_type_text(selected_item)}\n"
+        "Импортируйте файл в календарь, чтобы видеть пары без бота",
+    )
+    ics_file_ids.set(key, message.document.file_id)
+
+
+async def send_week_image(update: Update, context: ContextTypes.DEFAULT_TYPE) -> bool:
+    """
+    Отправляет открытую неделю картинкой. Картинка рисуется один раз на версию
+    расписания, повторно отправляется по file_id без рисования и загрузки.
+    Возвращает False, если на неделе нет пар
+    """
+    selected_item: SearchItem = context.user_data["item"]
+    schedule: ScheduleData = context.user_data["schedule"]
+    week = context.user_data.get("week", None)
+    if week is None:
+        week, _ = get_week_and_weekday(context.user_data["date"])
+    week = int(week)
+    # Как и файл .ics, из inline-сообщения картинка уходит в личные сообщения
+    chat_id = (
+        update.effective_chat.id if update.effective_chat else update.effective_user.id
+    )
+
+    key = (
+        context.bot.id,
+        selected_item.type,
+        selected_item.uid,
+        week,
+        schedule.version,
+    )
+    photo = week_image_file_ids.get(key)
+
+    if photo is None:
+        photo = await asyncio.to_thread(
+            render_week_image,
+            f"{get_type_text(selected_item)}, неделя {week}",
+            schedule,
+            week,
+        )
+        if photo is None:
+            return False
+
+    message = await context.bot.send_photo(
+        chat_id=chat_id,
+        photo=photo,
+        caption=f"🗓 {get_type_text(selected_item)}\nНеделя {week}",
+    )
+    week_image_file_ids.set(key, message.photo[-1].file_id)
+    return True
 
 
 async def resend_name_input(update: Update, context: ContextTypes.DEFAULT_TYPE):
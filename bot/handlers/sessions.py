@@ -0,0 +1,129 @@
+import asyncio
+import logging
+import time
+
+from telegram import CallbackQuery, Update
+from telegram.ext import (
+    Application,
+    ApplicationHandlerStop,
+    ContextTypes,
+    TypeHandler,
+)
+
+from bot import tasks
+from bot.config import settings
+from bot.diagnostics import deep_sizeof
+from bot.fetch.cache import TTLCache
+from bot.fetch.schedule import schedule_cache
+
+logger = logging.getLogger(__name__)
+
+SESSION_SWEEP_INTERVAL = 5 * 60
+# Сколько сессий проверяется за один проход цикла событий
+SESSION_SWEEP_BATCH = 500
+# Ключи, по которым видно, что у пользователя открыт диалог с меню
+SESSION_KEYS = ("message_id", "inline_step")
+
+# Сколько помнить меню удаленных сессий: после этого нажатие на такое
+# inline-меню получает обычный отказ, а клавиатура остается
+EXPIRED_MENU_TTL = 7 * 24 * 60 * 60
+
+# Все приложения процесса, сессии которых чистит периодическая очистка
+_applications: list[Application] = []
+last_sweep: dict = {}
+# id пользователя -> id сообщения (или inline-сообщения) с меню удаленной сессии
+expired_menus = TTLCache(maxsize=65536, ttl=EXPIRED_MENU_TTL)
+
+
+def owns_menu(query: CallbackQuery) -> bool:
+    """
+    Принадлежит ли меню нажавшему: сообщение в его личном чате или inline-сообщение
+    из его удаленной сессии. Чужое inline-меню в общем чате так не определить
+    """
+    if query.inline_message_id:
+        return expired_menus.get(query.from_user.id) == query.inline_message_id
+
+    message = query.message
+    return bool(message) and message.chat.id == query.from_user.id
+
+
+async def touch_session(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Отмечает активность пользователя. Нажатие на свое меню диалога, сессия
+    которого уже удалена очисткой (или потеряна при перезапуске), получает
+    предложение повторить поиск и дальше не обрабатывается. Нажатие на чужое
+    меню без сессии обрабатывается как раньше и получает отказ
+    """
+    if context.user_data is None:
+        return
+
+    query = update.callback_query
+    if (
+        query
+        and not any(key in context.user_data for key in SESSION_KEYS)
+        and owns_menu(query)
+    ):
+        await asyncio.gather(
+            query.answer(
+                text="⌛ Это меню устарело, отправьте запрос заново",
+                show_alert=True,
+            ),
+            query.edit_message_reply_markup(None),
+            return_exceptions=True,
+        )
+        raise ApplicationHandlerStop
+
+    context.user_data["last_seen"] = time.monotonic()
+
+
+async def sweep_sessions():
+    """
+    Удаляет user_data пользователей, которые не писали боту дольше SESSION_TTL.
+    Расписания из кэша не считаются освобожденной памятью: их держит кэш.
+
+    Состояние ConversationHandler не удаляется: это одно число на пользователя,
+    нажатия на меню удаленной сессии останавливает touch_session, а текстовый
+    запрос начинает диалог заново через fallbacks
+    """
+    started = time.monotonic()
+    expires_before = started - settings.session_ttl
+    # Объекты, которые останутся в памяти и после удаления сессий
+    shared = {id(schedule) for schedule in schedule_cache.values()}
+
+    checked = evicted = reclaimed = 0
+    for application in _applications:
+        for user_id, data in list(application.user_data.items()):
+            checked += 1
+            if data.get("last_seen", 0) < expires_before:
+                reclaimed += deep_sizeof(data, shared)
+                if data.get("message_id") is not None:
+                    expired_menus.set(user_id, data["message_id"])
+                application.drop_user_data(user_id)
+                evicted += 1
+
+            if checked % SESSION_SWEEP_BATCH == 0:
+                await asyncio.sleep(0)
+
+    last_sweep.update(
+        checked=checked,
+        evicted=evicted,
+        reclaimed=reclaimed,
+        duration=time.monotonic() - started,
+    )
+    if evicted:
+        logger.info(
+            "Sessions: %d of %d evicted, %.1f KB reclaimed",
+            evicted,
+            checked,
+            reclaimed / 1024,
+        )
+
+
+async def start_session_sweep(application: Application):
+    if settings.session_ttl > 0:
+        tasks.start_periodic(sweep_sessions, SESSION_SWEEP_INTERVAL, "session sweep")
+
+
+def init_handlers(application: Application):
+    _applications.append(application)
+    application.add_handler(TypeHandler(Update, touch_session), group=-1)
@@ -0,0 +1,267 @@
+import asyncio
+import json
+import logging
+import re
+from http import HTTPStatus
+
+import httpx
+
+from bot import tasks
+from bot.config import settings
+from bot.fetch.cache import TTLCache
+from bot.fetch.models import LessonSchedule, ScheduleData, SearchItem
+from bot.fetch.schedule import SCHEDULE_CACHE_TTL, get_schedule, is_schedule_cached
+from bot.parse.ics import build_ics
+from bot.parse.semester import get_dates_for_week
+
+logger = logging.getLogger(__name__)
+
+# /schedule/<тип>/<uid>.<json|ics>[?week=N]
+SCHEDULE_PATH = re.compile(
+    r"^/schedule/(?P<type>teachers?|groups?|classrooms?)/(?P<uid>\d+)"
+    r"\.(?P<format>json|ics)$"
+)
+WEEK_PARAM = re.compile(r"(?:^|&)week=(?P<week>\d{1,2})(?:&|$)")
+
+CONTENT_TYPES = {
+    "json": "application/json; charset=utf-8",
+    "ics": "text/calendar; charset=utf-8",
+}
+
+# Сколько ждать следующего запроса в открытом соединении и заголовков запроса
+HTTP_IDLE_TIMEOUT = 15
+HTTP_MAX_HEADERS = 8 * 1024
+# Сколько расписаний, которых нет в кэше, может загружаться для API сразу:
+# внешние клиенты не должны отнимать API у пользователей бота
+HTTP_MAX_FETCHES = 4
+# Сколько расписаний, загруженных только для API, хранится отдельно от общего
+# кэша: запросы внешних клиентов не вытесняют расписания пользователей бота
+HTTP_CACHE_SIZE = 64
+
+
+class HttpError(Exception):
+    def __init__(self, status: HTTPStatus):
+        self.status = status
+
+
+def lessons_json(schedule: ScheduleData, dates: list | None) -> list[dict]:
+    """
+    Пары по датам, как в get_lessons, но каждая пара сериализуется один раз
+    на все свои даты
+    """
+    lessons = []
+    for lesson in schedule.data:
+        if not isinstance(lesson, LessonSchedule) or not lesson.dates:
+            continue
+
+        data = lesson.model_dump(mode="json", exclude={"dates"}, warnings=False)
+        for lesson_date in lesson.dates:
+            if dates is None or lesson_date in dates:
+                lessons.append({"date": lesson_date.isoformat(), **data})
+
+    lessons.sort(key=lambda x: (x["date"], x["lesson_bells"]["number"] or 0))
+    return lessons
+
+
+def render(
+    item: SearchItem, schedule: ScheduleData, fmt: str, week: int | None
+) -> tuple[str, bytes]:
+    """
+    (ETag, тело) ответа. Версия расписания - хэш ответа API, поэтому ETag
+    не меняется, пока не изменится само расписание. Тело считается один раз
+    на объект расписания и освобождается вместе с ним
+    """
+    key = ("http", fmt, week)
+    if key not in schedule._memo:
+        dates = get_dates_for_week(week) if week else None
+
+        if fmt == "ics":
+            body = build_ics(item, schedule, set(dates) if dates else None)
+        else:
+            body = json.dumps(
+                {
+                    "type": item.type,
+                    "uid": item.uid,
+                    "week": week,
+                    "version": schedule.version,
+                    "lessons": lessons_json(schedule, dates),
+                },
+                ensure_ascii=False,
+            ).encode()
+
+        etag = f'"{schedule.version}-{fmt}-{week or "all"}"'
+        schedule._memo[key] = (etag, body)
+
+    return schedule._memo[key]
+
+
+def etag_matches(header: str | None, etag: str) -> bool:
+    if not header:
+        return False
+    if header.strip() == "*":
+        return True
+    return etag in (tag.strip().removeprefix("W/") for tag in header.split(","))
+
+
+class ScheduleServer:
+    """
+    Локальный HTTP API только для чтения: расписания из кэша бота в JSON и ICS.
+    Клиенты с If-None-Match получают 304 без тела, пока расписание не изменилось.
+    Без сторонних зависимостей: поддерживаются только GET и HEAD
+    """
+
+    def __init__(self):
+        self.server: asyncio.Server | None = None
+        self._fetches: asyncio.Semaphore | None = None
+        self.schedules = TTLCache(maxsize=HTTP_CACHE_SIZE, ttl=SCHEDULE_CACHE_TTL)
+        self.requests = 0
+        self.not_modified = 0
+
+    async def start(self, host: str, port: int):
+        self._fetches = asyncio.Semaphore(HTTP_MAX_FETCHES)
+        self.server = await asyncio.start_server(
+            self._serve_connection, host, port, limit=HTTP_MAX_HEADERS
+        )
+        logger.info("HTTP API listening on %s:%d", host, port)
+        # Отмена задачи при остановке бота закрывает сервер
+        tasks.start_background(self.server.serve_forever(), "http api")
+
+    async def _serve_connection(
+        self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter
+    ):
+        try:
+            while True:
+                try:
+                    head = await asyncio.wait_for(
+                        reader.readuntil(b"\r\n\r\n"), HTTP_IDLE_TIMEOUT
+                    )
+                except (asyncio.IncompleteReadError, asyncio.TimeoutError):
+                    break
+                except asyncio.LimitOverrunError:
+                    self._write(writer, HTTPStatus.REQUEST_HEADER_FIELDS_TOO_LARGE)
+                    break
+
+                keep_alive = await self._handle(head.decode("latin-1"), writer)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except ConnectionError:
+            pass
+        except Exception:
+            logger.exception("HTTP API connection failed")
+        finally:
+            writer.close()
+
+    async def _handle(self, head: str, writer: asyncio.StreamWriter) -> bool:
+        request_line, *header_lines = head.rstrip("\r\n").split("\r\n")
+        headers = {}
+        for line in header_lines:
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            method, target, version = request_line.split(" ")
+        except ValueError:
+            self._write(writer, HTTPStatus.BAD_REQUEST)
+            return False
+
+        connection = headers.get("connection", "").lower()
+        keep_alive = (
+            connection != "close"
+            if version == "HTTP/1.1"
+            else connection == "keep-alive"
+        )
+        self.requests += 1
+
+        if method not in ("GET", "HEAD"):
+            self._write(writer, HTTPStatus.METHOD_NOT_ALLOWED, {"Allow": "GET, HEAD"})
+            return keep_alive
+
+        # На HEAD отвечают теми же заголовками, что и на GET, но без тела
+        send_body = method == "GET"
+        try:
+            etag, body, content_type = await self._resolve(target)
+        except HttpError as error:
+            self._write(writer, error.status, send_body=send_body)
+            return keep_alive
+        except Exception:
+            logger.exception("HTTP API request %s failed", target)
+            self._write(writer, HTTPStatus.INTERNAL_SERVER_ERROR, send_body=send_body)
+            return False
+
+        response_headers = {
+            "ETag": etag,
+            "Cache-Control": f"max-age={SCHEDULE_CACHE_TTL}",
+        }
+        if etag_matches(headers.get("if-none-match"), etag):
+            self.not_modified += 1
+            self._write(writer, HTTPStatus.NOT_MODIFIED, response_headers)
+            return keep_alive
+
+        response_headers["Content-Type"] = content_type
+        self._write(writer, HTTPStatus.OK, response_headers, body, send_body=send_body)
+        return keep_alive
+
+    async def _resolve(self, target: str) -> tuple[str, bytes, str]:
+        path, _, query = target.partition("?")
+        match = SCHEDULE_PATH.match(path)
+        if not match:
+            raise HttpError(HTTPStatus.NOT_FOUND)
+
+        week = WEEK_PARAM.search(query)
+        week = int(week["week"]) if week else None
+        item = SearchItem(type=match["type"], uid=int(match["uid"]))
+
+        # Расписание из кэша бота; если его там нет, оно загружается мимо общего
+        # кэша в отдельный кэш API. Одновременные запросы одного расписания
+        # все равно ждут одну загрузку
+        key = (item.type, item.uid)
+        if is_schedule_cached(item):
+            schedule = await get_schedule(item)
+        else:
+            schedule = self.schedules.get(key)
+            if schedule is None:
+                async with self._fetches:
+                    # Пока запрос ждал очереди, расписание могли загрузить
+                    schedule = self.schedules.get(key)
+                    if schedule is None:
+                        try:
+                            schedule = await get_schedule(item, cache=False)
+                        except httpx.HTTPError:
+                            schedule = None
+                        if schedule is not None:
+                            self.schedules.set(key, schedule)
+        if schedule is None:
+            raise HttpError(HTTPStatus.BAD_GATEWAY)
+
+        etag, body = render(item, schedule, match["format"], week)
+        return etag, body, CONTENT_TYPES[match["format"]]
+
+    @staticmethod
+    def _write(
+        writer: asyncio.StreamWriter,
+        status: HTTPStatus,
+        headers: dict = None,
+        body: bytes = b"",
+        send_body: bool = True,
+    ):
+        if status.value >= 400:
+            body = json.dumps({"error": status.phrase}).encode()
+            headers = {**(headers or {}), "Content-Type": CONTENT_TYPES["json"]}
+
+        lines = [f"HTTP/1.1 {status.value} {status.phrase}"]
+        lines += [f"{name}: {value}" for name, value in (headers or {}).items()]
+        if status != HTTPStatus.NOT_MODIFIED:
+            lines.append(f"Content-Length: {len(body)}")
+
+        writer.write(("\r\n".join(lines) + "\r\n\r\n").encode())
+        if send_body and status != HTTPStatus.NOT_MODIFIED:
+            writer.write(body)
+
+
+schedule_server = ScheduleServer()
+
+
+async def start_http_api(application):
+    if settings.http_api_port:
+        await schedule_server.start(settings.http_api_host, settings.http_api_port)
@@ -0,0 +1,125 @@
+import bisect
+import datetime
+
+from bot.fetch.models import LessonSchedule, ScheduleData
+from bot.parse.semester import parse_bell_time
+
+
+class LessonIntervals:
+    """
+    Отсортированные по началу интервалы всех пар расписания.
+    Строится один раз на загруженное расписание, поиск текущей и следующей пары
+    выполняется бинарным поиском без разворачивания недели через get_lessons
+    """
+
+    def __init__(self, schedule: ScheduleData):
+        entries = []
+        for lesson in schedule.data:
+            if not isinstance(lesson, LessonSchedule) or not lesson.dates:
+                continue
+
+            bells = lesson.lesson_bells
+            if not bells.start_time or not bells.end_time:
+                continue
+
+            start_time = parse_bell_time(bells.start_time)
+            end_time = parse_bell_time(bells.end_time)
+            for lesson_date in lesson.dates:
+                entries.append(
+                    (
+                        datetime.datetime.combine(lesson_date, start_time),
+                        datetime.datetime.combine(lesson_date, end_time),
+                        lesson,
+                    )
+                )
+
+        entries.sort(key=lambda entry: entry[0])
+
+        self.entries = entries
+        self.starts = [entry[0] for entry in entries]
+        self.max_duration = max(
+            (end - start for start, end, _ in entries), default=datetime.timedelta()
+        )
+        # Начало самой ранней и конец самой поздней пары по звонкам расписания
+        self.day_start = min((start.time() for start, _, _ in entries), default=None)
+        self.day_end = max((end.time() for _, end, _ in entries), default=None)
+
+    @classmethod
+    def for_schedule(cls, schedule: ScheduleData) -> "LessonIntervals":
+        intervals = schedule._memo.get("intervals")
+        if intervals is None:
+            intervals = cls(schedule)
+            schedule._memo["intervals"] = intervals
+        return intervals
+
+    def between(self, start: datetime.datetime, end: datetime.datetime):
+        """
+        Пары, которые начинаются в промежутке [start, end)
+        """
+        return self.entries[
+            bisect.bisect_left(self.starts, start) : bisect.bisect_left(
+                self.starts, end
+            )
+        ]
+
+    def now_and_next(self, moment: datetime.datetime):
+        """
+        Возвращает пары, идущие в момент moment, и ближайшие следующие пары
+        (несколько, если они начинаются одновременно, например у подгрупп)
+        """
+        position = bisect.bisect_right(self.starts, moment)
+
+        current = []
+        earliest_start = moment - self.max_duration
+        index = position - 1
+        while index >= 0 and self.starts[index] >= earliest_start:
+            if self.entries[index][1] > moment:
+                current.append(self.entries[index])
+            index -= 1
+        current.reverse()
+
+        upcoming = []
+        if position < len(self.entries):
+            next_start = self.starts[position]
+            index = position
+            while index < len(self.entries) and self.starts[index] == next_start:
+                upcoming.append(self.entries[index])
+                index += 1
+
+        return current, upcoming
+
+
+def merge_intervals(intervals):
+    """
+    Объединяет пересекающиеся и соприкасающиеся интервалы (начало, конец)
+    """
+    merged = []
+    for start, end in sorted(intervals):
+        if merged and start <= merged[-1][1]:
+            if end > merged[-1][1]:
+                merged[-1][1] = end
+        else:
+            merged.append([start, end])
+
+    return [(start, end) for start, end in merged]
+
+
+def free_windows(busy, day_start, day_end, min_length: datetime.timedelta):
+    """
+    Промежутки внутри [day_start, day_end), не занятые ни одним из интервалов busy,
+    длиной не меньше min_length
+    """
+    windows = []
+    cursor = day_start
+
+    for start, end in merge_intervals(busy):
+        if start - cursor >= min_length:
+            windows.append((cursor, min(start, day_end)))
+        cursor = max(cursor, end)
+        if cursor >= day_end:
+            break
+
+    if day_end - cursor >= min_length:
+        windows.append((cursor, day_end))
+
+    return windows
@@ -0,0 +1,189 @@
+import bisect
+import datetime
+import itertools
+import logging
+import re
+import string
+import sys
+from typing import NamedTuple
+
+from bot.fetch.models import LessonSchedule, ScheduleData, ScheduleEndpoints, SearchItem
+from bot.fetch.schedule import get_schedules, schedule_listeners
+from bot.fetch.search import fetch_catalog
+
+logger = logging.getLogger(__name__)
+
+# В названии каждой группы есть цифра, поэтому поиск по цифрам дает весь каталог
+CATALOG_QUERIES = list(string.digits)
+
+WORD = re.compile(r"\w+")
+
+
+def tokenize(text: str) -> list[str]:
+    return WORD.findall((text or "").lower().replace("ё", "е"))
+
+
+class LessonEntry(NamedTuple):
+    """
+    Пара из расписания одной группы. Строки интернированы: одинаковые предметы,
+    аудитории и преподаватели тысяч групп занимают память один раз
+    """
+
+    group: str
+    subject: str
+    lesson_type: str
+    number: int
+    start_time: str
+    classroom: str
+    teachers: str
+    dates: tuple[datetime.date, ...]
+
+
+def _intern(value: str | None) -> str:
+    return sys.intern(value or "")
+
+
+class LessonIndex:
+    """
+    Обратный индекс пар всех групп: слово названия предмета, тип пары и дата ->
+    номера записей. Запрос пересекает множества номеров и не обращается к API.
+    Расписание группы при повторной загрузке полностью заменяет ее записи
+    """
+
+    def __init__(self):
+        self.entries: dict[int, LessonEntry] = {}
+        self.groups: dict[int, list[int]] = {}
+        self.words: dict[str, set[int]] = {}
+        self.types: dict[str, set[int]] = {}
+        self.dates: dict[datetime.date, set[int]] = {}
+        self.updated_at: datetime.datetime | None = None
+        self._ids = itertools.count()
+        self._vocabulary: list[str] | None = None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def ingest(self, item: SearchItem, schedule: ScheduleData):
+        if item.type != "group":
+            return
+
+        for entry_id in self.groups.pop(item.uid, ()):
+            self._remove(entry_id)
+
+        entry_ids = []
+        for lesson in schedule.data:
+            if not isinstance(lesson, LessonSchedule) or not lesson.dates:
+                continue
+
+            entry_id = next(self._ids)
+            self._add(entry_id, self._entry(item.name, lesson))
+            entry_ids.append(entry_id)
+
+        self.groups[item.uid] = entry_ids
+        self.updated_at = datetime.datetime.now()
+
+    @staticmethod
+    def _entry(group: str, lesson: LessonSchedule) -> LessonEntry:
+        classroom = ""
+        if lesson.classrooms:
+            room = lesson.classrooms[0]
+            campus = room.campus.short_name if room.campus else ""
+            classroom = f"{room.name} ({campus})" if campus else room.name
+
+        bells = lesson.lesson_bells
+        return LessonEntry(
+            group=_intern(group),
+            subject=_intern(lesson.subject),
+            lesson_type=_intern((lesson.lesson_type or "").lower()),
+            number=bells.number if isinstance(bells.number, int) else 0,
+            start_time=_intern(bells.start_time),
+            classroom=_intern(classroom),
+            teachers=_intern(", ".join(t.name for t in lesson.teachers or ())),
+            dates=tuple(sorted(lesson.dates)),
+        )
+
+    def _add(self, entry_id: int, entry: LessonEntry):
+        self.entries[entry_id] = entry
+        for word in set(tokenize(entry.subject)):
+            if word not in self.words:
+                self._vocabulary = None
+            self.words.setdefault(word, set()).add(entry_id)
+        self.types.setdefault(entry.lesson_type, set()).add(entry_id)
+        for lesson_date in entry.dates:
+            self.dates.setdefault(lesson_date, set()).add(entry_id)
+
+    def _remove(self, entry_id: int):
+        entry = self.entries.pop(entry_id)
+        postings = [self.words.get(word) for word in set(tokenize(entry.subject))]
+        postings.append(self.types.get(entry.lesson_type))
+        postings.extend(self.dates.get(lesson_date) for lesson_date in entry.dates)
+        for ids in postings:
+            if ids is not None:
+                ids.discard(entry_id)
+
+    def _matching_words(self, prefix: str) -> set[int]:
+        """
+        Записи, в названии предмета которых есть слово, начинающееся с prefix
+        """
+        if self._vocabulary is None:
+            self._vocabulary = sorted(self.words)
+
+        ids = set()
+        position = bisect.bisect_left(self._vocabulary, prefix)
+        for word in itertools.islice(self._vocabulary, position, None):
+            if not word.startswith(prefix):
+                break
+            ids |= self.words[word]
+        return ids
+
+    def search(
+        self,
+        subject: str,
+        lesson_type: str | None,
+        days: list[datetime.date],
+    ) -> list[tuple[datetime.date, LessonEntry, list[str]]]:
+        """
+        Пары по словам предмета и типу в указанные дни: (дата, пара, группы).
+        Одна пара потока есть в расписании каждой его группы, такие записи
+        объединяются в одну со списком групп
+        """
+        candidates = None
+        for word in tokenize(subject):
+            ids = self._matching_words(word)
+            candidates = ids if candidates is None else candidates & ids
+        if lesson_type:
+            ids = self.types.get(lesson_type, set())
+            candidates = ids if candidates is None else candidates & ids
+
+        # (дата, номер пары, предмет, тип, аудитория, преподаватели) -> (пара, группы)
+        found: dict[tuple, tuple[LessonEntry, set[str]]] = {}
+        for day in days:
+            ids = self.dates.get(day, set())
+            for entry_id in ids if candidates is None else ids & candidates:
+                entry = self.entries[entry_id]
+                key = (day, entry.number, entry.subject, entry.lesson_type)
+                key += (entry.classroom, entry.teachers)
+                found.setdefault(key, (entry, set()))[1].add(entry.group)
+
+        return [
+            (key[0], entry, sorted(groups))
+            for key, (entry, groups) in sorted(found.items(), key=lambda x: x[0])
+        ]
+
+    async def refresh(self, concurrency: int):
+        """
+        Загружает расписания всех групп, не больше concurrency запросов сразу.
+        Каждое расписание попадает в индекс через schedule_listeners
+        """
+        groups = await fetch_catalog(ScheduleEndpoints.groups, CATALOG_QUERIES)
+        schedules = await get_schedules(groups, cache=False, concurrency=concurrency)
+        logger.info(
+            "Lesson index refreshed: %d/%d groups fetched, %d lessons indexed",
+            sum(schedule is not None for schedule in schedules),
+            len(groups),
+            len(self),
+        )
+
+
+lesson_index = LessonIndex()
+schedule_listeners.append(lesson_index.ingest)
@@ -0,0 +1,192 @@
+import datetime
+import logging
+import re
+import string
+
+from bot.fetch.models import (
+    LessonSchedule,
+    ScheduleData,
+    ScheduleEndpoints,
+    SearchItem,
+)
+from bot.fetch.schedule import get_schedules, schedule_listeners
+from bot.fetch.search import fetch_catalog
+from bot.parse.semester import parse_bell_time
+
+logger = logging.getLogger(__name__)
+
+# Название аудитории в поиске имеет вид "Г-212 (В-78)"
+CLASSROOM_NAME = re.compile(r"^(?P<room>.+?)(?: \((?P<campus>[^()]+)\))?$")
+
+# В названии каждой аудитории есть цифра, поэтому поиск по цифрам дает весь каталог
+CATALOG_QUERIES = list(string.digits)
+
+
+def parse_classroom_name(name: str) -> tuple[str, str]:
+    """
+    Возвращает (кампус, аудитория) из названия аудитории в результатах поиска
+    """
+    match = CLASSROOM_NAME.match(name or "")
+    if not match:
+        return "", name or ""
+    return match["campus"] or "", match["room"]
+
+
+class OccupancyIndex:
+    """
+    Занятость аудиторий: кампус -> аудитория -> дата -> битовая маска номеров пар.
+    Аудитория свободна на паре N, если бит N в маске на эту дату не выставлен.
+
+    Маска аудитории - объединение вкладов всех расписаний (аудитории, групп,
+    преподавателей), в которых она встречается. Повторная загрузка расписания
+    заменяет его вклад, поэтому перенесенные и отмененные пары освобождают аудиторию
+    """
+
+    def __init__(self):
+        self.rooms: dict[str, dict[str, dict[datetime.date, int]]] = {}
+        # (тип, uid) расписания -> (кампус, аудитория) -> дата -> маска
+        self.sources: dict[tuple[str, int], dict[tuple[str, str], dict]] = {}
+        # (кампус, аудитория) -> расписания, которые ее занимают
+        self.room_sources: dict[tuple[str, str], set[tuple[str, int]]] = {}
+        # Номер пары -> (начало, конец), собирается из LessonBells
+        self.bells: dict[int, tuple[str, str]] = {}
+        self.updated_at: datetime.datetime | None = None
+
+    def __len__(self):
+        return sum(len(rooms) for rooms in self.rooms.values())
+
+    @property
+    def campuses(self) -> list[str]:
+        return sorted(campus for campus in self.rooms if campus)
+
+    def ingest(self, item: SearchItem, schedule: ScheduleData):
+        """
+        Учитывает загруженное расписание вместо его прошлого вклада.
+        Расписание аудитории добавляет ее в индекс, даже если пар в ней нет
+        """
+        contribution: dict[tuple[str, str], dict[datetime.date, int]] = {}
+        if item.type == "classroom":
+            occupancy = contribution.setdefault(parse_classroom_name(item.name), {})
+            for lesson in self._lessons(schedule):
+                self._mark(occupancy, lesson)
+
+        else:
+            for lesson in self._lessons(schedule):
+                for classroom in lesson.classrooms or ():
+                    campus = (
+                        (classroom.campus.short_name or "") if classroom.campus else ""
+                    )
+                    self._mark(
+                        contribution.setdefault((campus, classroom.name), {}), lesson
+                    )
+
+        key = (item.type, item.uid)
+        previous = self.sources.pop(key, {})
+        if contribution:
+            self.sources[key] = contribution
+
+        for room in previous.keys() | contribution.keys():
+            old, new = previous.get(room), contribution.get(room)
+            if old == new:
+                continue
+
+            if new is None:
+                self.room_sources[room].discard(key)
+            else:
+                self.room_sources.setdefault(room, set()).add(key)
+
+            if old is None:
+                # Новый вклад только добавляет занятые пары
+                occupancy = self.rooms.setdefault(room[0], {}).setdefault(room[1], {})
+                for lesson_date, mask in new.items():
+                    occupancy[lesson_date] = occupancy.get(lesson_date, 0) | mask
+            else:
+                new = new or {}
+                changed = {
+                    lesson_date
+                    for lesson_date in old.keys() | new.keys()
+                    if old.get(lesson_date) != new.get(lesson_date)
+                }
+                self._rebuild(room, changed)
+
+        self.updated_at = datetime.datetime.now()
+
+    def _rebuild(self, room: tuple[str, str], dates: set[datetime.date]):
+        """
+        Пересчитывает маски аудитории на dates по вкладам всех ее расписаний
+        """
+        campus, name = room
+        if not self.room_sources[room]:
+            # Аудиторию не упоминает больше ни одно расписание
+            del self.room_sources[room]
+            self.rooms[campus].pop(name, None)
+            if not self.rooms[campus]:
+                del self.rooms[campus]
+            return
+
+        contributions = [
+            self.sources[source][room] for source in self.room_sources[room]
+        ]
+        occupancy = self.rooms[campus][name]
+        for lesson_date in dates:
+            mask = 0
+            for contribution in contributions:
+                mask |= contribution.get(lesson_date, 0)
+            if mask:
+                occupancy[lesson_date] = mask
+            else:
+                occupancy.pop(lesson_date, None)
+
+    def _lessons(self, schedule: ScheduleData):
+        for lesson in schedule.data:
+            if (
+                isinstance(lesson, LessonSchedule)
+                and lesson.dates
+                and isinstance(lesson.lesson_bells.number, int)
+            ):
+                bells = lesson.lesson_bells
+                self.bells.setdefault(bells.number, (bells.start_time, bells.end_time))
+                yield lesson
+
+    @staticmethod
+    def _mark(occupancy: dict[datetime.date, int], lesson: LessonSchedule):
+        bit = 1 << lesson.lesson_bells.number
+        for lesson_date in lesson.dates:
+            occupancy[lesson_date] = occupancy.get(lesson_date, 0) | bit
+
+    def free_rooms(self, campus: str, day: datetime.date, number: int) -> list[str]:
+        bit = 1 << number
+        return sorted(
+            room
+            for room, occupancy in self.rooms.get(campus, {}).items()
+            if not occupancy.get(day, 0) & bit
+        )
+
+    def lesson_number_at(self, moment: datetime.time) -> int | None:
+        """
+        Номер текущей пары, а если сейчас перерыв, то ближайшей следующей
+        """
+        for number, (_, end_time) in sorted(self.bells.items()):
+            if moment < parse_bell_time(end_time):
+                return number
+        return None
+
+    async def refresh(self, concurrency: int):
+        """
+        Загружает расписания всех аудиторий, не больше concurrency запросов сразу.
+        Каждое расписание попадает в индекс через schedule_listeners
+        """
+        classrooms = await fetch_catalog(ScheduleEndpoints.classrooms, CATALOG_QUERIES)
+        schedules = await get_schedules(
+            classrooms, cache=False, concurrency=concurrency
+        )
+        logger.info(
+            "Occupancy index refreshed: %d/%d classrooms fetched, %d rooms indexed",
+            sum(schedule is not None for schedule in schedules),
+            len(classrooms),
+            len(self),
+        )
+
+
+occupancy_index = OccupancyIndex()
+schedule_listeners.append(occupancy_index.ingest)
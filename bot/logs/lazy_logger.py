@@ -1,10 +1,107 @@
+import json
 import logging
+import random
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
+from queue import SimpleQueue
+from typing import Callable
+
+LOG_FILE_MAX_BYTES = 10 * 1024 * 1024
+LOG_FILE_BACKUP_COUNT = 5
+
+
+class LazyJson:
+    """
+    Сообщение лога, которое сериализуется в JSON только при форматировании записи,
+    то есть в фоновом потоке и только если запись действительно будет выведена
+    """
+
+    __slots__ = ("payload",)
+
+    def __init__(self, payload: Callable[[], dict] | dict):
+        self.payload = payload
+
+    def __str__(self):
+        payload = self.payload() if callable(self.payload) else self.payload
+        return json.dumps(payload, ensure_ascii=False, default=str)
+
+
+class DeferredQueueHandler(QueueHandler):
+    """
+    QueueHandler, который не форматирует запись в потоке обработчика,
+    а оставляет это QueueListener'у
+    """
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        return record
 
 
 class LazyLogger:
     def __init__(self):
         self.logger = logging.getLogger("bot.handlers")
         self.logger.setLevel("INFO")
+        self.sample_rate = 1.0
+        self.listener: QueueListener | None = None
+
+    def start(self, log_file: str = None, sample_rate: float = 1.0):
+        """
+        Переводит все логирование на запись через очередь в фоновом потоке.
+        Обработчики корневого логгера (консоль) переезжают в QueueListener,
+        при указании log_file к ним добавляется файл с ротацией
+        """
+        if self.listener is not None:
+            return
+
+        self.sample_rate = sample_rate
+
+        root = logging.getLogger()
+        handlers = root.handlers[:]
+
+        if log_file:
+            file_handler = RotatingFileHandler(
+                log_file,
+                maxBytes=LOG_FILE_MAX_BYTES,
+                backupCount=LOG_FILE_BACKUP_COUNT,
+                encoding="utf-8",
+            )
+            if handlers:
+                file_handler.setFormatter(handlers[0].formatter)
+            handlers.append(file_handler)
+
+        queue = SimpleQueue()
+
+        for handler in root.handlers[:]:
+            root.removeHandler(handler)
+        root.addHandler(DeferredQueueHandler(queue))
+
+        self.listener = QueueListener(queue, *handlers, respect_handler_level=True)
+        self.listener.start()
+
+    def stop(self):
+        """
+        Дописывает оставшиеся в очереди записи и останавливает фоновый поток
+        """
+        if self.listener is None:
+            return
+
+        self.listener.stop()
+        self.listener = None
+
+    def log_json(
+        self, level: int, payload: Callable[[], dict] | dict, sampled: bool = False
+    ):
+        """
+        Пишет структурированную запись. payload может быть функцией, тогда
+        словарь собирается только при форматировании записи.
+        sampled=True помечает частые записи (запросы пользователей), из которых
+        сохраняется только доля sample_rate
+        """
+        if not self.logger.isEnabledFor(level):
+            return
+
+        if sampled and self.sample_rate < 1 and random.random() >= self.sample_rate:
+            return
+
+        self.logger.log(level, LazyJson(payload))
 
 
 lazy_logger = LazyLogger()
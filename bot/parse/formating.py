@@ -1,12 +1,37 @@
-import json
+import logging
+from datetime import date, datetime, timedelta
 
 from telegram.ext import ContextTypes
 
-from bot.fetch.models import Lesson
+from bot.fetch.models import Lesson, LessonSchedule
 from bot.logs.lazy_logger import lazy_logger
 from bot.parse.semester import get_week_and_weekday
 
 
+def get_lesson_type_name(lesson_type: str) -> str:
+    match lesson_type.lower():
+        case "lecture":
+            return "Лекция"
+        case "laboratorywork":
+            return "Лабораторная"
+        case "practice":
+            return "Практика"
+        case "individualwork":
+            return "Сам. работа"
+        case "exam":
+            return "Экзамен"
+        case "consultation":
+            return "Консультация"
+        case "coursework":
+            return "Курс. раб."
+        case "courseproject":
+            return "Курс. проект"
+        case "credit":
+            return "Зачет"
+        case _:
+            return "Неизвестно"
+
+
 def format_outputs(lessons: list[Lesson], context: ContextTypes.DEFAULT_TYPE):
     """
     Format the parsed schedule into human-readable text blocks.
@@ -50,27 +75,7 @@ def format_outputs(lessons: list[Lesson], context: ContextTypes.DEFAULT_TYPE):
     for lesson in lessons:
         error_message = None
         week, weekday = get_week_and_weekday(lesson.dates)
-        match lesson.lesson_type.lower():
-            case "lecture":
-                lesson_type = "Лекция"
-            case "laboratorywork":
-                lesson_type = "Лабораторная"
-            case "practice":
-                lesson_type = "Практика"
-            case "individualwork":
-                lesson_type = "Сам. работа"
-            case "exam":
-                lesson_type = "Экзамен"
-            case "consultation":
-                lesson_type = "Консультация"
-            case "coursework":
-                lesson_type = "Курс. раб."
-            case "courseproject":
-                lesson_type = "Курс. проект"
-            case "credit":
-                lesson_type = "Зачет"
-            case _:
-                lesson_type = "Неизвестно"
+        lesson_type = get_lesson_type_name(lesson.lesson_type)
 
         formatted_time = (
             f"{lesson.lesson_bells.start_time} – {lesson.lesson_bells.end_time}"
@@ -102,7 +107,7 @@ def format_outputs(lessons: list[Lesson], context: ContextTypes.DEFAULT_TYPE):
         except Exception as e:
             target_info = {
                 "type": "error",
-                "item": context.user_data["item"].model_dump(),
+                "item": context.user_data["item"].model_dump() if context else None,
                 "week": week,
                 "weekday": weekday,
                 "error": str(e),
@@ -110,7 +115,7 @@ def format_outputs(lessons: list[Lesson], context: ContextTypes.DEFAULT_TYPE):
 
             if str(e) != error_message:
                 error_message = str(e)
-                lazy_logger.logger.error(json.dumps(target_info, ensure_ascii=False))
+                lazy_logger.log_json(logging.ERROR, target_info)
                 text = "Ошибка при получении расписания"
                 blocks.append(text)
                 text = ""
@@ -118,3 +123,118 @@ def format_outputs(lessons: list[Lesson], context: ContextTypes.DEFAULT_TYPE):
             return blocks
 
     return blocks
+
+
+def paginate(blocks: list[str], limit: int = 4096) -> list[str]:
+    """
+    Упаковывает готовые блоки текста в страницы длиной не более limit символов.
+    Блок целиком попадает на одну страницу, если только сам не длиннее limit
+    """
+    pages = []
+    page = []
+    length = 0
+
+    for block in blocks:
+        block = block[:limit]
+
+        if page and length + len(block) > limit:
+            pages.append("".join(page))
+            page = []
+            length = 0
+
+        page.append(block)
+        length += len(block)
+
+    if page:
+        pages.append("".join(page))
+
+    return pages
+
+
+def format_short_lesson(lesson: LessonSchedule) -> str:
+    text = f"📝 {lesson.subject} ({get_lesson_type_name(lesson.lesson_type or '')})\n"
+
+    if lesson.classrooms:
+        classroom = lesson.classrooms[0]
+        campus = (
+            f" ({classroom.campus.short_name})"
+            if classroom.campus and classroom.campus.short_name
+            else ""
+        )
+        text += f"🏫 {classroom.name}{campus}\n"
+
+    if lesson.teachers:
+        text += f"👨🏻‍🏫 {', '.join(teacher.name for teacher in lesson.teachers)}\n"
+
+    if lesson.groups:
+        text += f"👥 {', '.join(lesson.groups)}\n"
+
+    return text
+
+
+def format_now_next(
+    header: str,
+    current: list[tuple[datetime, datetime, LessonSchedule]],
+    upcoming: list[tuple[datetime, datetime, LessonSchedule]],
+    moment: datetime,
+) -> str:
+    """
+    Коротко описывает текущую и следующую пары
+    """
+    text = f"ℹ️ {header}\n\n"
+
+    if current:
+        start, end, lesson = current[0]
+        text += (
+            f"📍 Сейчас, пара № {lesson.lesson_bells.number} "
+            f"({start:%H:%M} – {end:%H:%M}):\n"
+        )
+        text += "".join(format_short_lesson(lesson) for _, _, lesson in current)
+    else:
+        text += "📍 Сейчас пар нет\n"
+
+    text += "\n"
+
+    if upcoming:
+        start, end, lesson = upcoming[0]
+        if start.date() == moment.date():
+            day = "сегодня"
+        elif start.date() == moment.date() + timedelta(days=1):
+            day = "завтра"
+        else:
+            day = f"{start:%d.%m}"
+
+        text += (
+            f"⏭ Далее {day}, пара № {lesson.lesson_bells.number} "
+            f"({start:%H:%M} – {end:%H:%M}):\n"
+        )
+        text += "".join(format_short_lesson(lesson) for _, _, lesson in upcoming)
+    else:
+        text += "⏭ Больше пар нет\n"
+
+    return text
+
+
+def format_common_windows(
+    names: list[str],
+    week: int,
+    windows: dict[date, list[tuple[datetime, datetime]]],
+) -> str:
+    """
+    Компактно выводит общие свободные окна: одна строка на день недели
+    """
+    WEEKDAYS = ("Пн", "Вт", "Ср", "Чт", "Пт", "Сб", "Вс")
+
+    text = f"🤝 Общие окна на {week} неделе\n"
+    text += "".join(f"• {name}\n" for name in names)
+    text += "\n"
+
+    for day, day_windows in windows.items():
+        slots = (
+            ", ".join(f"{start:%H:%M}–{end:%H:%M}" for start, end in day_windows)
+            if day_windows
+            else "—"
+        )
+        text += f"{WEEKDAYS[day.weekday()]} {day:%d.%m}: {slots}\n"
+
+    return text
@@ -0,0 +1,138 @@
+import datetime
+import hashlib
+import io
+from typing import Iterator
+
+from bot.fetch.models import LessonSchedule, ScheduleData, SearchItem
+from bot.parse.formating import get_lesson_type_name
+from bot.parse.semester import parse_bell_time
+
+TIMEZONE = "Europe/Moscow"
+
+VTIMEZONE = (
+    "BEGIN:VTIMEZONE",
+    f"TZID:{TIMEZONE}",
+    "BEGIN:STANDARD",
+    "DTSTART:19700101T000000",
+    "TZOFFSETFROM:+0300",
+    "TZOFFSETTO:+0300",
+    "TZNAME:MSK",
+    "END:STANDARD",
+    "END:VTIMEZONE",
+)
+
+
+def escape(text: str) -> str:
+    return (
+        text.replace("\\", "\\\\")
+        .replace(";", "\\;")
+        .replace(",", "\\,")
+        .replace("\n", "\\n")
+    )
+
+
+def fold(line: str) -> str:
+    """
+    Переносит строки длиннее 75 байт, как требует RFC 5545
+    """
+    encoded = line.encode()
+    if len(encoded) <= 75:
+        return line + "\r\n"
+
+    parts = []
+    start = 0
+    limit = 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        # Не разрываем многобайтовый символ UTF-8
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start = end
+        limit = 74
+
+    return "\r\n ".join(parts) + "\r\n"
+
+
+def iter_events(
+    lesson: LessonSchedule, stamp: str, dates: set[datetime.date] = None
+) -> Iterator[str]:
+    if not lesson.lesson_bells.start_time or not lesson.lesson_bells.end_time:
+        return
+
+    type_name = get_lesson_type_name(lesson.lesson_type or "")
+    summary = escape(f"{lesson.subject} ({type_name})")
+
+    location = ""
+    if lesson.classrooms:
+        classroom = lesson.classrooms[0]
+        campus = classroom.campus.short_name if classroom.campus else ""
+        location = escape(f"{classroom.name} ({campus})" if campus else classroom.name)
+
+    description = []
+    if lesson.teachers:
+        teachers = ", ".join(teacher.name for teacher in lesson.teachers)
+        description.append(f"Преподаватели: {teachers}")
+    if lesson.groups:
+        description.append(f"Группы: {', '.join(lesson.groups)}")
+    description = escape("\n".join(description))
+
+    start_time = parse_bell_time(lesson.lesson_bells.start_time)
+    end_time = parse_bell_time(lesson.lesson_bells.end_time)
+    uid_base = hashlib.blake2b(
+        f"{lesson.subject}|{lesson.lesson_type}|{location}|{description}".encode(),
+        digest_size=6,
+    ).hexdigest()
+
+    for lesson_date in sorted(lesson.dates):
+        if dates is not None and lesson_date not in dates:
+            continue
+
+        start = datetime.datetime.combine(lesson_date, start_time)
+        end = datetime.datetime.combine(lesson_date, end_time)
+
+        yield "BEGIN:VEVENT"
+        yield f"UID:{start:%Y%m%dT%H%M}-{uid_base}@mirea-teacher-schedule-bot"
+        yield f"DTSTAMP:{stamp}"
+        yield f"DTSTART;TZID={TIMEZONE}:{start:%Y%m%dT%H%M%S}"
+        yield f"DTEND;TZID={TIMEZONE}:{end:%Y%m%dT%H%M%S}"
+        yield f"SUMMARY:{summary}"
+        if location:
+            yield f"LOCATION:{location}"
+        if description:
+            yield f"DESCRIPTION:{description}"
+        yield "END:VEVENT"
+
+
+def iter_ics(
+    item: SearchItem, schedule: ScheduleData, dates: set[datetime.date] = None
+) -> Iterator[str]:
+    """
+    Построчно формирует календарь со всеми парами расписания (или только
+    парами в dates), не собирая весь файл в одну строку
+    """
+    stamp = datetime.datetime.now(datetime.timezone.utc).strftime("%Y%m%dT%H%M%SZ")
+
+    yield "BEGIN:VCALENDAR"
+    yield "VERSION:2.0"
+    yield "PRODID:-//mirea-teacher-schedule-bot//RU"
+    yield "CALSCALE:GREGORIAN"
+    yield f"X-WR-CALNAME:{escape(item.name or str(item.uid))}"
+    yield f"X-WR-TIMEZONE:{TIMEZONE}"
+    yield from VTIMEZONE
+
+    for lesson in schedule.data:
+        if isinstance(lesson, LessonSchedule) and lesson.dates:
+            yield from iter_events(lesson, stamp, dates)
+
+    yield "END:VCALENDAR"
+
+
+def build_ics(
+    item: SearchItem, schedule: ScheduleData, dates: set[datetime.date] = None
+) -> bytes:
+    buffer = io.BytesIO()
+    for line in iter_ics(item, schedule, dates):
+        buffer.write(fold(line).encode())
+
+    return buffer.getvalue()
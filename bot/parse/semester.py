@@ -100,3 +100,11 @@ def get_week_and_weekday(date: datetime.date | str) -> tuple[week, weekday]:
     weekday = date.weekday() + 1
     week = date.isocalendar()[1] - semester_start_date.isocalendar()[1] + 1
     return week, weekday
+
+
+def parse_bell_time(value: str) -> datetime.time:
+    """
+    Время начала или конца пары из LessonBells, например "9:00" или "10:40"
+    """
+    hours, minutes = value.split(":")[:2]
+    return datetime.time(int(hours), int(minutes))
@@ -0,0 +1,205 @@
+import datetime
+import functools
+import io
+import logging
+
+from bot.config import settings
+from bot.fetch.models import LessonSchedule, ScheduleData
+from bot.index.intervals import LessonIntervals
+from bot.parse.formating import get_lesson_type_name
+from bot.parse.semester import get_dates_for_week
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:
+    # Pillow - необязательная зависимость, без нее режим картинок выключен
+    Image = None
+
+logger = logging.getLogger(__name__)
+
+WEEKDAYS = ("ПН", "ВТ", "СР", "ЧТ", "ПТ", "СБ", "ВС")
+
+HEADER_HEIGHT = 56
+DAY_ROW_HEIGHT = 36
+NUMBER_COLUMN_WIDTH = 72
+CELL_WIDTH = 210
+CELL_PADDING = 6
+LINE_HEIGHT = 17
+# Сколько строк названия предмета помещается в ячейку
+SUBJECT_LINES = 3
+
+BACKGROUND = "#ffffff"
+GRID = "#c8ccd2"
+HEADER_BACKGROUND = "#eef1f5"
+TEXT = "#1f2328"
+MUTED = "#5f6670"
+
+
+@functools.lru_cache(maxsize=4)
+def load_font(size: int):
+    return ImageFont.truetype(settings.timetable_image_font, size)
+
+
+@functools.cache
+def images_supported() -> bool:
+    if Image is None or not settings.timetable_images:
+        return False
+
+    try:
+        load_font(13)
+    except OSError:
+        logger.warning(
+            "Font %s not found, timetable images are disabled",
+            settings.timetable_image_font,
+        )
+        return False
+    return True
+
+
+def wrap(text: str, font, width: int, max_lines: int) -> list[str]:
+    """
+    Разбивает текст на строки не шире width, лишнее заменяется многоточием
+    """
+    lines = []
+    line = ""
+    for word in text.split():
+        candidate = f"{line} {word}".strip()
+        if font.getlength(candidate) <= width:
+            line = candidate
+            continue
+
+        if line:
+            lines.append(line)
+        line = word
+        while font.getlength(line) > width and len(line) > 1:
+            line = line[:-1]
+
+    if line:
+        lines.append(line)
+
+    if len(lines) > max_lines:
+        lines = lines[:max_lines]
+        last = lines[-1]
+        while last and font.getlength(last + "…") > width:
+            last = last[:-1]
+        lines[-1] = last + "…"
+
+    return lines
+
+
+def describe(lesson: LessonSchedule) -> str:
+    details = [get_lesson_type_name(lesson.lesson_type or "")]
+    if lesson.classrooms:
+        details.append(lesson.classrooms[0].name or "")
+    return ", ".join(detail for detail in details if detail)
+
+
+def week_grid(schedule: ScheduleData, week: int):
+    """
+    Пары недели по ячейкам (дата, номер пары) из индекса интервалов расписания
+    и время начала каждого номера пары
+    """
+    dates = get_dates_for_week(week)
+    start = datetime.datetime.combine(dates[0], datetime.time())
+    end = start + datetime.timedelta(days=7)
+
+    cells: dict[tuple[datetime.date, int], list[LessonSchedule]] = {}
+    bells: dict[int, str] = {}
+    for lesson_start, _, lesson in LessonIntervals.for_schedule(schedule).between(
+        start, end
+    ):
+        number = lesson.lesson_bells.number or 0
+        cells.setdefault((lesson_start.date(), number), []).append(lesson)
+        bells.setdefault(number, lesson.lesson_bells.start_time or "")
+
+    # Воскресенье показывается, только если в него есть пары
+    sunday = dates[-1] + datetime.timedelta(days=1)
+    if any(day == sunday for day, _ in cells):
+        dates.append(sunday)
+
+    return dates, cells, bells
+
+
+def render_week_image(title: str, schedule: ScheduleData, week: int) -> bytes | None:
+    """
+    PNG с сеткой недели: столбцы - дни, строки - номера пар.
+    None, если на неделе нет пар
+    """
+    dates, cells, bells = week_grid(schedule, week)
+    if not cells:
+        return None
+
+    numbers = sorted(bells)
+    font = load_font(13)
+    small_font = load_font(12)
+    title_font = load_font(18)
+
+    # Высота строки пары - по самой заполненной ячейке этой строки
+    cell_text_width = CELL_WIDTH - 2 * CELL_PADDING
+    row_contents = {}
+    row_heights = {}
+    for number in numbers:
+        row_lines = 2
+        for day in dates:
+            content = []
+            for lesson in cells.get((day, number), ()):
+                subject = wrap(
+                    lesson.subject or "", font, cell_text_width, SUBJECT_LINES
+                )
+                detail = wrap(describe(lesson), small_font, cell_text_width, 1)
+                content.append((subject, detail))
+            row_contents[(day, number)] = content
+            row_lines = max(row_lines, sum(len(s) + len(d) for s, d in content))
+        row_heights[number] = row_lines * LINE_HEIGHT + 2 * CELL_PADDING
+
+    width = NUMBER_COLUMN_WIDTH + CELL_WIDTH * len(dates) + 1
+    height = HEADER_HEIGHT + DAY_ROW_HEIGHT + sum(row_heights.values()) + 1
+
+    image = Image.new("RGB", (width, height), BACKGROUND)
+    draw = ImageDraw.Draw(image)
+    draw.text((CELL_PADDING * 2, 16), title, font=title_font, fill=TEXT)
+
+    top = HEADER_HEIGHT
+    draw.rectangle((0, top, width - 1, top + DAY_ROW_HEIGHT), fill=HEADER_BACKGROUND)
+    for column, day in enumerate(dates):
+        left = NUMBER_COLUMN_WIDTH + column * CELL_WIDTH
+        draw.text(
+            (left + CELL_PADDING, top + 10),
+            f"{WEEKDAYS[day.weekday()]} {day:%d.%m}",
+            font=font,
+            fill=TEXT,
+        )
+
+    top += DAY_ROW_HEIGHT
+    for number in numbers:
+        draw.line((0, top, width, top), fill=GRID)
+        draw.text((CELL_PADDING, top + CELL_PADDING), str(number), font=font, fill=TEXT)
+        draw.text(
+            (CELL_PADDING, top + CELL_PADDING + LINE_HEIGHT),
+            bells[number],
+            font=small_font,
+            fill=MUTED,
+        )
+
+        for column, day in enumerate(dates):
+            x = NUMBER_COLUMN_WIDTH + column * CELL_WIDTH + CELL_PADDING
+            y = top + CELL_PADDING
+            for subject, detail in row_contents[(day, number)]:
+                for line in subject:
+                    draw.text((x, y), line, font=font, fill=TEXT)
+                    y += LINE_HEIGHT
+                for line in detail:
+                    draw.text((x, y), line, font=small_font, fill=MUTED)
+                    y += LINE_HEIGHT
+
+        top += row_heights[number]
+
+    draw.line((0, top, width, top), fill=GRID)
+    for column in range(len(dates) + 1):
+        x = NUMBER_COLUMN_WIDTH + column * CELL_WIDTH
+        draw.line((x, HEADER_HEIGHT, x, top), fill=GRID)
+    draw.line((0, HEADER_HEIGHT, 0, top), fill=GRID)
+
+    buffer = io.BytesIO()
+    image.save(buffer, format="PNG", optimize=True)
+    return buffer.getvalue()
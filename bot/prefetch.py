@@ -0,0 +1,123 @@
+import time
+
+from bot import tasks
+from bot.analytics.tracker import analytics
+from bot.config import settings
+from bot.fetch import upstream
+from bot.fetch.cache import TTLCache
+from bot.fetch.models import SearchItem
+from bot.fetch.schedule import get_schedules, is_schedule_cached
+
+# Окно, в котором действует бюджет упреждающих загрузок пользователя
+PREFETCH_BUDGET_WINDOW = 10 * 60
+# Сколько упреждающих загрузок может идти одновременно во всем боте:
+# в пик нагрузки упреждение не должно отнимать API у обычных запросов
+PREFETCH_MAX_INFLIGHT = 16
+# Сколько живет отметка о загруженных заранее расписаниях пользователя
+PREFETCH_CHOICE_TTL = 10 * 60
+
+
+def rank_candidates(query: str | None, items: list[SearchItem]) -> list[SearchItem]:
+    """
+    Варианты уточнения по вероятности выбора: точное совпадение с запросом,
+    совпадение начала названия, затем популярность за последние сутки
+    """
+    query = (query or "").strip().lower()
+
+    def score(item: SearchItem) -> tuple[bool, bool, int]:
+        name = (item.name or "").lower()
+        return (
+            bool(query) and name == query,
+            bool(query) and name.startswith(query),
+            analytics.item_popularity(item),
+        )
+
+    return sorted(items, key=score, reverse=True)
+
+
+class SchedulePrefetcher:
+    """
+    Пока пользователь выбирает из клавиатуры уточнения, заранее загружает в кэш
+    расписания самых вероятных вариантов, чтобы нажатие обслуживалось из кэша.
+    Нажатие во время загрузки дожидается уже отправленного запроса (см. get_schedule)
+    """
+
+    def __init__(self):
+        # id пользователя -> (начало окна бюджета, сколько загрузок потрачено)
+        self.spent = TTLCache(maxsize=16384, ttl=PREFETCH_BUDGET_WINDOW)
+        # id пользователя -> ключи загруженных для него заранее расписаний
+        self.prefetched = TTLCache(maxsize=16384, ttl=PREFETCH_CHOICE_TTL)
+        self.inflight = 0
+        self.started = 0
+        self.hits = 0
+        self.misses = 0
+
+    def prefetch(self, user_id: int, query: str | None, items: list[SearchItem]):
+        now = time.monotonic()
+        window_start, spent = self.spent.get(user_id, (now, 0))
+        limit = min(
+            settings.prefetch_items,
+            settings.prefetch_budget - spent,
+            PREFETCH_MAX_INFLIGHT - self.inflight,
+        )
+        if limit <= 0:
+            return
+
+        known = self.prefetched.get(user_id) or set()
+        candidates = [
+            item
+            for item in rank_candidates(query, items)
+            if (item.type, item.uid) not in known and not is_schedule_cached(item)
+        ][:limit]
+        if not candidates:
+            return
+
+        # Окно бюджета начинается с первой загрузки и не продлевается
+        self.spent.set(
+            user_id,
+            (window_start, spent + len(candidates)),
+            ttl=window_start + PREFETCH_BUDGET_WINDOW - now,
+        )
+        self.prefetched.set(
+            user_id, known | {(item.type, item.uid) for item in candidates}
+        )
+
+        self.inflight += len(candidates)
+        self.started += len(candidates)
+        # Упреждающая загрузка не ограничена дедлайном запроса, который ее начал
+        tasks.start_background(
+            self._load(candidates),
+            "schedule prefetch",
+            context=upstream.without_deadline(),
+        )
+
+    async def _load(self, items: list[SearchItem]):
+        try:
+            await get_schedules(items)
+        finally:
+            self.inflight -= len(items)
+
+    def record_choice(self, user_id: int, item: SearchItem):
+        """
+        Отмечает выбор пользователя для статистики попаданий упреждения
+        """
+        known = self.prefetched.pop(user_id)
+        if known is None:
+            return
+
+        if (item.type, item.uid) in known:
+            self.hits += 1
+        else:
+            self.misses += 1
+
+    def stats(self) -> dict:
+        chosen = self.hits + self.misses
+        return {
+            "started": self.started,
+            "inflight": self.inflight,
+            "hits": self.hits,
+            "hit_rate": self.hits / chosen if chosen else 0.0,
+        }
+
+
+schedule_prefetcher = SchedulePrefetcher()
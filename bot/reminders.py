@@ -0,0 +1,232 @@
+import asyncio
+import bisect
+import datetime
+import heapq
+import logging
+
+from bot import tasks
+from bot.delivery import delivery
+from bot.fetch.models import ScheduleData, SearchItem
+from bot.fetch.schedule import get_schedules, schedule_listeners
+from bot.index.intervals import LessonIntervals
+from bot.parse.formating import format_short_lesson
+
+logger = logging.getLogger(__name__)
+
+# Сколько сообщений ставится в очередь отправки за один проход цикла событий
+REMINDER_BATCH = 500
+# Как часто перезагружать расписания, на которые есть напоминания
+REMINDER_REFRESH_INTERVAL = 6 * 60 * 60
+# Напоминания, опоздавшие больше чем на это время (например, после перезапуска),
+# не отправляются
+REMINDER_MAX_DELAY = datetime.timedelta(minutes=2)
+
+
+class ReminderScheduler:
+    """
+    Напоминания о начале пар для всех подписчиков на одном таймере.
+
+    Подписчики сгруппированы в потоки (тип, uid, минуты до пары). В куче лежит
+    только ближайшее срабатывание каждого потока, поэтому ее размер равен числу
+    различных пар (расписание, минуты), а не числу пользователей. Цикл просыпается
+    один раз на каждое различное время срабатывания и рассылает напоминания всем
+    потокам с этим временем. Устаревшие записи кучи отбрасываются по номеру поколения
+    """
+
+    def __init__(self):
+        # (тип, uid) -> расписание, по которому считаются срабатывания
+        self.schedules: dict[tuple[str, int], tuple[SearchItem, ScheduleData]] = {}
+        # (тип, uid, минуты) -> id пользователей
+        self.streams: dict[tuple[str, int, int], set[int]] = {}
+        # id пользователя -> потоки, в которых он состоит
+        self.users: dict[int, set[tuple[str, int, int]]] = {}
+        self.generations: dict[tuple[str, int, int], int] = {}
+        self.heap: list[tuple[datetime.datetime, int, tuple[str, int, int]]] = []
+        self.items: dict[tuple[str, int], SearchItem] = {}
+        self._wakeup = asyncio.Event()
+        self.sent = 0
+
+    def __len__(self):
+        return len(self.users)
+
+    def set_user(self, user_id: int, minutes: int | None, items: list[SearchItem]):
+        """
+        Заменяет подписки пользователя. minutes=None или пустой items отключают их
+        """
+        new_streams = (
+            {(item.type, item.uid, minutes) for item in items} if minutes else set()
+        )
+        old_streams = self.users.pop(user_id, set())
+
+        closed = set()
+        for stream in old_streams - new_streams:
+            subscribers = self.streams.get(stream)
+            if subscribers is not None:
+                subscribers.discard(user_id)
+                if not subscribers:
+                    del self.streams[stream]
+                    self.generations.pop(stream, None)
+                    closed.add((stream[0], stream[1]))
+
+        if new_streams:
+            for item in items:
+                self.items.setdefault((item.type, item.uid), item)
+
+        for stream in new_streams - old_streams:
+            subscribers = self.streams.setdefault(stream, set())
+            subscribers.add(user_id)
+            if len(subscribers) == 1:
+                self._schedule_stream(stream)
+
+        if new_streams:
+            self.users[user_id] = new_streams
+
+        if closed:
+            self._forget(closed)
+
+    def _forget(self, keys: set[tuple[str, int]]):
+        """
+        Удаляет расписания, на которые не осталось ни одного потока
+        """
+        keys -= {(stream[0], stream[1]) for stream in self.streams}
+        for key in keys:
+            self.schedules.pop(key, None)
+            self.items.pop(key, None)
+
+    def missing_items(self) -> list[SearchItem]:
+        """
+        Расписания потоков, которые еще не загружены
+        """
+        keys = {(stream[0], stream[1]) for stream in self.streams}
+        return [self.items[key] for key in keys if key not in self.schedules]
+
+    def ingest(self, item: SearchItem, schedule: ScheduleData):
+        """
+        Слушатель загрузки расписаний: при изменении расписания пересчитываются
+        только его потоки
+        """
+        key = (item.type, item.uid)
+        if key not in self.items:
+            return
+
+        previous = self.schedules.get(key)
+        self.schedules[key] = (self.items[key], schedule)
+        if previous is not None and previous[1].version == schedule.version:
+            return
+
+        for stream in self.streams:
+            if (stream[0], stream[1]) == key:
+                self._schedule_stream(stream)
+
+    def _next_start(
+        self, stream: tuple[str, int, int], after: datetime.datetime
+    ) -> datetime.datetime | None:
+        entry = self.schedules.get((stream[0], stream[1]))
+        if entry is None:
+            return None
+
+        intervals = LessonIntervals.for_schedule(entry[1])
+        lead = datetime.timedelta(minutes=stream[2])
+        position = bisect.bisect_right(intervals.starts, after + lead)
+        if position == len(intervals.starts):
+            return None
+        return intervals.starts[position]
+
+    def _schedule_stream(
+        self, stream: tuple[str, int, int], after: datetime.datetime = None
+    ):
+        generation = self.generations.get(stream, 0) + 1
+        self.generations[stream] = generation
+
+        start = self._next_start(stream, after or datetime.datetime.now())
+        if start is None:
+            return
+
+        fire_at = start - datetime.timedelta(minutes=stream[2])
+        if not self.heap or fire_at < self.heap[0][0]:
+            self._wakeup.set()
+        heapq.heappush(self.heap, (fire_at, generation, stream))
+
+    def _pop_due(self, moment: datetime.datetime):
+        """
+        Снимает с кучи все актуальные записи со временем срабатывания не позже moment
+        """
+        due = []
+        while self.heap and self.heap[0][0] <= moment:
+            fire_at, generation, stream = heapq.heappop(self.heap)
+            if self.generations.get(stream) == generation:
+                due.append((fire_at, stream))
+        return due
+
+    def render(self, stream: tuple[str, int, int], start: datetime.datetime) -> str:
+        item, schedule = self.schedules[(stream[0], stream[1])]
+        intervals = LessonIntervals.for_schedule(schedule)
+        lessons = intervals.between(start, start + datetime.timedelta(seconds=1))
+
+        text = f"⏰ Через {stream[2]} мин. пара ({start:%H:%M})\nℹ️ {item.name}\n\n"
+        text += "".join(format_short_lesson(lesson) for _, _, lesson in lessons)
+        return text
+
+    async def fire(self, moment: datetime.datetime):
+        due = self._pop_due(moment)
+
+        queued = 0
+        for fire_at, stream in due:
+            start = fire_at + datetime.timedelta(minutes=stream[2])
+            if moment - fire_at <= REMINDER_MAX_DELAY:
+                text = self.render(stream, start)
+                for number, user_id in enumerate(list(self.streams.get(stream, ()))):
+                    delivery.send(user_id, text)
+                    queued += 1
+                    if number % REMINDER_BATCH == REMINDER_BATCH - 1:
+                        await asyncio.sleep(0)
+
+            self._schedule_stream(stream, after=fire_at)
+
+        self.sent += queued
+        if due:
+            logger.info("Reminders: %d streams fired, %d queued", len(due), queued)
+
+    async def run(self):
+        while True:
+            self._wakeup.clear()
+            timeout = None
+            if self.heap:
+                timeout = (self.heap[0][0] - datetime.datetime.now()).total_seconds()
+
+            if timeout is None or timeout > 0:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout)
+                    continue
+                except asyncio.TimeoutError:
+                    pass
+
+            await self.fire(datetime.datetime.now())
+
+    async def refresh(self):
+        """
+        Загружает расписания всех потоков. Изменившиеся расписания попадают
+        в планировщик через schedule_listeners
+        """
+        items = [self.items[key] for key in {(s[0], s[1]) for s in self.streams}]
+        await get_schedules(items, cache=False)
+
+    async def start(self, subscriptions: list[tuple[int, int, list[SearchItem]]]):
+        for user_id, minutes, items in subscriptions:
+            self.set_user(user_id, minutes, items)
+
+        await get_schedules(self.missing_items())
+        tasks.start_background(self.run(), "lesson reminders")
+        tasks.start_periodic(
+            self.refresh, REMINDER_REFRESH_INTERVAL, "lesson reminders refresh"
+        )
+        logger.info(
+            "Reminders: %d users, %d streams, %d schedules",
+            len(self.users),
+            len(self.streams),
+            len(self.schedules),
+        )
+
+
+reminder_scheduler = ReminderScheduler()
+schedule_listeners.append(reminder_scheduler.ingest)
@@ -0,0 +1,338 @@
+"""
+Воспроизведение трафика, записанного с RECORD_FILE, через обработчики бота:
+
+    python -m bot.replay traffic.jsonl --speed 5 --since "2023-10-16 08:00" --until "2023-10-16 10:00"
+
+Telegram и API подменяются локальными заглушками: API отвечает записанными
+ответами с записанной задержкой, Bot API отвечает сразу (или через --bot-latency).
+В конце печатаются перцентили времени обработки обновлений
+"""
+
+import argparse
+import asyncio
+import bisect
+import collections
+import datetime
+import itertools
+import json
+import logging
+import os
+import tempfile
+import time
+
+import httpx
+from telegram import Update
+from telegram.ext import ContextTypes
+from telegram.request import BaseRequest, RequestData
+
+REPLAY_TOKEN = "1:replay"
+REPLAY_API_URL = "http://api.replay"
+# Методы Bot API, которые возвращают отправленное или измененное сообщение
+MESSAGE_METHODS = {
+    "sendMessage",
+    "sendDocument",
+    "sendPhoto",
+    "editMessageText",
+    "editMessageReplyMarkup",
+    "forwardMessage",
+}
+
+
+def load_events(path: str):
+    """
+    Читает запись: обновления по порядку и ответы API по запросам
+    в виде [(время, тело, задержка)]. Ответ без тела повторяет предыдущий
+    """
+    updates = []
+    responses: dict[str, list[tuple[float, object, float]]] = {}
+
+    with open(path, encoding="utf-8") as file:
+        for line in file:
+            event = json.loads(line)
+            if "update" in event:
+                updates.append((event["t"], event["update"]))
+                continue
+
+            history = responses.setdefault(event["key"], [])
+            body = event["body"] if "body" in event else history[-1][1]
+            history.append((event["t"], body, event["latency"]))
+
+    updates.sort(key=lambda entry: entry[0])
+    return updates, responses
+
+
+class ApiStandIn(httpx.AsyncBaseTransport):
+    """
+    Локальная подмена API: на запрос отдается записанный ответ, ближайший
+    по времени записи к текущему моменту воспроизведения
+    """
+
+    def __init__(self, responses: dict, clock, latency: bool = True):
+        self.responses = responses
+        self.times = {
+            key: [t for t, _, _ in history] for key, history in responses.items()
+        }
+        self.clock = clock
+        self.latency = latency
+        self.missing = collections.Counter()
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        from bot.traffic import api_key
+
+        key = api_key(request.url)
+        history = self.responses.get(key)
+        if not history:
+            self.missing[key.split("?")[0]] += 1
+            return httpx.Response(404, json={"detail": "Not recorded"}, request=request)
+
+        position = bisect.bisect_left(self.times[key], self.clock())
+        _, body, latency = history[min(position, len(history) - 1)]
+        if self.latency:
+            await asyncio.sleep(latency)
+        return httpx.Response(200, json=body, request=request)
+
+
+class FakeBotRequest(BaseRequest):
+    """
+    Bot API, который ничего не отправляет: отвечает правдоподобными объектами
+    и считает вызовы по методам
+    """
+
+    def __init__(self, latency: float = 0.0):
+        self.latency = latency
+        self.calls = collections.Counter()
+        self._ids = itertools.count(1)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def result(self, method: str, parameters: dict):
+        if method == "getMe":
+            return {
+                "id": 1,
+                "is_bot": True,
+                "first_name": "Replay",
+                "username": "replay_bot",
+            }
+
+        if method == "getChatMember":
+            user = {"id": parameters["user_id"], "is_bot": False, "first_name": "user"}
+            return {"status": "member", "user": user}
+
+        if method not in MESSAGE_METHODS or "inline_message_id" in parameters:
+            return True
+
+        message_id = next(self._ids)
+        message = {
+            "message_id": parameters.get("message_id", message_id),
+            "date": int(time.time()),
+            "chat": {"id": parameters.get("chat_id", 0), "type": "private"},
+        }
+        if "text" in parameters:
+            message["text"] = parameters["text"]
+        if method == "sendDocument":
+            message["document"] = {
+                "file_id": f"replay-{message_id}",
+                "file_unique_id": f"replay-{message_id}",
+            }
+        if method == "sendPhoto":
+            message["photo"] = [
+                {
+                    "file_id": f"replay-{message_id}",
+                    "file_unique_id": f"replay-{message_id}",
+                    "width": 1,
+                    "height": 1,
+                }
+            ]
+        return message
+
+    async def do_request(
+        self,
+        url: str,
+        method: str,
+        request_data: RequestData = None,
+        read_timeout=None,
+        write_timeout=None,
+        connect_timeout=None,
+        pool_timeout=None,
+    ) -> tuple[int, bytes]:
+        api_method = url.rsplit("/", 1)[-1]
+        self.calls[api_method] += 1
+        if self.latency:
+            await asyncio.sleep(self.latency)
+
+        parameters = request_data.parameters if request_data else {}
+        result = self.result(api_method, parameters)
+        return 200, json.dumps({"ok": True, "result": result}).encode()
+
+
+def update_kind(update: Update) -> str:
+    if update.inline_query:
+        return "inline"
+    if update.callback_query:
+        return "callback"
+    if update.message and update.message.text:
+        if update.message.text.startswith("/"):
+            return update.message.text.split()[0].split("@")[0]
+        return "text"
+    return "other"
+
+
+def format_report(latencies: dict[str, list[float]], elapsed: float, **extra) -> str:
+    from bot.updates import percentile
+
+    text = f"Воспроизведено за {elapsed:.1f} с\n\n"
+    text += f"{'тип':<16}{'число':>8}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}\n"
+
+    everything = list(itertools.chain.from_iterable(latencies.values()))
+    rows = sorted(latencies.items(), key=lambda entry: -len(entry[1]))
+    for kind, samples in rows + [("всего", everything)]:
+        text += (
+            f"{kind:<16}{len(samples):>8}"
+            f"{percentile(samples, 0.5) * 1000:>7.0f}мс"
+            f"{percentile(samples, 0.95) * 1000:>7.0f}мс"
+            f"{percentile(samples, 0.99) * 1000:>7.0f}мс"
+            f"{max(samples, default=0) * 1000:>7.0f}мс\n"
+        )
+
+    for name, value in extra.items():
+        text += f"\n{name}: {value}"
+    return text
+
+
+def parse_moment(value: str) -> float:
+    return datetime.datetime.fromisoformat(value).timestamp()
+
+
+async def replay(args: argparse.Namespace):
+    from bot import setup, start, tasks
+    from bot.db import sqlite
+    from bot.fetch import upstream
+
+    updates, responses = load_events(args.file)
+    if args.since:
+        updates = [entry for entry in updates if entry[0] >= parse_moment(args.since)]
+    if args.until:
+        updates = [entry for entry in updates if entry[0] < parse_moment(args.until)]
+    if not updates:
+        print("В записи нет обновлений за выбранный период")
+        return
+
+    # Запись в базу идет во временный файл, рабочая база не затрагивается
+    database = tempfile.NamedTemporaryFile(suffix=".db", delete=False)
+    database.close()
+    sqlite.db.init(database.name)
+
+    first = updates[0][0]
+    started = time.monotonic()
+
+    def clock() -> float:
+        # Текущий момент воспроизведения во времени записи
+        return first + (time.monotonic() - started) * args.speed
+
+    stand_in = ApiStandIn(responses, clock, latency=not args.no_api_latency)
+    await upstream.use_transport(stand_in)
+
+    bot_request = FakeBotRequest(args.bot_latency)
+    application = start.build_application(REPLAY_TOKEN, request=bot_request)
+    setup.setup(application)
+    application.bot_data["maintenance_mode"] = False
+    # Журнал запросов пользователей не нужен и искажает замеры
+    logging.getLogger("bot.handlers").setLevel(logging.WARNING)
+
+    await application.initialize()
+    await application.start()
+    # Без загрузки каталогов, фоновых циклов и HTTP API: в записи их нет,
+    # и воспроизведение не должно занимать порт работающего бота
+    await setup.deferred_init(application, background=False)
+
+    latencies: dict[str, list[float]] = collections.defaultdict(list)
+    errors = collections.Counter()
+
+    # Исключения обработчиков PTB перехватывает сам и передает обработчикам
+    # ошибок, наружу из process_update они не выходят. Без своего обработчика
+    # PTB сам пишет их в лог, поэтому лог сохраняется и здесь
+    async def count_error(update: object, context: ContextTypes.DEFAULT_TYPE):
+        kind = update_kind(update) if isinstance(update, Update) else "other"
+        errors[kind] += 1
+        logging.getLogger(__name__).warning(
+            "Handling %s failed", kind, exc_info=context.error
+        )
+
+    application.add_error_handler(count_error)
+
+    async def process(update: Update):
+        arrived = time.monotonic()
+        await application.update_processor.process_update(
+            update, application.process_update(update)
+        )
+        latencies[update_kind(update)].append(time.monotonic() - arrived)
+
+    started = time.monotonic()
+    running = set()
+    for moment, data in updates:
+        delay = (moment - first) / args.speed - (time.monotonic() - started)
+        if delay > 0:
+            await asyncio.sleep(delay)
+
+        task = asyncio.create_task(process(Update.de_json(data, application.bot)))
+        running.add(task)
+        task.add_done_callback(running.discard)
+
+    await asyncio.gather(*running)
+    elapsed = time.monotonic() - started
+
+    await tasks.stop_all()
+    await application.stop()
+    await application.shutdown()
+    await upstream.close_client()
+    sqlite.db.close()
+    os.remove(database.name)
+
+    print(
+        format_report(
+            latencies,
+            elapsed,
+            **{
+                "Ошибки": dict(errors) or "нет",
+                "Вызовы Bot API": dict(bot_request.calls.most_common()),
+                "Запросы к API без записанного ответа": dict(stand_in.missing) or "нет",
+                "Ожидание в очереди обработки": application.update_processor.stats(),
+            },
+        )
+    )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        prog="python -m bot.replay",
+        description="Воспроизведение записанного трафика с замером задержек",
+    )
+    parser.add_argument("file", help="JSONL, записанный с RECORD_FILE")
+    parser.add_argument("--speed", type=float, default=1.0, help="ускорение, N×")
+    parser.add_argument("--since", help="начало периода, ГГГГ-ММ-ДД ЧЧ:ММ")
+    parser.add_argument("--until", help="конец периода, ГГГГ-ММ-ДД ЧЧ:ММ")
+    parser.add_argument(
+        "--no-api-latency",
+        action="store_true",
+        help="отвечать за API без записанной задержки",
+    )
+    parser.add_argument(
+        "--bot-latency", type=float, default=0.0, help="задержка Bot API, секунды"
+    )
+    args = parser.parse_args()
+
+    # Без .env бот обращается к подставному адресу API, ответы все равно
+    # приходят из записи
+    os.environ.setdefault("TOKEN", REPLAY_TOKEN)
+    os.environ.setdefault("API_URL", REPLAY_API_URL)
+    logging.basicConfig(level=logging.WARNING)
+
+    asyncio.run(replay(args))
+
+
+if __name__ == "__main__":
+    main()
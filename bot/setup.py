@@ -1,15 +1,121 @@
-def setup(application):
-    import bot.handlers.events as events
-    import bot.handlers.handler as handler
-    import bot.handlers.info as info
-    import bot.handlers.inline as inline
-    from bot.db.sqlite import ScheduleBot, db
-
-    db.connect()
-    db.create_tables([ScheduleBot])
-    db.close()
-
-    info.init_handlers(application)
-    events.init_handlers(application)
-    handler.init_handlers(application)
-    inline.init_handlers(application)
+import asyncio
+import logging
+from typing import Awaitable, Callable
+
+from telegram.ext import Application
+
+from bot.startup import profile
+
+logger = logging.getLogger(__name__)
+
+# Некритичная инициализация, которая выполняется в фоне после того,
+# как бот начал принимать обновления: (название, async функция от application,
+# фоновая ли она). Фоновые этапы обращаются к API, запускают циклы или открывают
+# порты, поэтому при замере запуска и воспроизведении трафика пропускаются
+DEFERRED_INIT: list[tuple[str, Callable[[Application], Awaitable], bool]] = []
+
+
+def setup(application, primary: bool = True):
+    """
+    Регистрирует обработчики. Рассылки, напоминания и команды администратора
+    есть только у главного бота: подписки хранятся без привязки к боту
+    """
+    with profile.phase("import handlers"):
+        import bot.handlers.common as common
+        import bot.handlers.diagnostics as diagnostics
+        import bot.handlers.digest as digest
+        import bot.handlers.events as events
+        import bot.handlers.handler as handler
+        import bot.handlers.info as info
+        import bot.handlers.inline as inline
+        import bot.handlers.lessons as lessons
+        import bot.handlers.now as now
+        import bot.handlers.remind as remind
+        import bot.handlers.rooms as rooms
+        import bot.handlers.sessions as sessions
+
+    with profile.phase("register handlers"):
+        sessions.init_handlers(application)
+        info.init_handlers(application)
+        if primary:
+            events.init_handlers(application)
+        handler.init_handlers(application)
+        inline.init_handlers(application)
+        rooms.init_handlers(application)
+        lessons.init_handlers(application)
+        now.init_handlers(application)
+        common.init_handlers(application)
+        if primary:
+            digest.init_handlers(application)
+            remind.init_handlers(application)
+            diagnostics.init_handlers(application)
+
+
+async def create_tables(application):
+    from bot.db.sqlite import create_tables
+
+    await asyncio.to_thread(create_tables)
+
+
+async def build_occupancy_index(application):
+    from bot.handlers.rooms import build_occupancy_index
+
+    await build_occupancy_index(application)
+
+
+async def build_lesson_index(application):
+    from bot.handlers.lessons import build_lesson_index
+
+    await build_lesson_index(application)
+
+
+async def start_digests(application):
+    from bot.handlers.digest import start_digests
+
+    await start_digests(application)
+
+
+async def start_reminders(application):
+    from bot.handlers.remind import start_reminders
+
+    await start_reminders(application)
+
+
+async def start_session_sweep(application):
+    from bot.handlers.sessions import start_session_sweep
+
+    await start_session_sweep(application)
+
+
+async def start_http_api(application):
+    from bot.http_api import start_http_api
+
+    await start_http_api(application)
+
+
+DEFERRED_INIT.append(("database tables", create_tables, False))
+DEFERRED_INIT.append(("free rooms index", build_occupancy_index, True))
+DEFERRED_INIT.append(("lesson index", build_lesson_index, True))
+DEFERRED_INIT.append(("daily digests", start_digests, True))
+DEFERRED_INIT.append(("lesson reminders", start_reminders, True))
+DEFERRED_INIT.append(("session sweep", start_session_sweep, True))
+DEFERRED_INIT.append(("http api", start_http_api, True))
+
+
+async def deferred_init(application, background: bool = True):
+    """
+    Выполняет отложенную инициализацию. background=False пропускает фоновые
+    этапы: загрузку каталогов, рассылки, напоминания и HTTP API
+    """
+    for name, init, is_background in DEFERRED_INIT:
+        if is_background and not background:
+            logger.debug("Deferred initialization %s skipped", name)
+            continue
+
+        try:
+            with profile.phase(f"deferred: {name}"):
+                await init(application)
+        except Exception:
+            logger.exception("Deferred initialization %s failed", name)
+
+    logger.info(profile.report())
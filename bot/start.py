@@ -1,30 +1,148 @@
+import asyncio
 import logging
+import signal
 
 from telegram.ext import Application
+from telegram.request import BaseRequest
 
-from bot.config import settings
+from bot import config, tasks
+from bot.fetch import upstream
+from bot.logs.lazy_logger import lazy_logger
+from bot.startup import profile
+from bot.traffic import recorder
+from bot.updates import ChatOrderedUpdateProcessor
 
 logging.basicConfig(
     format="%(asctime)s - %(name)s - %(levelname)s - %(message)s", level=logging.INFO
 )
 logging.getLogger("httpx").setLevel(logging.WARNING)
 
+logger = logging.getLogger(__name__)
 
-def main() -> None:
+
+def main(profile_startup: bool = False) -> None:
     """Start the bot."""
-    from bot import setup
+    # Доступ к config.settings читает .env, поэтому только здесь, а не при импорте
+    with profile.phase("load config"):
+        settings = config.settings
 
-    application = (
-        Application.builder()
-        .token(settings.token)
-        .post_init(post_init=post_init)
-        .build()
-    )
+    with profile.phase("import bot.setup"):
+        from bot import setup
+
+    with profile.phase("build application"):
+        applications = [
+            build_application(token, primary=number == 0)
+            for number, token in enumerate(settings.bot_tokens)
+        ]
+        application = applications[0]
+
+    for number, bot_application in enumerate(applications):
+        setup.setup(bot_application, primary=number == 0)
+        if number:
+            # Режим обслуживания общий для всех ботов процесса
+            bot_application.bot_data = application.bot_data
+
+    if profile_startup:
+        # Только замер запуска: отложенная инициализация без фоновых этапов
+        # выполняется сразу, отчет печатается, бот не подключается к Telegram
+        profile.disable_import_timing()
+        logging.getLogger("bot.setup").setLevel(logging.WARNING)
+        asyncio.run(setup.deferred_init(application, background=False))
+        print(profile.report())
+        return
+
+    lazy_logger.start(log_file=settings.log_file, sample_rate=settings.log_sample_rate)
+    if settings.record_file:
+        for bot_application in applications:
+            recorder.start(bot_application, settings.record_file)
+
+    try:
+        if len(applications) == 1:
+            application.run_polling()
+        else:
+            asyncio.run(run_polling_all(applications))
+    finally:
+        recorder.stop()
+        lazy_logger.stop()
+
+
+async def run_polling_all(applications: list[Application]):
+    """
+    Несколько ботов в одном цикле событий: у них общие клиент API, кэш
+    расписаний и индексы, поэтому память и число запросов к API зависят
+    от числа разных расписаний, а не от числа ботов. post_init и post_stop
+    есть только у главного бота и выполняются один раз
+    """
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for signum in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(signum, stop.set)
 
-    setup.setup(application)
+    started = []
+    try:
+        for application in applications:
+            await application.initialize()
+            started.append(application)
+            if application.post_init:
+                await application.post_init(application)
+            await application.updater.start_polling()
+            await application.start()
+            logger.info("Bot @%s started", application.bot.username)
 
-    application.run_polling()
+        await stop.wait()
+    finally:
+        # Главный бот останавливается последним: его post_stop закрывает общий клиент
+        for application in reversed(started):
+            if application.updater.running:
+                await application.updater.stop()
+            if application.running:
+                await application.stop()
+            if application.post_stop:
+                await application.post_stop(application)
+            await application.shutdown()
+
+
+def build_application(
+    token: str, request: BaseRequest = None, primary: bool = True
+) -> Application:
+    """
+    Приложение без обработчиков. request заменяет HTTP-клиент Telegram Bot API,
+    например на подставной при воспроизведении трафика. Фоновые задачи
+    запускает и останавливает только главный бот
+    """
+    settings = config.settings
+    builder = (
+        Application.builder()
+        .token(token)
+        .concurrent_updates(
+            ChatOrderedUpdateProcessor(
+                settings.max_concurrent_updates,
+                settings.max_pending_updates,
+                deadline=settings.update_deadline,
+            )
+        )
+    )
+    if primary:
+        builder = builder.post_init(post_init=post_init).post_stop(post_stop=post_stop)
+    if request is not None:
+        builder = builder.request(request).get_updates_request(request)
+    return builder.build()
 
 
 async def post_init(application: Application) -> None:
+    from bot import setup
+    from bot.analytics.tracker import analytics
+
     application.bot_data["maintenance_mode"] = False
+    tasks.start_background(setup.deferred_init(application), "deferred init")
+    tasks.start_periodic(
+        analytics.persist, config.settings.analytics_persist_interval, "analytics"
+    )
+
+
+async def post_stop(application: Application) -> None:
+    from bot.analytics.tracker import analytics
+
+    await tasks.stop_all()
+    await analytics.persist()
+    await upstream.close_client()
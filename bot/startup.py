@@ -0,0 +1,101 @@
+import sys
+import time
+from contextlib import contextmanager
+from importlib.abc import MetaPathFinder
+
+
+class StartupProfile:
+    """
+    Замеры времени запуска: этапы инициализации и, в режиме --profile-startup,
+    время импорта каждого модуля (полное и собственное, без вложенных импортов)
+    """
+
+    def __init__(self):
+        self.phases: list[tuple[str, float]] = []
+        self.imports: list[tuple[str, float, float]] = []
+        self._children: list[float] = []
+        self._finder = None
+
+    @contextmanager
+    def phase(self, name: str):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.phases.append((name, time.perf_counter() - start))
+
+    def enable_import_timing(self):
+        if self._finder is None:
+            self._finder = _TimingFinder(self)
+            sys.meta_path.insert(0, self._finder)
+
+    def disable_import_timing(self):
+        if self._finder is not None:
+            sys.meta_path.remove(self._finder)
+            self._finder = None
+
+    def report(self, top: int = 30) -> str:
+        lines = ["Startup phases:"]
+        for name, duration in self.phases:
+            lines.append(f"{duration * 1000:10.1f} ms  {name}")
+
+        if self.imports:
+            lines.append(f"Slowest imports (top {top} by self time):")
+            lines.append("   self, ms   total, ms  module")
+            imports = sorted(self.imports, key=lambda entry: entry[2], reverse=True)
+            for name, total, own in imports[:top]:
+                lines.append(f"{own * 1000:11.1f} {total * 1000:11.1f}  {name}")
+
+        return "\n".join(lines)
+
+    def _exec_module(self, loader, module):
+        self._children.append(0.0)
+        start = time.perf_counter()
+        try:
+            loader.exec_module(module)
+        finally:
+            total = time.perf_counter() - start
+            children = self._children.pop()
+            if self._children:
+                self._children[-1] += total
+            self.imports.append((module.__name__, total, total - children))
+
+
+class _TimingFinder(MetaPathFinder):
+    def __init__(self, profile: StartupProfile):
+        self.profile = profile
+
+    def find_spec(self, fullname, path, target=None):
+        for finder in sys.meta_path:
+            if finder is self or not hasattr(finder, "find_spec"):
+                continue
+
+            spec = finder.find_spec(fullname, path, target)
+            if spec is None:
+                continue
+
+            if spec.loader is not None and hasattr(spec.loader, "exec_module"):
+                spec.loader = _TimingLoader(spec.loader, self.profile)
+            return spec
+
+        return None
+
+
+class _TimingLoader:
+    def __init__(self, loader, profile: StartupProfile):
+        self.loader = loader
+        self.profile = profile
+
+    def create_module(self, spec):
+        create_module = getattr(self.loader, "create_module", None)
+        return create_module(spec) if create_module else None
+
+    def exec_module(self, module):
+        module.__loader__ = self.loader
+        self.profile._exec_module(self.loader, module)
+
+    def __getattr__(self, name):
+        return getattr(self.loader, name)
+
+
+profile = StartupProfile()
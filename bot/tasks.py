@@ -0,0 +1,53 @@
+import asyncio
+import contextvars
+import logging
+from typing import Awaitable, Callable
+
+logger = logging.getLogger(__name__)
+
+_tasks: set[asyncio.Task] = set()
+
+
+def start_background(
+    coroutine: Awaitable, name: str, context: contextvars.Context = None
+) -> asyncio.Task:
+    """
+    Запускает фоновую задачу, которая будет отменена при остановке бота.
+    context - контекст задачи вместо копии текущего
+    """
+    task = asyncio.create_task(_guarded(coroutine, name), name=name, context=context)
+    _tasks.add(task)
+    task.add_done_callback(_tasks.discard)
+    return task
+
+
+def start_periodic(
+    callback: Callable[[], Awaitable], interval: float, name: str
+) -> asyncio.Task:
+    """
+    Вызывает callback каждые interval секунд до остановки бота.
+    Ошибка в одном вызове логируется и не прерывает цикл
+    """
+
+    async def loop():
+        while True:
+            await asyncio.sleep(interval)
+            await _guarded(callback(), name)
+
+    return start_background(loop(), name)
+
+
+async def stop_all():
+    for task in list(_tasks):
+        task.cancel()
+
+    await asyncio.gather(*_tasks, return_exceptions=True)
+
+
+async def _guarded(coroutine: Awaitable, name: str):
+    try:
+        return await coroutine
+    except asyncio.CancelledError:
+        raise
+    except Exception:
+        logger.exception("Background task %s failed", name)
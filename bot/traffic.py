@@ -0,0 +1,177 @@
+import hashlib
+import hmac
+import json
+import logging
+import os
+import queue
+import threading
+import time
+
+import httpx
+from telegram import Update
+from telegram.ext import Application, ContextTypes, TypeHandler
+
+from bot import config
+from bot.fetch import upstream
+
+logger = logging.getLogger(__name__)
+
+# Поля с содержимым, которое не нужно для воспроизведения и может быть личным
+PRIVATE_KEYS = {
+    "contact",
+    "location",
+    "venue",
+    "photo",
+    "voice",
+    "video",
+    "video_note",
+    "audio",
+    "document",
+    "sticker",
+    "phone_number",
+    "bio",
+}
+NAME_KEYS = {"first_name", "last_name", "username", "title"}
+
+
+def api_path(url: httpx.URL) -> str:
+    """
+    Путь запроса относительно API_URL, чтобы запись не зависела от адреса API
+    """
+    prefix = httpx.URL(config.settings.api_url).path.rstrip("/")
+    path = url.path
+    return path[len(prefix) :] if prefix and path.startswith(prefix) else path
+
+
+def api_key(url: httpx.URL) -> str:
+    params = "&".join(
+        f"{key}={value}" for key, value in sorted(url.params.multi_items())
+    )
+    return f"{api_path(url)}?{params}" if params else api_path(url)
+
+
+class Anonymizer:
+    """
+    Заменяет id пользователей и чатов псевдонимами (HMAC со случайным ключом
+    процесса, знак id сохраняется), имена - заглушками, удаляет вложения
+    """
+
+    def __init__(self):
+        self._key = os.urandom(16)
+
+    def pseudonym(self, value: int) -> int:
+        digest = hmac.new(self._key, str(abs(value)).encode(), hashlib.sha256).digest()
+        pseudonym = int.from_bytes(digest[:6], "big") or 1
+        return -pseudonym if value < 0 else pseudonym
+
+    def __call__(self, data):
+        if isinstance(data, list):
+            return [self(value) for value in data]
+        if not isinstance(data, dict):
+            return data
+
+        # Пользователь или чат: у обоих есть id и имя или тип
+        is_peer = "id" in data and ("first_name" in data or "type" in data)
+
+        result = {}
+        for key, value in data.items():
+            if key in PRIVATE_KEYS:
+                continue
+            if is_peer and key == "id" and isinstance(value, int):
+                value = self.pseudonym(value)
+            elif is_peer and key in NAME_KEYS:
+                value = "user" if key == "first_name" else None
+            else:
+                value = self(value)
+            if value is not None:
+                result[key] = value
+
+        return result
+
+
+class TrafficRecorder:
+    """
+    Пишет входящие обновления и ответы API в JSONL для bot.replay.
+
+    В цикле событий обновление только превращается в словарь, а анонимизация
+    и запись выполняются в отдельном потоке. Тело ответа API пишется,
+    только если оно отличается от предыдущего ответа на тот же запрос
+    """
+
+    def __init__(self):
+        self._queue: queue.SimpleQueue | None = None
+        self._thread: threading.Thread | None = None
+        self.recorded = 0
+
+    def start(self, application: Application, path: str):
+        """
+        Начинает запись обновлений application. Для нескольких ботов
+        процесса вызывается для каждого, запись идет в один файл
+        """
+        if self._thread is None:
+            self._queue = queue.SimpleQueue()
+            self._thread = threading.Thread(
+                target=self._write, args=(path,), name="traffic recorder", daemon=True
+            )
+            self._thread.start()
+            upstream.response_listeners.append(self.record_response)
+            logger.info("Recording traffic to %s", path)
+
+        # Раньше всех остальных групп, чтобы записать и обновления,
+        # обработка которых остановлена (см. bot.handlers.sessions)
+        application.add_handler(TypeHandler(Update, self.record_update), group=-2)
+
+    def stop(self):
+        if self._thread is None:
+            return
+
+        upstream.response_listeners.remove(self.record_response)
+        self._queue.put(None)
+        self._thread.join()
+        self._thread = None
+
+    async def record_update(self, update: Update, context: ContextTypes.DEFAULT_TYPE):
+        self._queue.put(("update", time.time(), update.to_dict()))
+
+    def record_response(self, endpoint: str, response: httpx.Response, latency: float):
+        self._queue.put(("api", time.time(), (endpoint, response, latency)))
+
+    def _write(self, path: str):
+        anonymize = Anonymizer()
+        # Запрос -> хэш последнего записанного тела ответа
+        bodies: dict[str, bytes] = {}
+
+        with open(path, "a", encoding="utf-8") as file:
+            while True:
+                entry = self._queue.get()
+                if entry is None:
+                    break
+
+                kind, moment, payload = entry
+                try:
+                    if kind == "update":
+                        line = {"t": moment, "update": anonymize(payload)}
+                    else:
+                        endpoint, response, latency = payload
+                        key = api_key(response.request.url)
+                        line = {
+                            "t": moment,
+                            "api": endpoint,
+                            "key": key,
+                            "latency": round(latency, 4),
+                        }
+                        digest = hashlib.blake2b(response.content, digest_size=16)
+                        if bodies.get(key) != digest.digest():
+                            bodies[key] = digest.digest()
+                            line["body"] = response.json()
+
+                    file.write(json.dumps(line, ensure_ascii=False) + "\n")
+                    self.recorded += 1
+                except Exception:
+                    logger.exception("Failed to record %s", kind)
+
+                if self._queue.empty():
+                    file.flush()
+
+
+recorder = TrafficRecorder()
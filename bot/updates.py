@@ -0,0 +1,146 @@
+import asyncio
+import collections
+import contextlib
+import time
+from typing import Any, Awaitable
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+
+from bot.fetch import upstream
+
+# Сколько последних ожиданий хранится для перцентилей
+WAIT_SAMPLES = 1024
+
+
+def percentile(samples, fraction: float) -> float:
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * fraction))]
+
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Обрабатывает обновления разных пользователей параллельно, но не больше
+    max_concurrent_updates сразу, а обновления одного пользователя строго по очереди,
+    чтобы два быстрых нажатия не гонялись за context.user_data и состоянием диалога.
+
+    Лимит BaseUpdateProcessor ограничивает только общее число принятых обновлений
+    (max_pending_updates): обновление, ждущее своей очереди внутри чата,
+    не должно занимать слот обработки.
+
+    На обработку каждого обновления выдается бюджет deadline секунд,
+    в который должны уложиться все запросы к API (см. bot.fetch.upstream)
+    """
+
+    def __init__(
+        self,
+        max_concurrent_updates: int,
+        max_pending_updates: int,
+        deadline: float = None,
+    ):
+        super().__init__(max(max_pending_updates, max_concurrent_updates))
+        self.limit = max_concurrent_updates
+        self.deadline = deadline
+        self._slots = asyncio.Semaphore(max_concurrent_updates)
+        # Ключ очереди -> (блокировка, число обновлений, которые ее держат или ждут)
+        self._lanes: dict[int, tuple[asyncio.Lock, int]] = {}
+
+        self.waiting = 0
+        self.max_waiting = 0
+        self.active = 0
+        self.processed = 0
+        self.waits = collections.deque(maxlen=WAIT_SAMPLES)
+
+    @staticmethod
+    def ordering_key(update: object) -> int | None:
+        """
+        Обновления с одинаковым ключом обрабатываются по очереди. Inline-запросы
+        не трогают user_data, и устаревший запрос не должен задерживать новый
+        """
+        if not isinstance(update, Update):
+            return None
+        if update.inline_query or update.chosen_inline_result:
+            return None
+        if update.effective_user:
+            return update.effective_user.id
+        if update.effective_chat:
+            return update.effective_chat.id
+        return None
+
+    def _enter_lane(self, key: int) -> asyncio.Lock:
+        lock, users = self._lanes.get(key, (None, 0))
+        lock = lock or asyncio.Lock()
+        self._lanes[key] = (lock, users + 1)
+        return lock
+
+    def _leave_lane(self, key: int):
+        lock, users = self._lanes[key]
+        if users == 1:
+            del self._lanes[key]
+        else:
+            self._lanes[key] = (lock, users - 1)
+
+    @contextlib.asynccontextmanager
+    async def lane(self, key: int):
+        """
+        Выполняет блок по очереди с обновлениями key, например фоновую правку
+        сообщения, которая не должна вклиниться в обработку нажатия
+        """
+        lock = self._enter_lane(key)
+        try:
+            async with lock:
+                yield
+        finally:
+            self._leave_lane(key)
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]):
+        key = self.ordering_key(update)
+        lane = self._enter_lane(key) if key is not None else contextlib.nullcontext()
+        arrived = time.monotonic()
+
+        self.waiting += 1
+        self.max_waiting = max(self.max_waiting, self.waiting)
+        started = False
+        try:
+            async with lane, self._slots:
+                self.waiting -= 1
+                self.active += 1
+                started = True
+                self.waits.append(time.monotonic() - arrived)
+                try:
+                    if self.deadline:
+                        with upstream.deadline(self.deadline):
+                            await coroutine
+                    else:
+                        await coroutine
+                finally:
+                    self.active -= 1
+                    self.processed += 1
+        finally:
+            if not started:
+                # Обновление отменено до начала обработки
+                self.waiting -= 1
+                coroutine.close()
+            if key is not None:
+                self._leave_lane(key)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    def stats(self) -> dict:
+        return {
+            "limit": self.limit,
+            "active": self.active,
+            "waiting": self.waiting,
+            "max_waiting": self.max_waiting,
+            "lanes": len(self._lanes),
+            "processed": self.processed,
+            "wait_p50": percentile(self.waits, 0.5),
+            "wait_p95": percentile(self.waits, 0.95),
+            "wait_max": max(self.waits, default=0.0),
+        }
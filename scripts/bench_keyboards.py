@@ -0,0 +1,84 @@
+"""
+Замер построения клавиатур выбора недели и дня.
+
+Запуск из корня репозитория: python -m scripts.bench_keyboards [повторы]
+
+"Без кэша" - построение клавиатуры с нуля (_construct_weeks_markup без
+lru_cache, _construct_workdays), "с кэшем" - то, что видит обработчик
+при повторном нажатии: готовая клавиатура из кэша или ScheduleData._memo
+"""
+
+import datetime
+import os
+import sys
+import timeit
+
+os.environ.setdefault("ADMINS", "1")
+
+from bot.fetch.models import ScheduleData  # noqa: E402
+from bot.handlers import construct  # noqa: E402
+from bot.parse.semester import get_dates_for_week  # noqa: E402
+
+WEEKS = 17
+LESSONS = 40
+
+
+def make_schedule() -> ScheduleData:
+    """
+    Расписание группы: LESSONS пар, каждая на своем дне недели все недели семестра
+    """
+    data = []
+    for i in range(LESSONS):
+        dates = [get_dates_for_week(week)[i % 6] for week in range(1, WEEKS)]
+        data.append(
+            {
+                "classrooms": [{"name": "А-101", "campus": {"short_name": "В-78"}}],
+                "dates": [day.strftime("%d-%m-%Y") for day in dates],
+                "groups": ["ИКБО-01-23"],
+                "lesson_bells": {
+                    "number": i % 6 + 1,
+                    "start_time": "9:00",
+                    "end_time": "10:30",
+                },
+                "lesson_type": "lecture",
+                "subject": "Физика",
+                "teachers": [{"name": "Иванов И.И."}],
+                "type": "lesson",
+            }
+        )
+    return ScheduleData(data=data)
+
+
+def measure(name: str, function, number: int):
+    seconds = timeit.timeit(function, number=number) / number
+    print(f"{name:<32} {seconds * 1e6:10.1f} мкс")
+
+
+def main():
+    number = int(sys.argv[1]) if len(sys.argv) > 1 else 1000
+    schedule = make_schedule()
+    today = datetime.date.today()
+    dates = tuple(get_dates_for_week(5))
+    selected = str(dates[2])
+
+    measure(
+        "недели, без кэша",
+        lambda: construct._construct_weeks_markup.__wrapped__(today),
+        number,
+    )
+    measure("недели, с кэшем", construct.construct_weeks_markup, number)
+    measure(
+        "дни, без кэша",
+        lambda: construct._construct_workdays(dates, schedule.lesson_dates),
+        number,
+    )
+    measure("дни, с кэшем", lambda: construct.construct_workdays(5, schedule), number)
+    measure(
+        "дни с выбранным днем, с кэшем",
+        lambda: construct.construct_workdays(5, schedule, selected_date=selected),
+        number,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,6 @@
+import os
+
+# Настройки читаются из окружения при первом обращении к bot.config.settings
+os.environ.setdefault("TOKEN", "1:test")
+os.environ.setdefault("API_URL", "http://localhost")
+os.environ.setdefault("ADMINS", "1")
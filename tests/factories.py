@@ -0,0 +1,34 @@
+import datetime
+
+from bot.fetch.models import ScheduleData
+
+
+def lesson(
+    dates: list[datetime.date],
+    number: int = 1,
+    start: str = "9:00",
+    end: str = "10:30",
+    subject: str = "Физика",
+    lesson_type: str = "lecture",
+    classroom: str = "А-101",
+    campus: str = "В-78",
+    groups: list[str] = ("ИКБО-01-23",),
+    teachers: list[str] = ("Иванов И.И.",),
+) -> dict:
+    """
+    Пара в формате ответа API расписания
+    """
+    return {
+        "classrooms": [{"name": classroom, "campus": {"short_name": campus}}],
+        "dates": [day.strftime("%d-%m-%Y") for day in dates],
+        "groups": list(groups),
+        "lesson_bells": {"number": number, "start_time": start, "end_time": end},
+        "lesson_type": lesson_type,
+        "subject": subject,
+        "teachers": [{"name": name} for name in teachers],
+        "type": "lesson",
+    }
+
+
+def schedule(*lessons: dict) -> ScheduleData:
+    return ScheduleData(data=list(lessons))
@@ -0,0 +1,62 @@
+from bot.fetch import cache
+from bot.fetch.cache import TTLCache
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+def make_cache(monkeypatch, **kwargs) -> tuple[TTLCache, Clock]:
+    clock = Clock()
+    monkeypatch.setattr(cache.time, "monotonic", clock)
+    return TTLCache(**kwargs), clock
+
+
+def test_entries_expire_after_ttl(monkeypatch):
+    ttl_cache, clock = make_cache(monkeypatch, ttl=10)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2, ttl=30)
+
+    clock.now += 11
+
+    assert ttl_cache.get("a") is None
+    assert "a" not in ttl_cache
+    assert ttl_cache.get("b") == 2
+
+
+def test_least_recently_used_entry_is_evicted(monkeypatch):
+    ttl_cache, _ = make_cache(monkeypatch, maxsize=2)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+    ttl_cache.get("a")
+    ttl_cache.set("c", 3)
+
+    assert "b" not in ttl_cache
+    assert ttl_cache.get("a") == 1
+    assert ttl_cache.get("c") == 3
+    assert len(ttl_cache) == 2
+
+
+def test_falsy_values_are_cached(monkeypatch):
+    ttl_cache, _ = make_cache(monkeypatch)
+    ttl_cache.set("empty", [])
+
+    assert ttl_cache.get("empty", "missing") == []
+    assert "empty" in ttl_cache
+
+
+def test_pop_and_clear(monkeypatch):
+    ttl_cache, _ = make_cache(monkeypatch)
+    ttl_cache.set("a", 1)
+    ttl_cache.set("b", 2)
+
+    assert ttl_cache.pop("a") == 1
+    assert ttl_cache.pop("a", "missing") == "missing"
+    assert ttl_cache.values() == [2]
+
+    ttl_cache.clear()
+    assert len(ttl_cache) == 0
@@ -0,0 +1,34 @@
+import datetime
+
+from bot.handlers import common
+from bot.index.occupancy import OccupancyIndex
+from bot.parse.semester import get_dates_for_week
+from tests.factories import lesson, schedule
+
+WEEK = 5
+
+
+def test_day_bounds_follow_bells(monkeypatch):
+    monkeypatch.setattr(common, "occupancy_index", OccupancyIndex())
+    monday = get_dates_for_week(WEEK)[0]
+    first = schedule(lesson([monday], 2, "10:40", "12:10"))
+    second = schedule(lesson([monday], 8, "20:20", "21:50"))
+    second._version = "second"
+
+    windows = common.get_common_windows([first, second], WEEK)
+
+    assert windows[monday] == [
+        (
+            datetime.datetime.combine(monday, datetime.time(12, 10)),
+            datetime.datetime.combine(monday, datetime.time(20, 20)),
+        )
+    ]
+
+
+def test_default_bounds_without_bells(monkeypatch):
+    monkeypatch.setattr(common, "occupancy_index", OccupancyIndex())
+
+    assert common.get_day_bounds([]) == (
+        common.COMMON_DAY_START,
+        common.COMMON_DAY_END,
+    )
@@ -0,0 +1,18 @@
+from bot.parse.formating import paginate
+
+
+def test_blocks_are_packed_without_splitting():
+    pages = paginate(["a" * 4, "b" * 4, "c" * 4], limit=10)
+
+    assert pages == ["aaaabbbb", "cccc"]
+
+
+def test_block_longer_than_limit_is_truncated():
+    pages = paginate(["a" * 3, "b" * 15, "c"], limit=10)
+
+    assert pages == ["aaa", "b" * 10, "c"]
+    assert all(len(page) <= 10 for page in pages)
+
+
+def test_no_blocks_no_pages():
+    assert paginate([]) == []
@@ -0,0 +1,34 @@
+import datetime
+import json
+
+from bot.fetch.models import SearchItem
+from bot.http_api import etag_matches, render
+from tests.factories import lesson, schedule
+
+DAY = datetime.date(2026, 2, 9)
+
+
+def test_etag_matches():
+    etag = '"abc-json-all"'
+
+    assert etag_matches(etag, etag)
+    assert etag_matches(f'"other", W/{etag}', etag)
+    assert etag_matches("*", etag)
+    assert not etag_matches('"other"', etag)
+    assert not etag_matches(None, etag)
+    assert not etag_matches("", etag)
+
+
+def test_render_is_memoized_per_format_and_week():
+    item = SearchItem(type="group", uid=1, name="ИКБО-01-23")
+    data = schedule(lesson([DAY]))
+    data._version = "v1"
+
+    etag, body = render(item, data, "json", None)
+
+    assert etag == '"v1-json-all"'
+    assert render(item, data, "json", None)[1] is body
+    payload = json.loads(body)
+    assert payload["version"] == "v1"
+    assert [entry["date"] for entry in payload["lessons"]] == ["2026-02-09"]
+    assert render(item, data, "ics", None)[0] == '"v1-ics-all"'
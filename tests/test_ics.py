@@ -0,0 +1,53 @@
+import datetime
+
+from bot.fetch.models import SearchItem
+from bot.parse.ics import build_ics, fold
+from tests.factories import lesson, schedule
+
+MONDAY = datetime.date(2026, 2, 9)
+NEXT_MONDAY = MONDAY + datetime.timedelta(days=7)
+ITEM = SearchItem(type="group", uid=1, name="ИКБО-01-23")
+
+
+def unfold(calendar: bytes) -> list[str]:
+    return calendar.decode().replace("\r\n ", "").split("\r\n")
+
+
+def test_events_for_every_date():
+    lines = unfold(
+        build_ics(ITEM, schedule(lesson([MONDAY, NEXT_MONDAY], 2, "10:40", "12:10")))
+    )
+
+    assert lines[0] == "BEGIN:VCALENDAR"
+    assert lines.count("BEGIN:VEVENT") == 2
+    assert "DTSTART;TZID=Europe/Moscow:20260209T104000" in lines
+    assert "DTEND;TZID=Europe/Moscow:20260216T121000" in lines
+    assert "SUMMARY:Физика (Лекция)" in lines
+    assert "LOCATION:А-101 (В-78)" in lines
+
+
+def test_only_requested_dates():
+    lines = unfold(
+        build_ics(ITEM, schedule(lesson([MONDAY, NEXT_MONDAY])), dates={NEXT_MONDAY})
+    )
+
+    starts = [line for line in lines if line.startswith("DTSTART;")]
+    assert starts == ["DTSTART;TZID=Europe/Moscow:20260216T090000"]
+
+
+def test_uid_is_stable_between_exports():
+    data = schedule(lesson([MONDAY]))
+
+    def uids(calendar: bytes) -> list[str]:
+        return [line for line in unfold(calendar) if line.startswith("UID:")]
+
+    assert uids(build_ics(ITEM, data)) == uids(build_ics(ITEM, data))
+
+
+def test_fold_keeps_utf8_characters_whole():
+    line = "DESCRIPTION:" + "я" * 60
+    folded = fold(line)
+
+    parts = folded.removesuffix("\r\n").split("\r\n ")
+    assert "".join(parts) == line
+    assert all(len(part.encode()) <= 75 for part in parts)
@@ -0,0 +1,82 @@
+import datetime
+
+from bot.index.intervals import LessonIntervals, free_windows, merge_intervals
+from tests.factories import lesson, schedule
+
+MONDAY = datetime.date(2026, 2, 9)
+TUESDAY = MONDAY + datetime.timedelta(days=1)
+
+
+def at(day: datetime.date, time: str) -> datetime.datetime:
+    return datetime.datetime.combine(day, datetime.time.fromisoformat(time))
+
+
+def make_intervals() -> LessonIntervals:
+    return LessonIntervals(
+        schedule(
+            lesson([MONDAY, TUESDAY], 1, "9:00", "10:30", subject="Физика"),
+            lesson([MONDAY], 2, "10:40", "12:10", subject="Математика"),
+            lesson([MONDAY], 2, "10:40", "12:10", subject="Математика, подгруппа"),
+            lesson([MONDAY], 3, "12:40", "", subject="Без конца"),
+        )
+    )
+
+
+def test_entries_are_sorted_and_skip_lessons_without_bells():
+    intervals = make_intervals()
+
+    assert intervals.starts == sorted(intervals.starts)
+    assert len(intervals.entries) == 4
+    assert intervals.max_duration == datetime.timedelta(minutes=90)
+
+
+def test_between_is_half_open():
+    intervals = make_intervals()
+
+    found = intervals.between(at(MONDAY, "09:00"), at(MONDAY, "10:40"))
+
+    assert [entry[2].subject for entry in found] == ["Физика"]
+
+
+def test_now_and_next_during_lesson():
+    current, upcoming = make_intervals().now_and_next(at(MONDAY, "10:00"))
+
+    assert [entry[2].subject for entry in current] == ["Физика"]
+    assert sorted(entry[2].subject for entry in upcoming) == [
+        "Математика",
+        "Математика, подгруппа",
+    ]
+
+
+def test_now_and_next_in_break_and_after_last_lesson():
+    intervals = make_intervals()
+
+    current, upcoming = intervals.now_and_next(at(MONDAY, "12:20"))
+    assert current == []
+    assert [entry[0] for entry in upcoming] == [at(TUESDAY, "09:00")]
+
+    assert intervals.now_and_next(at(TUESDAY, "11:00")) == ([], [])
+
+
+def test_for_schedule_is_memoized():
+    data = schedule(lesson([MONDAY]))
+
+    assert LessonIntervals.for_schedule(data) is LessonIntervals.for_schedule(data)
+
+
+def test_merge_intervals_joins_touching_and_nested():
+    assert merge_intervals([(5, 7), (1, 3), (3, 4), (2, 3)]) == [(1, 4), (5, 7)]
+
+
+def test_free_windows_respects_day_bounds_and_min_length():
+    busy = [(at(MONDAY, "09:00"), at(MONDAY, "10:30"))]
+    busy += [(at(MONDAY, "10:40"), at(MONDAY, "12:10"))]
+
+    windows = free_windows(
+        busy, at(MONDAY, "08:00"), at(MONDAY, "14:00"), datetime.timedelta(minutes=30)
+    )
+
+    assert windows == [
+        (at(MONDAY, "08:00"), at(MONDAY, "09:00")),
+        (at(MONDAY, "12:10"), at(MONDAY, "14:00")),
+    ]
@@ -0,0 +1,80 @@
+import datetime
+
+from bot.fetch.models import SearchItem
+from bot.index.lessons import LessonIndex, tokenize
+from tests.factories import lesson, schedule
+
+DAY = datetime.date(2026, 2, 9)
+NEXT_DAY = DAY + datetime.timedelta(days=1)
+
+
+def make_index() -> LessonIndex:
+    index = LessonIndex()
+    # Одна лекция потока в расписаниях двух групп
+    for uid, group in ((1, "ИКБО-01-23"), (2, "ИКБО-02-23")):
+        index.ingest(
+            SearchItem(type="group", uid=uid, name=group),
+            schedule(
+                lesson([DAY], 1, subject="Математический анализ", groups=[group]),
+                lesson(
+                    [DAY, NEXT_DAY],
+                    3,
+                    subject="Физика",
+                    lesson_type="laboratorywork",
+                    classroom=f"Лаб-{uid}",
+                    groups=[group],
+                ),
+            ),
+        )
+    return index
+
+
+def test_tokenize_normalizes_case_and_yo():
+    assert tokenize("Учёт и Анализ-2") == ["учет", "и", "анализ", "2"]
+
+
+def test_search_by_word_prefix_merges_stream_groups():
+    results = make_index().search("мат ан", None, [DAY])
+
+    assert len(results) == 1
+    day, entry, groups = results[0]
+    assert day == DAY
+    assert entry.subject == "Математический анализ"
+    assert groups == ["ИКБО-01-23", "ИКБО-02-23"]
+
+
+def test_search_filters_by_type_and_day():
+    index = make_index()
+
+    assert index.search("физ", "lecture", [DAY]) == []
+    labs = index.search("физ", "laboratorywork", [NEXT_DAY])
+    assert [(day, entry.classroom) for day, entry, _ in labs] == [
+        (NEXT_DAY, "Лаб-1 (В-78)"),
+        (NEXT_DAY, "Лаб-2 (В-78)"),
+    ]
+
+
+def test_search_without_subject_uses_type_and_days_only():
+    index = make_index()
+
+    assert len(index.search("", "laboratorywork", [DAY])) == 2
+    # Лекция потока и две лабораторные в разных аудиториях
+    assert len(index.search("", None, [DAY])) == 3
+
+
+def test_reingest_replaces_group_entries():
+    index = make_index()
+    index.ingest(SearchItem(type="group", uid=1, name="ИКБО-01-23"), schedule())
+
+    _, _, groups = index.search("мат", None, [DAY])[0]
+    assert groups == ["ИКБО-02-23"]
+    assert len(index) == 2
+
+
+def test_non_group_schedules_are_ignored():
+    index = LessonIndex()
+    index.ingest(
+        SearchItem(type="teacher", uid=1, name="Иванов"), schedule(lesson([DAY]))
+    )
+
+    assert len(index) == 0
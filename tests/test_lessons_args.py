@@ -0,0 +1,37 @@
+import datetime
+
+from bot.handlers.lessons import parse_lessons_args
+
+
+def test_subject_type_and_date():
+    subject, lesson_type, days = parse_lessons_args(["Физика", "ЛАБ", "20.01.2026"])
+
+    assert subject == "Физика"
+    assert lesson_type == "laboratorywork"
+    assert days == [datetime.date(2026, 1, 20)]
+
+
+def test_without_date_whole_current_week():
+    today = datetime.date.today()
+
+    subject, lesson_type, days = parse_lessons_args(["мат", "анализ"])
+
+    assert (subject, lesson_type) == ("мат анализ", None)
+    assert len(days) == 7
+    assert days[0].weekday() == 0
+    assert today in days
+
+
+def test_relative_days_and_short_date():
+    today = datetime.date.today()
+
+    assert parse_lessons_args(["сегодня"])[2] == [today]
+    assert parse_lessons_args(["завтра"])[2] == [today + datetime.timedelta(days=1)]
+    assert parse_lessons_args(["01.09"])[2] == [datetime.date(today.year, 9, 1)]
+
+
+def test_invalid_date_is_part_of_subject():
+    subject, _, days = parse_lessons_args(["т.б.", "32.13"])
+
+    assert subject == "т.б. 32.13"
+    assert len(days) == 7
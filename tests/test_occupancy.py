@@ -0,0 +1,78 @@
+import datetime
+
+from bot.fetch.models import SearchItem
+from bot.index.occupancy import OccupancyIndex, parse_classroom_name
+from tests.factories import lesson, schedule
+
+DAY = datetime.date(2026, 2, 9)
+
+
+def test_parse_classroom_name():
+    assert parse_classroom_name("Г-212 (В-78)") == ("В-78", "Г-212")
+    assert parse_classroom_name("Спортзал") == ("", "Спортзал")
+
+
+def test_group_schedule_marks_rooms_busy():
+    index = OccupancyIndex()
+    index.ingest(
+        SearchItem(type="group", uid=1, name="ИКБО-01-23"),
+        schedule(lesson([DAY], 2, "10:40", "12:10", classroom="А-101")),
+    )
+
+    assert index.campuses == ["В-78"]
+    assert index.free_rooms("В-78", DAY, 1) == ["А-101"]
+    assert index.free_rooms("В-78", DAY, 2) == []
+    assert index.free_rooms("В-78", DAY + datetime.timedelta(days=1), 2) == ["А-101"]
+
+
+def test_classroom_schedule_replaces_room_occupancy():
+    index = OccupancyIndex()
+    room = SearchItem(type="classroom", uid=7, name="А-101 (В-78)")
+
+    index.ingest(room, schedule(lesson([DAY], 1, classroom="А-101")))
+    index.ingest(room, schedule(lesson([DAY], 3, "12:40", "14:10")))
+
+    assert index.free_rooms("В-78", DAY, 1) == ["А-101"]
+    assert index.free_rooms("В-78", DAY, 3) == []
+
+
+def test_lesson_number_at_uses_collected_bells():
+    index = OccupancyIndex()
+    index.ingest(
+        SearchItem(type="group", uid=1, name="ИКБО-01-23"),
+        schedule(
+            lesson([DAY], 1, "9:00", "10:30"),
+            lesson([DAY], 2, "10:40", "12:10"),
+        ),
+    )
+
+    assert index.lesson_number_at(datetime.time(8, 0)) == 1
+    assert index.lesson_number_at(datetime.time(10, 35)) == 2
+    assert index.lesson_number_at(datetime.time(13, 0)) is None
+
+
+def test_reingest_replaces_group_contribution():
+    index = OccupancyIndex()
+    group = SearchItem(type="group", uid=1, name="ИКБО-01-23")
+    other = SearchItem(type="group", uid=2, name="ИКБО-02-23")
+    index.ingest(other, schedule(lesson([DAY], 1, classroom="А-101")))
+    index.ingest(group, schedule(lesson([DAY], 2, "10:40", "12:10")))
+
+    # Пару группы перенесли в другую аудиторию
+    index.ingest(group, schedule(lesson([DAY], 2, "10:40", "12:10", classroom="Б-2")))
+
+    assert index.free_rooms("В-78", DAY, 1) == ["Б-2"]
+    assert index.free_rooms("В-78", DAY, 2) == ["А-101"]
+
+
+def test_room_is_forgotten_when_no_schedule_mentions_it():
+    index = OccupancyIndex()
+    group = SearchItem(type="group", uid=1, name="ИКБО-01-23")
+    room = SearchItem(type="classroom", uid=7, name="Б-2 (В-78)")
+    index.ingest(room, schedule())
+    index.ingest(group, schedule(lesson([DAY], 1, classroom="А-101")))
+
+    index.ingest(group, schedule())
+
+    assert index.free_rooms("В-78", DAY, 1) == ["Б-2"]
+    assert len(index) == 1